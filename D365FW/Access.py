@@ -3,13 +3,33 @@ D365API.Access
 ~~~~~~~~~~~~~~
 """
 
-import requests
+import logging
+import threading
+import time
+
+from D365FW.Token import Token
+from D365FW.TokenCache import FileTokenCache
+from D365FW.Transport import Transport
+
+logger = logging.getLogger(__name__)
+
+# The maximum number of seconds between the retries of a failed background refresh
+REFRESH_RETRY_MAX_DELAY = 60
+
+class LoginError(Exception):
+    """Login Error.
+
+    The login failed, there is no access token to send the requests
+    with.
+    """
+
 
 class Access(object):
     """Access.
     """
 
-    def __init__(self, hostname, client_id, client_secret, tenant_id):
+    def __init__(self, hostname, client_id, client_secret, tenant_id, transport=None,
+                 refresh_margin=300, auto_refresh=True, token_cache=None):
         """Constructor.
 
         Args:
@@ -17,8 +37,18 @@ class Access(object):
             client_id (str): The Application (client) ID of the application.
             client_secret (str): The client secret of the application.
             tenant_id (str): The Directory (tenant) ID of the application.
+            transport (Transport): The pooled HTTP transport to send the
+                requests with, a new one is created if None.
+            refresh_margin (float): The number of seconds before expiry
+                the access token is refreshed.
+            auto_refresh (bool): Determine whether or not to refresh the
+                access token in the background before it expires.
+            token_cache (FileTokenCache | bool): The on disk token cache
+                shared by all processes on the machine, True to use the
+                default cache file, or None to disable it.
         """
 
+        self.tenant_id = tenant_id
         self.client_id = client_id
         self.client_secret = client_secret
         self.version = 1
@@ -26,6 +56,20 @@ class Access(object):
         self.resource = f'https://{hostname}.api.crm.dynamics.com/'
         self.oath_2_0_url = f'https://login.microsoftonline.com/{tenant_id}/oauth2/v2.0/token'
         self.scope = f'https://{hostname}.api.crm.dynamics.com/.default'
+        self.transport = transport if transport is not None else Transport()
+
+        # Token state, the lock makes sure only one refresh is in flight
+        self.token = None
+        self.refresh_margin = refresh_margin
+        self.auto_refresh = auto_refresh
+        self._refresh_lock = threading.Lock()
+        self._refresh_timer = None
+        self._refresh_failures = 0
+
+        # Token cache shared between processes
+        if token_cache is True:
+            token_cache = FileTokenCache()
+        self.token_cache = token_cache or None
     
 
     def login(self):
@@ -45,6 +89,164 @@ class Access(object):
             return None
 
 
+    def get_token(self):
+        """Get Access Token.
+
+        Return the current access token, refreshing it first if it is
+        missing or expired. When the token is only within the refresh
+        margin, the still valid token is returned and the refresh is
+        left to the background.
+
+        Returns:
+            A string for the Microsoft Dynamics 365 access (bearer) token,
+            or None if the login failed.
+        """
+
+        token = self.token
+
+        # Use the current token while it is still valid
+        if token is not None and not token.is_expired():
+            # Refresh now if the background refresh is not looking after it
+            if token.is_expired(self.refresh_margin) and not self.auto_refresh:
+                self.refresh()
+                token = self.token
+            return token.access_token
+
+        # Refresh the token and wait for it
+        token = self.refresh()
+        return token.access_token if token is not None else None
+
+
+    def refresh(self):
+        """Refresh Access Token.
+
+        Only a single refresh is in flight at a time, concurrent callers
+        wait for it and share its result instead of requesting their own
+        token.
+
+        Returns:
+            The refreshed Token, or None if the login failed.
+        """
+
+        # Remember the token the caller saw before waiting for the lock
+        stale = self.token
+
+        with self._refresh_lock:
+            # Another caller already refreshed the token while waiting
+            if self.token is not stale and self.token is not None:
+                return self.token
+
+            if self.token_cache is not None:
+                token = self._refresh_cached()
+            else:
+                token = self.request_token()
+
+            if token is not None:
+                self.token = token
+
+            # Schedule the next refresh
+            if self.auto_refresh:
+                self._schedule_refresh()
+
+            return token
+
+
+    def request_token(self):
+        """Request a new Token from the token endpoint.
+
+        Returns:
+            The new Token, or None if the login failed.
+        """
+
+        if self.version == 1:
+            return self.request_token_oauth_1_0()
+        else:
+            return None
+
+
+    def _refresh_cached(self):
+        """Refresh the Token through the on disk token cache.
+
+        The cache file lock is held while requesting, so when many
+        processes refresh at the same time only the first one requests
+        a new token and the others reuse it.
+
+        Returns:
+            The cached or new Token, or None if the login failed.
+        """
+
+        key = self.token_cache.key(self.tenant_id, self.client_id, self.resource)
+
+        with self.token_cache.lock():
+            # Reuse the cached token unless it is due for refresh
+            token = self.token_cache.get(key)
+            if token is not None and not token.is_expired(self.refresh_margin):
+                return token
+
+            # Request a new token and share it
+            token = self.request_token()
+            if token is not None:
+                self.token_cache.set(key, token)
+
+            return token
+
+
+    def _schedule_refresh(self, delay=None):
+        """Schedule the background refresh shortly before expiry.
+
+        Args:
+            delay (float): The number of seconds before the refresh,
+                default to the refresh margin before expiry.
+        """
+
+        # Cancel the previous schedule
+        if self._refresh_timer is not None:
+            self._refresh_timer.cancel()
+
+        if delay is None:
+            if self.token is None:
+                return
+
+            # Refresh within the margin, or retry shortly if the last refresh failed
+            delay = self.token.expires_in - self.refresh_margin
+            if delay <= 0:
+                delay = min(30, max(self.token.expires_in / 2, 1))
+
+        self._refresh_timer = threading.Timer(delay, self._background_refresh)
+        self._refresh_timer.daemon = True
+        self._refresh_timer.start()
+
+
+    def _background_refresh(self):
+        """Refresh the Token on the timer thread.
+
+        An error raised by the refresh (e.g. a ConnectionError) would
+        end the timer thread without a next schedule, so it is logged
+        and the refresh is retried with an exponential backoff.
+        """
+
+        try:
+            self.refresh()
+        except Exception:
+            self._refresh_failures += 1
+            delay = min(2 ** self._refresh_failures, REFRESH_RETRY_MAX_DELAY)
+            logger.warning('The background refresh of the access token failed, retrying in %s seconds.',
+                           delay, exc_info=True)
+
+            with self._refresh_lock:
+                self._schedule_refresh(delay)
+        else:
+            self._refresh_failures = 0
+
+
+    def close(self):
+        """Stop the background refresh."""
+
+        if self._refresh_timer is not None:
+            self._refresh_timer.cancel()
+            self._refresh_timer = None
+
+
     def login_oauth_1_0(self):
         """Login via REST (REpresentational State Transfer) Version 1.
 
@@ -53,6 +255,24 @@ class Access(object):
             call was successful, or None otherwise.
         """
 
+        # Request a token and keep it for refresh
+        token = self.refresh()
+
+        # There was an error
+        if token is None:
+            return None
+
+        return token.access_token
+
+
+    def request_token_oauth_1_0(self):
+        """Request Token via REST (REpresentational State Transfer) Version 1.
+
+        Returns:
+            A Token for the Microsoft Dynamics 365 access (bearer) token if
+            call was successful, or None otherwise.
+        """
+
         # Create header
         header = {
             'Content-Type': 'application/x-www-form-urlencoded'
@@ -67,15 +287,17 @@ class Access(object):
         }
 
         # Send the request
-        r = requests.post(url=self.oauth_1_0_url,
-                          headers=header,
-                          data=payload)
+        requested_on = time.time()
+        # The client credentials request is safe to send again
+        r = self.transport.post(url=self.oauth_1_0_url,
+                                headers=header,
+                                data=payload,
+                                idempotent=True)
 
         # Check the status code
         if r.status_code == 200:
-            # Parse the access token
-            access_token = r.json()['access_token']
-            return access_token
+            # Parse the access token and its expiry
+            return Token.from_response(r.json(), requested_on)
 
         # There was an error
         return None
@@ -0,0 +1,82 @@
+"""
+AsyncD365FW
+~~~~~~~~~~~
+"""
+
+import asyncio
+
+from D365FW.Access import Access, LoginError
+from D365FW.AsyncEntity import AsyncEntity
+from D365FW.Transport import Transport
+
+class AsyncD365FW(AsyncEntity):
+    """AsyncD365FW Object
+
+    Main asyncio object for the Microsoft D365 (Dynamics 365) API
+    (Application Programing Interface). Use it as an async context
+    manager to login and close the session.
+    """
+
+    def __init__(self, hostname, client_id, client_secret, tenant_id, transport=None,
+                 token_cache=None, **kwargs):
+        """Constructor.
+
+        Args:
+            hostname (str): The Hostname of the environment.
+            client_id (str): The Application (client) ID of the application.
+            client_secret (str): The client secret of the application.
+            tenant_id (str): The Directory (tenant) ID of the application.
+            transport (Transport): The pooled HTTP transport for the
+                login, and the throttle, retry policy, hooks and
+                profiler of every request, a new one is created if None.
+            token_cache (FileTokenCache | bool): The on disk token cache
+                shared by all processes on the machine, True to use the
+                default cache file, or None to disable it.
+            kwargs (dict): The keyword arguments for the AsyncEntity
+                (e.g. `max_connections`, `timeout`, `root_url`).
+        """
+
+        # Create the transport shared by Access and AsyncEntity
+        transport = transport if transport is not None else Transport()
+
+        # Create an instance of Access object, it keeps the access token refreshed
+        access = Access(hostname=hostname,
+                        client_id=client_id,
+                        client_secret=client_secret,
+                        tenant_id=tenant_id,
+                        transport=transport,
+                        token_cache=token_cache)
+
+        # Set the root URL (Uniform Resource Locator), header and session
+        super().__init__(access, hostname, transport=transport, **kwargs)
+
+
+    async def login(self):
+        """Login to Microsoft Dynamics 365 without blocking the event loop.
+
+        Returns:
+            A string for the Microsoft Dynamics 365 access (bearer)
+            token.
+
+        Raises:
+            LoginError: The login failed.
+        """
+
+        loop = asyncio.get_running_loop()
+        access_token = await loop.run_in_executor(None, self.access.login)
+
+        # There was an error, never send the requests without a token
+        if access_token is None:
+            raise LoginError(f'The login to {self.hostname} failed.')
+
+        return access_token
+
+
+    async def __aenter__(self):
+        await self.login()
+        return self
+
+
+    async def __aexit__(self, *args):
+        self.access.close()
+        await self.close()
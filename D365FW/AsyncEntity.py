@@ -0,0 +1,657 @@
+"""
+D365FW.AsyncEntity
+~~~~~~~~~~~~~~~~~~
+"""
+
+import asyncio
+import time
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from D365FW.Common import Common, CommonEntitySet, parse_entity_id
+from D365FW.Pager import IncompleteReadError
+from D365FW.Profiler import ProfiledCodec
+from D365FW.Retry import RetryPolicy
+from D365FW.Transport import Transport, _body_size
+
+# The number of seconds between the checks for a free throttle slot
+SLOT_POLL_INTERVAL = 0.01
+
+class AsyncResponse(object):
+    """Async Response.
+
+    The status code, header and body of an aiohttp response, read
+    before the connection is released, for the Throttle.
+    """
+
+    __slots__ = ('status_code', 'headers', 'content')
+
+    def __init__(self, status_code, headers, content):
+        """Constructor.
+
+        Args:
+            status_code (int): The status code.
+            headers (dict): The response header.
+            content (bytes): The response body.
+        """
+
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+
+class AsyncEntitySet(CommonEntitySet):
+    """Async Entity Set.
+
+    Immutable handle of an entity set (e.g. `entity.accounts`) with the
+    asyncio operations on it, see `AsyncEntity`.
+    """
+
+    __slots__ = ()
+
+    async def create(self, payload, retry=False):
+        """Create Entity.
+
+        Args:
+            payload (dict | str): The payload (message body) passed in,
+                a dict is serialized with the JSON codec.
+            retry (bool): Determine whether or not to send the create
+                again on a transient error, which may create a duplicate
+                if the first attempt reached the service.
+
+        Returns:
+            A string for the unique identifier (ID) of the Entity, or
+            None if the request failed.
+        """
+
+        status_code, header, _ = await self.client._request('POST', self.url, self.header, data=self._encode(payload),
+                                                            idempotent=retry or None)
+
+        # Check the status code
+        if status_code == 204:
+            # Parse and return the unique identifier (ID) of the entity
+            return parse_entity_id(header.get('OData-EntityId'))
+
+        # There was an error
+        return None
+
+
+    async def read(self, id=None, page_size=None):
+        """Read Entity.
+
+        Args:
+            id (str): The unique identifier (ID) of the entity.
+            page_size (int): The maximum number of records per page
+                (`odata.maxpagesize`), default to the service page size.
+
+        Returns:
+            A list for all the read result, or None if a request failed
+            (a partial read result is never returned).
+        """
+
+        # Send the request for the first page
+        read_result = await self._read_page(self._read_url(id), page_size)
+
+        # Check the failure status code
+        if read_result is None:
+            return None
+
+        # Add the read result of each page to list
+        read_result_list = []
+        try:
+            async for records in self._iter_pages(read_result, page_size, strict=True):
+                read_result_list.extend(records)
+        except IncompleteReadError:
+            # There was an error, the read result is incomplete
+            return None
+
+        return read_result_list
+
+
+    async def iter_read(self, id=None, page=False, page_size=None):
+        """Iterate Read Entity.
+
+        Follow the `@odata.nextLink` and yield the read result as each
+        page arrives.
+
+        Args:
+            id (str): The unique identifier (ID) of the entity.
+            page (bool): Determine whether or not to yield a list per
+                page instead of each record.
+            page_size (int): The maximum number of records per page
+                (`odata.maxpagesize`), default to the service page size.
+
+        Returns:
+            An async generator for the read result.
+
+        Raises:
+            IncompleteReadError: A page request failed, with the number
+                of records read and the link of the failed page.
+        """
+
+        # Send the request for the first page
+        read_result = await self._read_page(self._read_url(id), page_size, strict=True)
+
+        async for records in self._iter_pages(read_result, page_size, strict=True):
+            if page:
+                yield records
+            else:
+                for record in records:
+                    yield record
+
+
+    async def _read_page(self, request_url, page_size=None, strict=False):
+        """Read Page.
+
+        Args:
+            request_url (str): The request URL of the page.
+            page_size (int): The maximum number of records per page.
+            strict (bool): Determine whether or not to raise an
+                IncompleteReadError when the request failed.
+
+        Returns:
+            A dictionary for the parsed page, or None if the request
+            failed.
+        """
+
+        # Create header
+        header = self.header
+        if page_size is not None:
+            header = dict(header, Prefer=f'odata.maxpagesize={page_size}')
+
+        status_code, _, body = await self.client._request('GET', request_url, header)
+
+        # Check the status code
+        if status_code != 200:
+            if strict:
+                raise IncompleteReadError(request_url, status_code)
+            return None
+
+        # Parse the read result
+        return self.codec.loads(body)
+
+
+    async def _iter_pages(self, read_result, page_size=None, strict=False):
+        """Iterate Pages.
+
+        Args:
+            read_result (dict): The parsed first page.
+            page_size (int): The maximum number of records per page.
+            strict (bool): Determine whether or not to raise an
+                IncompleteReadError when a page request failed.
+
+        Returns:
+            An async generator yielding a list of records per page.
+        """
+
+        count = 0
+
+        while read_result is not None:
+            if 'value' in read_result:
+                # Multiple result
+                records = read_result['value']
+            else:
+                # Single result
+                records = [read_result]
+
+            yield records
+            count += len(records)
+
+            # Check if there are more result
+            if '@odata.nextLink' not in read_result:
+                break
+
+            # Parse the URL for the next set of result
+            try:
+                read_result = await self._read_page(read_result['@odata.nextLink'], page_size, strict)
+            except IncompleteReadError as e:
+                e.count = count
+                raise
+
+
+    async def update(self, id, payload):
+        """Update Entity.
+
+        Args:
+            id (str): The unique identifier (ID) of the entity.
+            payload (dict | str): The payload (message body) passed in,
+                a dict is serialized with the JSON codec.
+
+        Returns:
+            An integer for the status code of the update request, or
+            None if the request failed.
+        """
+
+        # Don't perform create for this update
+        return await self._send_no_content('PATCH', f'{self.url}({id})', self.update_header, data=self._encode(payload))
+
+
+    async def delete(self, id):
+        """Delete Entity.
+
+        Args:
+            id (str): The unique identifier (ID) of the entity.
+
+        Returns:
+            An integer for the status code of the delete request, or
+            None if the request failed.
+        """
+
+        return await self._send_no_content('DELETE', f'{self.url}({id})')
+
+
+    async def associate(self, primary_id, collection, secondary, secondary_id, update=False):
+        """Associate Entity.
+
+        Args:
+            primary_id (str): The unique identifier (ID) of the primary
+                entity.
+            collection (str): The collection to associate the entity to.
+            secondary (str): The secondary entity name.
+            secondary_id (str): The unique identifier (ID) of the
+                secondary entity.
+            update (bool): Determine whether or not this is an update
+                operation to change the reference.
+
+        Returns:
+            An integer for the status code of the associate request, or
+            None if the request failed.
+        """
+
+        request_url, payload = self._associate_request(primary_id, collection, secondary, secondary_id, update)
+
+        return await self._send_no_content('POST', request_url, data=self.codec.dumps(payload))
+
+
+    async def disassociate(self, primary_id, collection, collection_id=None, secondary=None, secondary_id=None):
+        """Disassociate Entity.
+
+        Args:
+            primary_id (str): The unique identifier (ID) of the primary
+                entity.
+            collection (str): The collection to associate the entity to.
+            collection_id (str): The unique identifier (ID) of the
+                collection entity.
+            secondary (str): The secondary entity name.
+            secondary_id (str): The unique identifier (ID) of the
+                secondary entity.
+
+        Returns:
+            An integer for the status code of the disassociate request,
+            or None if the request failed.
+        """
+
+        request_url = self._disassociate_url(primary_id, collection, collection_id, secondary, secondary_id)
+
+        return await self._send_no_content('DELETE', request_url)
+
+
+    async def _send_no_content(self, method, request_url, header=None, data=None):
+        """Send a request expecting 204 No Content.
+
+        Returns:
+            The status code if the request was successful, None otherwise.
+        """
+
+        if request_url is None:
+            return None
+
+        status_code, _, _ = await self.client._request(method, request_url, header or self.header, data=data)
+
+        # Check the status code
+        if status_code == 204:
+            return status_code
+
+        # There was an error
+        return None
+
+
+    async def query(self, query=None, **kwargs):
+        """Query Entity.
+
+        Args:
+            query (Query): The compiled query, see `Query`.
+            kwargs (dict): The parameters of the compiled query, or the
+                query options without a compiled query.
+
+        Returns:
+            A string formatted JSON for the result of the query, or None
+            if the request failed.
+        """
+
+        status_code, _, body = await self.client._request('GET', self._query_url(query, **kwargs), self.header)
+
+        # Check the status code
+        if status_code == 200:
+            # Return the response text (message body)
+            return body.decode('utf-8')
+
+        # There was an error
+        return None
+
+
+class AsyncEntity(Common):
+    """Async Entity.
+
+    The asyncio version of the Entity, the requests are sent with a
+    pooled `aiohttp` session so many of them can be in flight at once
+    without blocking the event loop. The requests go through the
+    throttle, retry policy, hooks and profiler of the transport like
+    the Entity ones, waiting with asyncio sleeps. Each entity set is an
+    attribute of the client returning a cached AsyncEntitySet handle.
+    """
+
+    entity_set_class = AsyncEntitySet
+
+    def __init__(self, access, hostname, session=None, max_connections=1000,
+                 max_connections_per_host=0, timeout=None, root_url=None, codec=None, transport=None):
+        """Constructor.
+
+        Args:
+            access (str | Access): The Microsoft Dynamics 365 access
+                token, or the Access object to read the current
+                (refreshed) access token from on each request.
+            hostname (str): The Hostname of the environment.
+            session (aiohttp.ClientSession): The session to send the
+                requests with, one is created on first use if None.
+            max_connections (int): The maximum number of concurrent
+                connections, 0 for no limit.
+            max_connections_per_host (int): The maximum number of
+                concurrent connections per host, 0 for no limit.
+            timeout (float): The total timeout in seconds for each
+                request, or None to wait forever.
+            root_url (str): The root URL of the Web API, default to the
+                one of the environment (e.g. a local server for test).
+            codec (str | JsonCodec): The JSON codec (`orjson`, `msgspec`
+                or `json`), default to the fastest installed one.
+            transport (Transport): The transport of the throttle, retry
+                policy, hooks and profiler of the requests, a new one is
+                created if None. Its own connection pool is not used.
+        """
+
+        if aiohttp is None:
+            raise ImportError('The AsyncEntity requires aiohttp, install it with `pip install d365fw[async]`.')
+
+        # Set the access token, URL (Uniform Resource Locator) and header
+        super().__init__(access, hostname, root_url=root_url, codec=codec)
+
+        # Set the session
+        self.session = session
+        self.max_connections = max_connections
+        self.max_connections_per_host = max_connections_per_host
+        self.timeout = timeout
+
+        # Set the transport of the request policies
+        self.transport = transport if transport is not None else Transport()
+
+        # Record the JSON decoding with the profiler of the transport
+        profiler = getattr(self.transport, 'profiler', None)
+        if profiler is not None:
+            self.codec = ProfiledCodec(self.codec, profiler)
+
+
+    def get_session(self):
+        """Get Session.
+
+        Returns:
+            The aiohttp.ClientSession, created on first use within the
+            running event loop.
+        """
+
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_connections,
+                                             limit_per_host=self.max_connections_per_host)
+            self.session = aiohttp.ClientSession(connector=connector,
+                                                 timeout=aiohttp.ClientTimeout(total=self.timeout))
+
+        return self.session
+
+
+    async def get_header(self, header=None):
+        """Get Request Header.
+
+        The access token is refreshed in the default executor whenever
+        getting it may request a new one, so the event loop is never
+        blocked by the token endpoint.
+
+        Args:
+            header (dict): The header to add the `Authorization` to,
+                default to the client header.
+
+        Returns:
+            A new dictionary for the request header with the current
+            access token.
+        """
+
+        access_token = self.access_token
+
+        if access_token is None:
+            access = self.access
+            token = getattr(access, 'token', None)
+
+            # The token is refreshed on the calling thread within the margin without background refresh
+            margin = 0 if getattr(access, 'auto_refresh', True) else access.refresh_margin
+
+            if token is None or token.is_expired(margin):
+                # Refresh the access token without blocking the event loop
+                loop = asyncio.get_running_loop()
+                access_token = await loop.run_in_executor(None, access.get_token)
+            else:
+                access_token = token.access_token
+
+        # Create header
+        header = dict(self.header if header is None else header)
+        header['Authorization'] = f'Bearer {access_token}'
+
+        return header
+
+
+    async def _request(self, method, request_url, header=None, data=None, idempotent=None):
+        """Send Request.
+
+        When throttling is enabled, the request waits for a slot of the
+        host concurrency and a throttled request is sent again after the
+        `Retry-After` (a 503 only when idempotent). When retry is
+        enabled, an idempotent request failing with a transient error is
+        sent again with backoff until the deadline of the call, see
+        `Transport.request`.
+        Each hook is called with the RequestEvent of the call, and the
+        profiler records its `throttle_wait`, `ttfb` and `body` phases.
+
+        Args:
+            method (str): The HTTP method.
+            request_url (str): The request URL.
+            header (dict): The request header set (without the
+                `Authorization`), default to the client header.
+            data (str | bytes): The payload (message body).
+            idempotent (bool): Determine whether or not the request is
+                safe to send again, None to decide from the method and
+                header (see `RetryPolicy.is_idempotent`).
+
+        Returns:
+            A tuple (status code, response header, response body bytes).
+        """
+
+        # Create header
+        headers = await self.get_header(header)
+
+        transport = self.transport
+        stats = {'attempts': 0, 'throttle_retries': 0, 'throttle_wait': 0.0}
+
+        # Send the request without instrumentation
+        if not transport.hooks and transport.profiler is None:
+            r = await self._send(method, request_url, headers, data, idempotent, stats)
+            return r.status_code, r.headers, r.content
+
+        start = time.perf_counter()
+        r = None
+        error = None
+
+        try:
+            r = await self._send(method, request_url, headers, data, idempotent, stats)
+            return r.status_code, r.headers, r.content
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            end = time.perf_counter()
+
+            # The spans of concurrent tasks interleave, record them without nesting
+            if transport.profiler is not None:
+                transport.profiler.add('request', 'request', start, end, {'method': method, 'url': request_url})
+
+            if transport.hooks:
+                transport.report(method, request_url, None, None if r is None else r.status_code, error,
+                                 end - start, stats, _body_size(data), 0 if r is None else len(r.content))
+
+
+    async def _send(self, method, request_url, headers, data, idempotent, stats):
+        """Send the request with the throttle and retry, see `_request`.
+
+        Args:
+            stats (dict): The number of `attempts` and `throttle_retries`
+                and the `throttle_wait` seconds, updated in place.
+
+        Returns:
+            The AsyncResponse of the last attempt.
+        """
+
+        transport = self.transport
+        profiler = transport.profiler
+
+        throttle = transport.get_throttle(request_url)
+        retry = transport.retry
+
+        # A request rejected by the throttle (429) was never processed, a
+        # 503 may have been, only send it again when it is idempotent
+        safe = RetryPolicy.is_idempotent(method, headers, idempotent)
+        if not safe:
+            retry = None
+
+        # The deadline of the call
+        if retry is not None and retry.deadline is not None:
+            deadline = time.monotonic() + retry.deadline
+        else:
+            deadline = None
+
+        attempts = 0
+        throttle_retries = 0
+
+        while True:
+            if throttle is not None:
+                stats['throttle_wait'] += await self._acquire(throttle)
+
+            attempts += 1
+            stats['attempts'] = attempts
+
+            # Do not wait for the response past the deadline of the call
+            kwargs = {}
+            if deadline is not None:
+                remaining = max(deadline - time.monotonic(), 0.001)
+                kwargs['timeout'] = aiohttp.ClientTimeout(
+                    total=remaining if self.timeout is None else min(self.timeout, remaining))
+
+            try:
+                # Send the request for a response
+                start = time.perf_counter()
+                async with self.get_session().request(method, request_url, headers=headers, data=data,
+                                                      **kwargs) as response:
+                    received = time.perf_counter()
+                    body = await response.read()
+
+                r = AsyncResponse(response.status, response.headers, body)
+
+                if profiler is not None:
+                    profiler.add('ttfb', 'phase', start, received)
+                    profiler.add('body', 'phase', received, time.perf_counter(), {'bytes': len(body)})
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if throttle is not None:
+                    throttle.release()
+                # Send again after the backoff
+                if not await self._backoff(retry, attempts, deadline):
+                    raise
+                continue
+            except BaseException:
+                # Never keep the slot of a failed request
+                if throttle is not None:
+                    throttle.release()
+                raise
+
+            if throttle is not None:
+                throttle.release(r)
+
+                if throttle.is_throttled(r):
+                    # Send the throttled request again after the Retry-After
+                    if (r.status_code == 429 or safe) and throttle_retries < throttle.max_retries and \
+                            (deadline is None or throttle.resume_at < deadline):
+                        throttle_retries += 1
+                        stats['throttle_retries'] = throttle_retries
+                        attempts -= 1
+                        continue
+                    return r
+
+            # Send the failed request again after the backoff
+            if retry is not None and r.status_code in retry.statuses:
+                if await self._backoff(retry, attempts, deadline):
+                    continue
+
+            return r
+
+
+    async def _acquire(self, throttle):
+        """Acquire a throttle slot without blocking the event loop.
+
+        Returns:
+            A float for the number of seconds waited.
+        """
+
+        start = time.perf_counter()
+
+        while True:
+            delay = throttle.try_acquire()
+            if delay is None:
+                break
+            await asyncio.sleep(delay or SLOT_POLL_INTERVAL)
+
+        end = time.perf_counter()
+
+        if self.transport.profiler is not None:
+            self.transport.profiler.add('throttle_wait', 'phase', start, end)
+
+        return end - start
+
+
+    @staticmethod
+    async def _backoff(retry, attempts, deadline):
+        """Wait for the backoff before the next attempt.
+
+        Returns:
+            True if there is an attempt left within the deadline, False
+            otherwise (without waiting).
+        """
+
+        backoff = retry.next_backoff(attempts, deadline) if retry is not None else None
+        if backoff is None:
+            return False
+
+        await asyncio.sleep(backoff)
+
+        return True
+
+
+    async def close(self):
+        """Close the session and its pooled connections."""
+
+        if self.session is not None:
+            await self.session.close()
+
+
+    async def __aenter__(self):
+        return self
+
+
+    async def __aexit__(self, *args):
+        await self.close()
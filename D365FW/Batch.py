@@ -0,0 +1,516 @@
+"""
+D365FW.Batch
+~~~~~~~~~~~~
+"""
+
+import contextlib
+import uuid
+
+from D365FW.Codec import JsonCodec, encode_payload
+from D365FW.Common import parse_entity_id
+
+# The maximum number of requests in a single `$batch` request
+BATCH_MAX_SIZE = 1000
+
+class BatchResult(object):
+    """Batch Result.
+
+    The result of a single operation in the batch, filled in when the
+    batch is sent.
+    """
+
+    def __init__(self, method, url, codec=JsonCodec):
+        """Constructor.
+
+        Args:
+            method (str): The HTTP method of the operation.
+            url (str): The request URL of the operation.
+            codec (JsonCodec): The codec to parse the response body.
+        """
+
+        self.method = method
+        self.url = url
+        self.codec = codec
+        self.status_code = None
+        self.headers = {}
+        self.text = None
+
+
+    @property
+    def success(self):
+        """True if the operation was successful."""
+
+        return self.status_code is not None and 200 <= self.status_code < 300
+
+
+    @property
+    def id(self):
+        """The unique identifier (ID) of the created entity, or None."""
+
+        return parse_entity_id(self.headers.get('OData-EntityId'))
+
+
+    def json(self):
+        """Parse the JSON (JavaScript Object Notation) response body."""
+
+        return self.codec.loads(self.text) if self.text else None
+
+
+    def __repr__(self):
+        return f'<BatchResult {self.method} {self.url} [{self.status_code}]>'
+
+
+class _Operation(object):
+    """A queued operation of the batch."""
+
+    def __init__(self, method, url, payload=None, header=None, codec=JsonCodec):
+        self.method = method
+        self.url = url
+        self.payload = payload
+        self.header = header or {}
+        self.result = BatchResult(method, url, codec)
+
+
+class Batch(object):
+    """Batch.
+
+    Queue the `create`, `update`, `delete` and `associate` operations
+    of the Entity and send them as multipart OData `$batch` requests,
+    split at the service limit. Operations queued in a `changeset` are
+    applied in a single transaction.
+
+    .. _Execute Batch Operations Using The Web API:
+    https://docs.microsoft.com/en-us/powerapps/developer/data-platform/webapi/execute-batch-operations-using-web-api
+    """
+
+    def __init__(self, entity, label, max_size=BATCH_MAX_SIZE, continue_on_error=True):
+        """Constructor.
+
+        Args:
+            entity (Entity): The Entity to send the batch with.
+            label (str): The default entity set name of the operations.
+            max_size (int): The maximum number of operations per
+                `$batch` request.
+            continue_on_error (bool): Determine whether or not the
+                service continues with the rest of the batch after an
+                operation failed.
+        """
+
+        if not 0 < max_size <= BATCH_MAX_SIZE:
+            raise ValueError(f'The batch size must be between 1 and {BATCH_MAX_SIZE}.')
+
+        self.entity = entity
+        self.codec = entity.codec
+        self.label = label
+        self.max_size = max_size
+        self.continue_on_error = continue_on_error
+
+        # Queued items, each one is an operation or a changeset (list of operations)
+        self.items = []
+        self.results = []
+        self._changeset = None
+
+
+    def __len__(self):
+        return sum(len(item) if isinstance(item, list) else 1 for item in self.items)
+
+
+    def _queue(self, method, url, payload=None, header=None):
+        """Queue an operation.
+
+        Returns:
+            The BatchResult of the operation, filled in when sent.
+        """
+
+        # Serialize the payload
+        payload = encode_payload(self.codec, payload)
+
+        operation = _Operation(method, url, payload, header, self.codec)
+
+        if self._changeset is not None:
+            self._changeset.append(operation)
+        else:
+            self.items.append(operation)
+
+        return operation.result
+
+
+    @contextlib.contextmanager
+    def changeset(self):
+        """Changeset.
+
+        Queue the operations within the context in a changeset, either
+        all of them are applied or none of them.
+        """
+
+        if self._changeset is not None:
+            raise RuntimeError('A changeset can not be nested.')
+
+        self._changeset = []
+        try:
+            yield self
+        finally:
+            changeset, self._changeset = self._changeset, None
+
+        if len(changeset) > self.max_size:
+            raise ValueError(f'A changeset can not have more than {self.max_size} operations.')
+
+        if changeset:
+            self.items.append(changeset)
+
+
+    def create(self, payload, label=None):
+        """Queue Create Entity.
+
+        Args:
+            payload (str | dict): The payload (message body) passed in.
+            label (str): The entity set name, default to the batch one.
+
+        Returns:
+            The BatchResult of the operation, use `id` for the unique
+            identifier (ID) of the created entity.
+        """
+
+        return self._queue('POST', f'{self.entity.root_url}/{label or self.label}', payload)
+
+
+    def update(self, id, payload, label=None):
+        """Queue Update Entity.
+
+        Args:
+            id (str): The unique identifier (ID) of the entity.
+            payload (str | dict): The payload (message body) passed in.
+            label (str): The entity set name, default to the batch one.
+
+        Returns:
+            The BatchResult of the operation.
+        """
+
+        # Don't perform create for this update
+        return self._queue('PATCH', f'{self.entity.root_url}/{label or self.label}({id})', payload,
+                           header={'If-Match': '*'})
+
+
+    def delete(self, id, label=None):
+        """Queue Delete Entity.
+
+        Args:
+            id (str): The unique identifier (ID) of the entity.
+            label (str): The entity set name, default to the batch one.
+
+        Returns:
+            The BatchResult of the operation.
+        """
+
+        return self._queue('DELETE', f'{self.entity.root_url}/{label or self.label}({id})')
+
+
+    def associate(self, primary_id, collection, secondary, secondary_id, update=False, label=None):
+        """Queue Associate Entity.
+
+        Args:
+            primary_id (str): The unique identifier (ID) of the primary
+                entity.
+            collection (str): The collection to associate the entity to.
+            secondary (str): The secondary entity name.
+            secondary_id (str): The unique identifier (ID) of the
+                secondary entity.
+            update (bool): Determine whether or not this is an update
+                operation to change the reference.
+            label (str): The entity set name, default to the batch one.
+
+        Returns:
+            The BatchResult of the operation.
+        """
+
+        request_url = f'{self.entity.root_url}/{label or self.label}({primary_id})/{collection}/$ref'
+
+        # Create payload
+        if update:
+            # Change the reference in a single valued navigation property
+            payload = {
+                '@odata.id': f'{secondary}({secondary_id})'
+            }
+        else:
+            # Add a reference to a collection value navigation property
+            payload = {
+                '@odata.id': f'{self.entity.root_url}/{secondary}({secondary_id})'
+            }
+
+        return self._queue('POST', request_url, payload)
+
+
+    def _chunks(self, items):
+        """Split the items in chunks of at most `max_size` operations.
+
+        A changeset is never split between chunks.
+        """
+
+        chunk = []
+        size = 0
+
+        for item in items:
+            item_size = len(item) if isinstance(item, list) else 1
+            if chunk and size + item_size > self.max_size:
+                yield chunk
+                chunk = []
+                size = 0
+            chunk.append(item)
+            size += item_size
+
+        if chunk:
+            yield chunk
+
+
+    def send(self):
+        """Send Batch.
+
+        Send the queued operations, one `$batch` request per chunk.
+
+        Returns:
+            A list for the BatchResult of each operation, in the order
+            they were queued.
+        """
+
+        items, self.items = self.items, []
+
+        for chunk in self._chunks(items):
+            self._send_chunk(chunk)
+
+        # Collect the results in the order they were queued
+        results = [operation.result for operation in _operations(items)]
+        self.results.extend(results)
+
+        return results
+
+
+    def _send_chunk(self, chunk):
+        """Send a single `$batch` request for the chunk."""
+
+        boundary = f'batch_{uuid.uuid4()}'
+        body = build_batch(chunk, boundary)
+
+        # Create header
+        header = self.entity.get_header()
+        header['Content-Type'] = f'multipart/mixed; boundary="{boundary}"'
+        if self.continue_on_error:
+            header['Prefer'] = 'odata.continue-on-error'
+
+        # Send the request for a response
+        r = self.entity.transport.post(url=f'{self.entity.root_url}/$batch',
+                                       headers=header,
+                                       data=body.encode('utf-8'))
+
+        content_type = r.headers.get('Content-Type', '')
+        text = r.content.decode(_parse_parameter(content_type, 'charset') or 'utf-8', errors='replace')
+
+        # The whole batch failed, record the error on each operation
+        if r.status_code != 200:
+            for operation in _operations(chunk):
+                _fill_result(operation.result, r.status_code, dict(r.headers), text)
+            return
+
+        _apply_responses(chunk, parse_batch(text, content_type))
+
+        # The cached records changed by the batch are out of date
+        for operation in _operations(chunk):
+            if operation.method != 'POST' or operation.url.endswith('/$ref'):
+                self.entity._invalidate(_record_url(operation.url))
+
+
+def build_batch(items, boundary):
+    """Build the multipart `$batch` request body.
+
+    Args:
+        items (list): The operations and changesets (list of operations).
+        boundary (str): The batch boundary.
+
+    Returns:
+        A string for the request body.
+    """
+
+    lines = []
+
+    for item in items:
+        lines.append(f'--{boundary}')
+
+        if isinstance(item, list):
+            # Changeset
+            changeset_boundary = f'changeset_{uuid.uuid4()}'
+            lines.append(f'Content-Type: multipart/mixed; boundary="{changeset_boundary}"')
+            lines.append('')
+            for content_id, operation in enumerate(item, 1):
+                lines.append(f'--{changeset_boundary}')
+                lines.extend(_build_operation(operation, content_id))
+            lines.append(f'--{changeset_boundary}--')
+        else:
+            lines.extend(_build_operation(item))
+
+    lines.append(f'--{boundary}--')
+    lines.append('')
+
+    return '\r\n'.join(lines)
+
+
+def _build_operation(operation, content_id=None):
+    """Build the lines of a single operation part."""
+
+    lines = [
+        'Content-Type: application/http',
+        'Content-Transfer-Encoding: binary'
+    ]
+    if content_id is not None:
+        lines.append(f'Content-ID: {content_id}')
+    lines.append('')
+
+    lines.append(f'{operation.method} {operation.url} HTTP/1.1')
+    for key, value in operation.header.items():
+        lines.append(f'{key}: {value}')
+
+    if operation.payload is not None:
+        payload = operation.payload
+        if isinstance(payload, bytes):
+            payload = payload.decode('utf-8')
+        lines.append('Content-Type: application/json; type=entry')
+        lines.append('')
+        lines.append(payload)
+    else:
+        lines.append('')
+
+    lines.append('')
+
+    return lines
+
+
+def _parse_parameter(content_type, name):
+    """Parse a parameter (e.g. the boundary) of a content type."""
+
+    for parameter in content_type.split(';'):
+        key, _, value = parameter.strip().partition('=')
+        if key.lower() == name:
+            return value.strip('"')
+
+    return None
+
+
+def _split_message(text):
+    """Split a message at the first blank line.
+
+    Returns:
+        A tuple (list of head lines, body).
+    """
+
+    text = text.lstrip('\r\n')
+    head, separator, body = text.partition('\r\n\r\n')
+    if not separator:
+        head, _, body = text.partition('\n\n')
+
+    return head.splitlines(), body
+
+
+def _parse_headers(lines):
+    """Parse the header lines into a dictionary."""
+
+    headers = {}
+    for line in lines:
+        key, _, value = line.partition(':')
+        headers[key.strip()] = value.strip()
+
+    return headers
+
+
+def parse_batch(text, content_type):
+    """Parse the multipart `$batch` response body.
+
+    Args:
+        text (str): The response body.
+        content_type (str): The `Content-Type` of the response.
+
+    Returns:
+        A list for the parsed responses, each one is a tuple (status
+        code, headers, body, content ID), or a list of them for a
+        successful changeset.
+    """
+
+    boundary = _parse_parameter(content_type, 'boundary')
+    if boundary is None:
+        return []
+
+    responses = []
+
+    for part in text.split(f'--{boundary}')[1:]:
+        # The closing boundary
+        if part.startswith('--'):
+            break
+
+        # Parse the part headers
+        part_lines, part_body = _split_message(part)
+        part_header = {key.lower(): value for key, value in _parse_headers(part_lines).items()}
+        part_type = part_header.get('content-type', '')
+
+        if part_type.startswith('multipart/mixed'):
+            # Changeset
+            responses.append(parse_batch(part_body, part_type))
+            continue
+
+        # Parse the response status line, headers and body
+        lines, body = _split_message(part_body)
+        status_line = lines[0] if lines else ''
+        status_code = int(status_line.split(' ')[1]) if status_line.startswith('HTTP/') else None
+
+        responses.append((status_code, _parse_headers(lines[1:]), body.rstrip('\r\n'),
+                          part_header.get('content-id')))
+
+    return responses
+
+
+def _operations(items):
+    """Iterate the operations of the items, flattening the changesets."""
+
+    for item in items:
+        if isinstance(item, list):
+            yield from item
+        else:
+            yield item
+
+
+def _record_url(url):
+    """The record URL of an operation URL (e.g. of a `$ref`)."""
+
+    end = url.find(')')
+    return url if end < 0 else url[:end + 1]
+
+
+def _fill_result(result, status_code, headers, text):
+    """Fill in the BatchResult of an operation."""
+
+    result.status_code = status_code
+    result.headers = headers
+    result.text = text
+
+
+def _apply_responses(chunk, responses):
+    """Match the parsed responses to the operations of the chunk."""
+
+    # Operations without a response were not executed (stopped at an error)
+    for item, response in zip(chunk, responses):
+        if not isinstance(item, list):
+            if isinstance(response, tuple):
+                _fill_result(item.result, *response[:3])
+            continue
+
+        if isinstance(response, tuple):
+            # The changeset failed as a whole
+            for operation in item:
+                _fill_result(operation.result, *response[:3])
+            continue
+
+        # Match the changeset responses by content ID, then by order
+        by_content_id = {str(content_id): (status_code, header, body)
+                         for status_code, header, body, content_id in response
+                         if content_id is not None}
+        for content_id, operation in enumerate(item, 1):
+            if str(content_id) in by_content_id:
+                _fill_result(operation.result, *by_content_id[str(content_id)])
+            elif content_id <= len(response):
+                _fill_result(operation.result, *response[content_id - 1][:3])
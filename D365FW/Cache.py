@@ -0,0 +1,113 @@
+"""
+D365FW.Cache
+~~~~~~~~~~~~
+"""
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+class RecordCache(object):
+    """Record Cache.
+
+    In memory LRU (Least Recently Used) cache of the records read by
+    unique identifier (ID), keyed by the record URL (Uniform Resource
+    Locator) with the `@odata.etag` of each record. A record is used as
+    is for `ttl` seconds, then revalidated with a conditional request
+    (`If-None-Match`) and reused when the service answers 304 Not
+    Modified.
+    """
+
+    def __init__(self, max_size=1024, ttl=60):
+        """Constructor.
+
+        Args:
+            max_size (int): The maximum number of records, the least
+                recently used one is dropped first.
+            ttl (float): The number of seconds a record is used without
+                revalidation, 0 to revalidate on every read.
+        """
+
+        self.max_size = max_size
+        self.ttl = ttl
+
+        # Map the record URL to a list [etag, record, stored at]
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+
+    def get(self, url):
+        """Get Record.
+
+        Args:
+            url (str): The record URL.
+
+        Returns:
+            A tuple (etag, copy of the record, fresh) where fresh is True
+            if the record can be used without revalidation, or None if
+            the record is not cached.
+        """
+
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is None:
+                return None
+
+            self._entries.move_to_end(url)
+            etag, record, stored_at = entry
+
+        return etag, copy.deepcopy(record), time.monotonic() - stored_at < self.ttl
+
+
+    def set(self, url, etag, record):
+        """Set Record.
+
+        Args:
+            url (str): The record URL.
+            etag (str): The `@odata.etag` of the record.
+            record (dict): The record.
+        """
+
+        with self._lock:
+            self._entries[url] = [etag, copy.deepcopy(record), time.monotonic()]
+            self._entries.move_to_end(url)
+
+            # Drop the least recently used records
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+
+    def refresh(self, url):
+        """Restart the time to live of a revalidated record.
+
+        Args:
+            url (str): The record URL.
+        """
+
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is not None:
+                entry[2] = time.monotonic()
+
+
+    def invalidate(self, url):
+        """Drop a record.
+
+        Args:
+            url (str): The record URL.
+        """
+
+        with self._lock:
+            self._entries.pop(url, None)
+
+
+    def clear(self):
+        """Drop all the records."""
+
+        with self._lock:
+            self._entries.clear()
+
+
+    def __len__(self):
+        return len(self._entries)
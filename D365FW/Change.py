@@ -0,0 +1,46 @@
+"""
+D365FW.Change
+~~~~~~~~~~~~~
+"""
+
+class ChangeResult(object):
+    """Change Result.
+
+    The changes of an entity set since the last change tracking read.
+    """
+
+    def __init__(self, changed, deleted, delta_link, initial=False):
+        """Constructor.
+
+        Args:
+            changed (list): The new and updated records.
+            deleted (list): The unique identifier (ID) of each deleted
+                record.
+            delta_link (str): The `@odata.deltaLink` to read the next
+                changes from, None if the service did not return one.
+            initial (bool): Determine whether or not this is a full read
+                (there was no delta link, or it expired).
+        """
+
+        self.changed = changed
+        self.deleted = deleted
+        self.delta_link = delta_link
+        self.initial = initial
+
+
+    def __repr__(self):
+        return (f'<ChangeResult changed={len(self.changed)} deleted={len(self.deleted)} '
+                f'initial={self.initial}>')
+
+
+def is_deleted(record):
+    """Check if a change tracking record is a deleted entity.
+
+    Args:
+        record (dict): The record of a change tracking page.
+
+    Returns:
+        True if the record marks a deleted entity.
+    """
+
+    return '$deletedEntity' in record.get('@odata.context', '') or record.get('reason') == 'deleted'
@@ -0,0 +1,146 @@
+"""
+D365FW.Checkpoint
+~~~~~~~~~~~~~~~~~
+"""
+
+import copy
+import json
+import os
+import threading
+
+from D365FW.Storage import file_lock, atomic_write
+
+class MemoryCheckpointStore(object):
+    """Memory Checkpoint Store.
+
+    In memory checkpoint store, for test or a single process keeping
+    its checkpoints between calls. A checkpoint store maps a key (e.g.
+    the entity set name) to a JSON (JavaScript Object Notation)
+    serializable checkpoint, any object with the same `get`, `set` and
+    `delete` methods can be used instead (e.g. backed by a database).
+    """
+
+    def __init__(self):
+        """Constructor."""
+
+        self._checkpoints = {}
+        self._lock = threading.Lock()
+
+
+    def get(self, key):
+        """Get Checkpoint.
+
+        Args:
+            key (str): The checkpoint key.
+
+        Returns:
+            The checkpoint, or None if there is none.
+        """
+
+        with self._lock:
+            return copy.deepcopy(self._checkpoints.get(key))
+
+
+    def set(self, key, checkpoint):
+        """Set Checkpoint.
+
+        Args:
+            key (str): The checkpoint key.
+            checkpoint (dict): The checkpoint.
+        """
+
+        with self._lock:
+            self._checkpoints[key] = copy.deepcopy(checkpoint)
+
+
+    def delete(self, key):
+        """Delete Checkpoint.
+
+        Args:
+            key (str): The checkpoint key.
+        """
+
+        with self._lock:
+            self._checkpoints.pop(key, None)
+
+
+class FileCheckpointStore(object):
+    """File Checkpoint Store.
+
+    On disk checkpoint store, all the checkpoints are kept in a JSON
+    (JavaScript Object Notation) file written atomically under a file
+    lock, so a checkpoint survives a crash of the process and can be
+    shared by the processes on a machine.
+    """
+
+    def __init__(self, path):
+        """Constructor.
+
+        Args:
+            path (str): The path of the checkpoint file.
+        """
+
+        self.path = path
+        self.lock_path = f'{path}.lock'
+
+        # Create the checkpoint directory
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+
+    def _load(self):
+        """Load all the checkpoints, call while holding the lock."""
+
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+
+    def _save(self, checkpoints):
+        """Save all the checkpoints atomically, call while holding the lock."""
+
+        with atomic_write(self.path) as f:
+            json.dump(checkpoints, f)
+
+
+    def get(self, key):
+        """Get Checkpoint.
+
+        Args:
+            key (str): The checkpoint key.
+
+        Returns:
+            The checkpoint, or None if there is none.
+        """
+
+        with file_lock(self.lock_path):
+            return self._load().get(key)
+
+
+    def set(self, key, checkpoint):
+        """Set Checkpoint.
+
+        Args:
+            key (str): The checkpoint key.
+            checkpoint (dict): The checkpoint.
+        """
+
+        with file_lock(self.lock_path):
+            checkpoints = self._load()
+            checkpoints[key] = checkpoint
+            self._save(checkpoints)
+
+
+    def delete(self, key):
+        """Delete Checkpoint.
+
+        Args:
+            key (str): The checkpoint key.
+        """
+
+        with file_lock(self.lock_path):
+            checkpoints = self._load()
+            if checkpoints.pop(key, None) is not None:
+                self._save(checkpoints)
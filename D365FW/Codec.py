@@ -0,0 +1,134 @@
+"""
+D365FW.Codec
+~~~~~~~~~~~~
+"""
+
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+class JsonCodec(object):
+    """JSON Codec.
+
+    Encode and decode the JSON (JavaScript Object Notation) message
+    bodies with the standard library `json`, decoding straight from the
+    response bytes.
+    """
+
+    name = 'json'
+
+    @staticmethod
+    def loads(data):
+        """Decode the JSON bytes (or str) to an object."""
+
+        return json.loads(data)
+
+
+    @staticmethod
+    def dumps(obj):
+        """Encode the object to JSON bytes."""
+
+        return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class OrjsonCodec(JsonCodec):
+    """orjson Codec.
+
+    Encode and decode the JSON message bodies with `orjson`.
+    """
+
+    name = 'orjson'
+
+    @staticmethod
+    def loads(data):
+        """Decode the JSON bytes (or str) to an object."""
+
+        return orjson.loads(data)
+
+
+    @staticmethod
+    def dumps(obj):
+        """Encode the object to JSON bytes."""
+
+        return orjson.dumps(obj)
+
+
+class MsgspecCodec(JsonCodec):
+    """msgspec Codec.
+
+    Encode and decode the JSON message bodies with `msgspec`.
+    """
+
+    name = 'msgspec'
+
+    @staticmethod
+    def loads(data):
+        """Decode the JSON bytes (or str) to an object."""
+
+        return msgspec.json.decode(data)
+
+
+    @staticmethod
+    def dumps(obj):
+        """Encode the object to JSON bytes."""
+
+        return msgspec.json.encode(obj)
+
+
+# The codecs by name, the fastest installed one is the default
+CODECS = {
+    'orjson': OrjsonCodec if orjson is not None else None,
+    'msgspec': MsgspecCodec if msgspec is not None else None,
+    'json': JsonCodec
+}
+
+def get_codec(codec=None):
+    """Get Codec.
+
+    Args:
+        codec (str | JsonCodec): The codec name (`orjson`, `msgspec` or
+            `json`) or codec, default to the fastest installed one.
+
+    Returns:
+        The codec.
+
+    Raises:
+        ValueError: The named codec is unknown or not installed.
+    """
+
+    if codec is None:
+        return next(codec for codec in CODECS.values() if codec is not None)
+
+    if not isinstance(codec, str):
+        return codec
+
+    if CODECS.get(codec) is None:
+        raise ValueError(f'The JSON codec is unknown or not installed: {codec}')
+
+    return CODECS[codec]
+
+
+def encode_payload(codec, payload):
+    """Encode Payload.
+
+    Args:
+        codec (JsonCodec): The codec.
+        payload (dict | list | str | bytes): The payload, a str or bytes
+            is already serialized.
+
+    Returns:
+        The payload to send, bytes or str.
+    """
+
+    if payload is None or isinstance(payload, (str, bytes)):
+        return payload
+
+    return codec.dumps(payload)
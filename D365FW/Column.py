@@ -0,0 +1,273 @@
+"""
+D365FW.Column
+~~~~~~~~~~~~~
+"""
+
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# The column kind of each attribute type of the metadata
+ATTRIBUTE_KINDS = {
+    'Integer': 'q',
+    'BigInt': 'q',
+    'Picklist': 'q',
+    'State': 'q',
+    'Status': 'q',
+    'Double': 'd',
+    'Decimal': 'd',
+    'Money': 'd',
+    'Boolean': 'b',
+    'DateTime': 'datetime'
+}
+
+class Columns(dict):
+    """Columns.
+
+    Column oriented read result, mapping each attribute to its column.
+    A numeric column is a typed `array` (`q` integer, `d` float, `b`
+    boolean), or a NumPy array; any other column is a list. A missing
+    value is None in a list, NaN in a float column, and 0 in an integer
+    or boolean column with the column validity in `masks`.
+    """
+
+    def __init__(self, columns, masks, length):
+        """Constructor.
+
+        Args:
+            columns (dict): The column of each attribute.
+            masks (dict): The validity (1 for a value, 0 for missing) of
+                each integer and boolean column with a missing value.
+            length (int): The number of rows.
+        """
+
+        super().__init__(columns)
+
+        self.masks = masks
+        self.length = length
+
+
+    def __repr__(self):
+        return f'<Columns {self.length} rows {list(self)}>'
+
+
+class ColumnBuilder(object):
+    """Column Builder.
+
+    Build the columns incrementally as each page of records arrives, so
+    the records of a page can be released before the next one is read.
+    The kind of a column is the type of its attribute in the metadata
+    when known, otherwise the type of its first value; a column is
+    widened (integer to float, or to a list) when a value does not fit.
+    """
+
+    def __init__(self, types=None, use_numpy=None):
+        """Constructor.
+
+        Args:
+            types (dict): The metadata attribute type of each attribute
+                (e.g. `Integer`, `Money`), see `Metadata.attributes`.
+            use_numpy (bool): Determine whether or not to return NumPy
+                arrays, default to True when NumPy is installed.
+        """
+
+        self.types = types or {}
+        self.use_numpy = numpy is not None if use_numpy is None else use_numpy
+
+        if self.use_numpy and numpy is None:
+            raise ImportError('The NumPy columns require numpy, install it with `pip install numpy`.')
+
+        self.length = 0
+        self._columns = {}
+        self._kinds = {}
+        self._masks = {}
+
+
+    def _kind_of(self, name, value):
+        """Get the kind of a new column."""
+
+        # The lookup value of an attribute (e.g. `_parentaccountid_value`)
+        attribute = name[1:-6] if name.startswith('_') and name.endswith('_value') else name
+        kind = ATTRIBUTE_KINDS.get(self.types.get(attribute))
+        if kind is not None:
+            return kind
+
+        if value is None:
+            # Wait for a value to choose the kind
+            return 'pending'
+        if isinstance(value, bool):
+            return 'b'
+        if isinstance(value, int):
+            return 'q'
+        if isinstance(value, float):
+            return 'd'
+
+        return 'list'
+
+
+    @staticmethod
+    def _fits(kind, value):
+        """Check if a value fits a typed column."""
+
+        if kind == 'd':
+            return isinstance(value, (int, float))
+        if kind == 'q':
+            return isinstance(value, int) and not isinstance(value, bool) and -2 ** 63 <= value < 2 ** 63
+        if kind == 'b':
+            return isinstance(value, bool)
+        if kind == 'datetime':
+            return isinstance(value, str)
+
+        return True
+
+
+    def _new_column(self, name, kind, count):
+        """Create a column of `count` missing values."""
+
+        self._kinds[name] = kind
+        self._masks.pop(name, None)
+
+        if kind == 'd':
+            column = array('d', [float('nan')]) * count
+        elif kind in ('q', 'b'):
+            column = array(kind, [0]) * count
+            if count:
+                self._masks[name] = array('b', [0]) * count
+        else:
+            column = [None] * count
+
+        self._columns[name] = column
+
+        return column
+
+
+    def _widen(self, name, value):
+        """Widen a column for a value that does not fit it, integer to
+        float for a float value, otherwise to a list.
+
+        Returns:
+            The widened column.
+        """
+
+        kind = self._kinds[name]
+        column = self._columns[name]
+        mask = self._masks.pop(name, None)
+
+        # The values with None for the missing ones
+        if kind == 'd':
+            values = [None if v != v else v for v in column]
+        else:
+            values = [bool(v) if kind == 'b' else v for v in column]
+            if mask is not None:
+                values = [v if valid else None for v, valid in zip(values, mask)]
+
+        if kind == 'q' and isinstance(value, float):
+            self._kinds[name] = 'd'
+            column = array('d', (float('nan') if v is None else v for v in values))
+        else:
+            self._kinds[name] = 'list'
+            column = values
+
+        self._columns[name] = column
+
+        return column
+
+
+    def _append(self, name, value):
+        """Append a value to a column."""
+
+        column = self._columns.get(name)
+        if column is None:
+            column = self._new_column(name, self._kind_of(name, value), self.length)
+
+        if value is None:
+            self._append_missing(name)
+            return
+
+        kind = self._kinds[name]
+
+        # Choose the kind of a column of missing values
+        if kind == 'pending':
+            column = self._new_column(name, self._kind_of(name, value), len(column))
+        elif not self._fits(kind, value):
+            column = self._widen(name, value)
+
+        column.append(value)
+
+        mask = self._masks.get(name)
+        if mask is not None:
+            mask.append(1)
+
+
+    def _append_missing(self, name):
+        """Append a missing value to a column."""
+
+        kind = self._kinds[name]
+        column = self._columns[name]
+
+        if kind == 'd':
+            column.append(float('nan'))
+        elif kind in ('q', 'b'):
+            mask = self._masks.get(name)
+            if mask is None:
+                mask = self._masks[name] = array('b', [1]) * len(column)
+            column.append(0)
+            mask.append(0)
+        else:
+            column.append(None)
+
+
+    def add(self, records):
+        """Add the records of a page.
+
+        Args:
+            records (list): The records (dict) of the page.
+        """
+
+        for record in records:
+            for name, value in record.items():
+                # Skip the annotations
+                if '@' not in name:
+                    self._append(name, value)
+
+            self.length += 1
+
+            # Fill the columns missing from the record
+            for name, column in self._columns.items():
+                if len(column) < self.length:
+                    self._append_missing(name)
+
+
+    def build(self):
+        """Build the columns.
+
+        Returns:
+            The Columns of all the records added.
+        """
+
+        columns = {}
+
+        for name, column in self._columns.items():
+            kind = self._kinds[name]
+
+            if not self.use_numpy:
+                columns[name] = column
+            elif kind == 'd' or kind == 'q':
+                columns[name] = numpy.frombuffer(column, dtype=numpy.float64 if kind == 'd' else numpy.int64)
+            elif kind == 'b':
+                columns[name] = numpy.frombuffer(column, dtype=numpy.int8).astype(bool)
+            elif kind == 'datetime':
+                # NumPy datetime64 has no time zone, the values are in UTC
+                columns[name] = numpy.array([None if value is None else value.rstrip('Z') for value in column],
+                                            dtype='datetime64[ms]')
+            else:
+                columns[name] = numpy.array(column, dtype=object)
+
+        masks = dict(self._masks)
+        if self.use_numpy:
+            masks = {name: numpy.frombuffer(mask, dtype=numpy.int8).astype(bool) for name, mask in masks.items()}
+
+        return Columns(columns, masks, self.length)
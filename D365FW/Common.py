@@ -4,12 +4,313 @@ D365FW.Common
 """
 
 import re
+import threading
 from requests import Request, Session
 
-class Common:
+from D365FW.Codec import get_codec, encode_payload
+from D365FW.Constant import D365_API_V
+from D365FW.Query import compile_query
 
-    def __init__(self):
+class Common(object):
+    """Common.
+
+    The access token and header shared by the Entity and AsyncEntity.
+    Each attribute that is not defined (e.g. `accounts`) is an entity
+    set handle, created once per name and cached.
+    """
+
+    # The entity set handle class, set by the subclass
+    entity_set_class = None
+
+    def __init__(self, access, hostname, root_url=None, codec=None):
+        """Constructor.
+
+        Args:
+            access (str | Access): The Microsoft Dynamics 365 access
+                token, or the Access object to read the current
+                (refreshed) access token from on each request.
+            hostname (str): The Hostname of the environment.
+            root_url (str): The root URL of the Web API, default to the
+                one of the environment (e.g. a local server for test).
+            codec (str | JsonCodec): The JSON codec (`orjson`, `msgspec`
+                or `json`), default to the fastest installed one.
+        """
+
+        # Create the entity set handle cache first, see `__getattr__`
+        self._entity_sets = {}
+        self._entity_sets_lock = threading.Lock()
+
+        # Get the access token and set the URL (Uniform Resource Locator)
+        self.access = access
+        self.access_token = access if isinstance(access, str) else None
+        self.hostname = hostname
+        self.root_url = root_url or f'https://{hostname}.api.crm.dynamics.com/api/data/v{D365_API_V}'
+
+        # Create header, the `Authorization` is added on each request
+        self.header = {
+            'Content-Type': 'application/json; charset=utf-8',
+            'Accept': 'application/json',
+            'OData-Version': '4.0',
+            'OData-MaxVersion': '4.0'
+        }
+
+        # Set the JSON codec
+        self.codec = get_codec(codec)
+
+
+    def get_access_token(self):
+        """Get the current access token."""
+
+        if self.access_token is not None:
+            return self.access_token
+
+        return self.access.get_token()
+
+
+    def get_header(self, header=None):
+        """Get Request Header.
+
+        Args:
+            header (dict): The header to add the `Authorization` to,
+                default to the client header.
+
+        Returns:
+            A new dictionary for the request header with the current
+            access token.
+        """
+
+        # Create header
+        header = dict(self.header if header is None else header)
+        header['Authorization'] = f'Bearer {self.get_access_token()}'
+
+        return header
+
+
+    def __getattr__(self, label):
+        """Get Attribute Passed In.
+
+        Args:
+            label (str): The attribute passed in, the entity set name.
+
+        Returns:
+            The cached entity set handle for the label.
+        """
+
+        # Private and special attributes are never entity sets
+        if label.startswith('_') or '_entity_sets' not in self.__dict__:
+            raise AttributeError(label)
+
+        # Get the cached handle
+        entity_set = self._entity_sets.get(label)
+
+        if entity_set is None:
+            with self._entity_sets_lock:
+                entity_set = self._entity_sets.get(label)
+                if entity_set is None:
+                    entity_set = self._entity_sets[label] = self.entity_set_class(self, label)
+
+        return entity_set
+
+
+class CommonEntitySet(object):
+    """Common Entity Set.
+
+    Immutable handle of an entity set of the client, with its own
+    precomputed URL (Uniform Resource Locator) and header sets, so it
+    can be shared by many threads. The URL building is shared by the
+    EntitySet and AsyncEntitySet.
+    """
+
+    __slots__ = ('client', 'label', 'root_url', 'url', 'header', 'update_header')
+
+    def __init__(self, client, label):
         """Constructor.
+
+        Args:
+            client (Common): The client the entity set belongs to.
+            label (str): The entity set name.
         """
 
-        pass
\ No newline at end of file
+        # Precompute the URL and header sets
+        set_attribute = object.__setattr__
+        set_attribute(self, 'client', client)
+        set_attribute(self, 'label', label)
+        set_attribute(self, 'root_url', client.root_url)
+        set_attribute(self, 'url', f'{client.root_url}/{label}')
+        set_attribute(self, 'header', dict(client.header))
+        # Don't perform create for the update
+        set_attribute(self, 'update_header', dict(client.header, **{'If-Match': '*'}))
+
+
+    def __setattr__(self, key, value):
+        raise AttributeError(f'{type(self).__name__} is immutable.')
+
+
+    def __delattr__(self, key):
+        raise AttributeError(f'{type(self).__name__} is immutable.')
+
+
+    def __repr__(self):
+        return f'<{type(self).__name__} {self.label}>'
+
+
+    @property
+    def codec(self):
+        """The JSON codec of the client."""
+
+        return self.client.codec
+
+
+    def _encode(self, payload):
+        """Encode the payload (dict) with the JSON codec, a str or bytes
+        payload is sent as is."""
+
+        return encode_payload(self.client.codec, payload)
+
+
+    def get_header(self, header=None):
+        """Get Request Header.
+
+        Args:
+            header (dict): The header set to use, default to `header`.
+
+        Returns:
+            A new dictionary for the request header with the current
+            access token.
+        """
+
+        return self.client.get_header(self.header if header is None else header)
+
+
+    def _read_url(self, id=None):
+        """Create the read request URL (Uniform Resource Locator).
+
+        Args:
+            id (str): The unique identifier (ID) of the entity.
+
+        Returns:
+            A string for the request URL.
+        """
+
+        if id is not None:
+            # Read a single record
+            return f'{self.url}({id})'
+
+        # Read all records
+        return self.url
+
+
+    def _associate_request(self, primary_id, collection, secondary, secondary_id, update=False):
+        """Create the associate request URL and payload.
+
+        Returns:
+            A tuple (request URL, payload).
+        """
+
+        # Create request URL
+        request_url = f'{self.url}({primary_id})/{collection}/$ref'
+
+        # Create payload
+        if update:
+            # Change the reference in a single valued navigation property
+            payload = {
+                '@odata.id': f'{secondary}({secondary_id})'
+            }
+        else:
+            # Add a reference to a collection value navigation property
+            payload = {
+                '@odata.id': f'{self.root_url}/{secondary}({secondary_id})'
+            }
+
+        return request_url, payload
+
+
+    def _disassociate_url(self, primary_id, collection, collection_id=None, secondary=None, secondary_id=None):
+        """Create the disassociate request URL.
+
+        Returns:
+            A string for the request URL, or None if the arguments do
+            not describe a reference.
+        """
+
+        if secondary and collection_id is None:
+            # Disassociate with primary and secondary entity
+            return f'{self.url}({primary_id})/{collection}/$ref?$id={self.root_url}/{secondary}({secondary_id})'
+        elif collection_id and (secondary is None and secondary_id is None):
+            # Disassociate with primary and collection entity
+            return f'{self.url}({primary_id})/{collection}({collection_id})'
+
+        return None
+
+
+    def _query_url(self, query=None, **kwargs):
+        """Create the query request URL.
+
+        Args:
+            query (Query): The compiled query, or None to compile the
+                keyword arguments.
+            kwargs (dict): The parameters of the compiled query, or the
+                query options (e.g. `select`, `filter`).
+
+        Returns:
+            A string for the request URL.
+        """
+
+        if query is not None:
+            return query.url(self.url, **kwargs)
+
+        # Compile the query options once, without parameter slot
+        options = {key: value.replace('{', '{{').replace('}', '}}') if isinstance(value, str) else value
+                   for key, value in kwargs.items()}
+
+        return compile_query(options).url(self.url)
+
+
+def parse_entity_id(entity_url):
+    """Parse Entity ID.
+
+    Args:
+        entity_url (str): The URL (Uniform Resource Locator) of the
+            entity, e.g. the `OData-EntityId` header.
+
+    Returns:
+        A string for the unique identifier (ID) of the entity, or None
+        if there is none.
+    """
+
+    if not entity_url:
+        return None
+
+    # Parse the unique identifier (ID) between the last parentheses
+    begin_id = entity_url.rfind('(') + 1
+    end_id = entity_url.find(')', begin_id)
+
+    if begin_id == 0 or end_id == -1:
+        return None
+
+    return entity_url[begin_id:end_id]
+
+
+def logical_name_of(entity_set):
+    """Logical Name Of Entity Set.
+
+    Derive the entity logical name from the (plural) entity set name,
+    e.g. `accounts` to `account` and `opportunities` to `opportunity`.
+
+    Args:
+        entity_set (str): The entity set name.
+
+    Returns:
+        A string for the entity logical name.
+    """
+
+    if entity_set.endswith('ies'):
+        return f'{entity_set[:-3]}y'
+
+    if re.search(r'(ss|x|ch|sh)es$', entity_set):
+        return entity_set[:-2]
+
+    if entity_set.endswith('s'):
+        return entity_set[:-1]
+
+    return entity_set
@@ -5,4 +5,12 @@ D365FW.Constant
 
 D365_API_V = '9.2'
 
-TEST_FILE = 'TestData.json'
\ No newline at end of file
+# The maximum number of records and payload bytes per bulk (CreateMultiple) request
+BULK_MAX_SIZE = 1000
+BULK_MAX_BYTES = 8 * 1024 * 1024
+
+TEST_FILE = 'TestData.json'
+
+TOKEN_CACHE_FILE = '.d365fw/token_cache.json'
+
+METADATA_CACHE_DIR = '.d365fw/metadata'
\ No newline at end of file
@@ -3,9 +3,9 @@ D365FW
 ~~~~~~
 """
 
-from D365FW.Access import Access
+from D365FW.Access import Access, LoginError
 from D365FW.Entity import Entity
-from D365FW.Constant import D365_API_V
+from D365FW.Transport import Transport
 
 class D365FW(Entity):
     """D365FW Object
@@ -14,7 +14,8 @@ class D365FW(Entity):
     Programing Interface).
     """
 
-    def __init__(self, hostname, client_id, client_secret, tenant_id):
+    def __init__(self, hostname, client_id, client_secret, tenant_id, transport=None, token_cache=None,
+                 root_url=None, record_cache=None, metadata_cache=None, codec=None):
         """Constructor.
 
         Args:
@@ -22,22 +23,44 @@ class D365FW(Entity):
             client_id (str): The Application (client) ID of the application.
             client_secret (str): The client secret of the application.
             tenant_id (str): The Directory (tenant) ID of the application.
+            transport (Transport): The pooled HTTP transport shared by
+                the login and every Entity request, a new one is
+                created if None.
+            token_cache (FileTokenCache | bool): The on disk token cache
+                shared by all processes on the machine, True to use the
+                default cache file, or None to disable it.
+            root_url (str): The root URL of the Web API, default to the
+                one of the environment.
+            record_cache (RecordCache | bool): The cache of the records
+                read by unique identifier (ID), True to use the default
+                RecordCache, or None to disable it.
+            metadata_cache (FileMetadataCache | bool): The on disk cache
+                of the metadata, True to use the default cache directory,
+                or None to fetch the metadata on each start.
+            codec (str | JsonCodec): The JSON codec (`orjson`, `msgspec`
+                or `json`), default to the fastest installed one.
+
+        Raises:
+            LoginError: The login failed.
         """
 
+        # Create the transport shared by Access and Entity
+        transport = transport if transport is not None else Transport()
+
         # Create an instance of Access object and login
+        # The Access object keeps the access token refreshed
         access = Access(hostname=hostname,
                         client_id=client_id,
                         client_secret=client_secret,
-                        tenant_id=tenant_id).login()
-
-        # Set the root URL (Uniform Resource Locator)
-        self.root_url = f'https://{hostname}.api.crm.dynamics.com/api/data/v{D365_API_V}'
-
-        # Create header
-        self.header = {
-            'Authorization': 'Bearer ' + access,
-            'Content-Type': 'application/json; charset=utf-8',
-            'Accept': 'application/json',
-            'OData-Version': '4.0',
-            'OData-MaxVersion': '4.0'
-        }
+                        tenant_id=tenant_id,
+                        transport=transport,
+                        token_cache=token_cache)
+        if access.login() is None:
+            # There was an error, never send the requests without a token
+            access.close()
+            raise LoginError(f'The login to {hostname} failed.')
+
+        # Set the root URL (Uniform Resource Locator), header and transport
+        super().__init__(access, hostname, transport=transport, root_url=root_url,
+                         record_cache=record_cache, metadata_cache=metadata_cache,
+                         codec=codec)
@@ -3,176 +3,700 @@ D365FW.Entity
 ~~~~~~~~~~~~~
 """
 
-import json
-from urllib.parse import urlencode
-import requests
-
-from D365FW.Constant import D365_API_V
-
-class Entity(object):
-    """Entity.
+import contextlib
+import os
+import threading
+from urllib.parse import quote
+
+from D365FW.Batch import Batch, BATCH_MAX_SIZE
+from D365FW.Cache import RecordCache
+from D365FW.Change import ChangeResult, is_deleted
+from D365FW.Codec import JsonCodec
+from D365FW.Column import ColumnBuilder
+from D365FW.Common import Common, CommonEntitySet, parse_entity_id, logical_name_of
+from D365FW.Constant import D365_API_V, BULK_MAX_SIZE, BULK_MAX_BYTES
+from D365FW.Executor import run_many
+from D365FW.Export import export_pages
+from D365FW.Import import Importer, read_rows
+from D365FW.Metadata import Metadata, FileMetadataCache, ENTITY_DEFINITIONS_QUERY
+from D365FW.Pager import PrefetchPager, MergePager, IncompleteReadError
+from D365FW.Partition import guid_bounds, datetime_bounds, partition_filters, parse_datetime
+from D365FW.Profiler import ProfiledCodec, profiled
+from D365FW.Query import SAFE_CHARACTERS, fetch_xml_top, page_fetch_xml, parse_paging_cookie
+from D365FW.Transport import Transport
+
+class EntitySet(CommonEntitySet):
+    """Entity Set.
+
+    Immutable handle of an entity set (e.g. `entity.accounts`) with the
+    operations on it, see `Entity`.
     """
 
-    def __init__(self, access, hostname):
-        """Constructor.
+    __slots__ = ()
 
-        Args:
-            access (str): The Microsoft Dynamics 365 access token.
-            hostname (str): The Hostname of the environment.
-        """
+    @property
+    def transport(self):
+        """The Transport of the client."""
 
-        # Get the access token and set the URL (Uniform Resource Locator)
-        self.access_token = access
-        self.root_url = f'https://{hostname}.api.crm.dynamics.com/api/data/v{D365_API_V}'
+        return self.client.transport
 
-        # Create header
-        self.header = {
-            'Authorization': 'Bearer ' + self.access_token,
-            'Content-Type': 'application/json; charset=utf-8',
-            'Accept': 'application/json',
-            'OData-Version': '4.0',
-            'OData-MaxVersion': '4.0'
-        }
 
+    @property
+    def record_cache(self):
+        """The RecordCache of the client, None if disabled."""
 
-    def __getattr__(self, label):
-        """Get Attribute Passed In.
+        return self.client.record_cache
 
-        Args:
-            label (str): The attribute passed in.
 
-        Returns:
-            A instance of the Entity class.
-        """
-        # Set the name / label
-        self.label = label
+    def _invalidate(self, request_url):
+        """Drop the cached record of the request URL."""
 
-        # Return the self instance
-        return self
+        record_cache = self.record_cache
+        if record_cache is not None:
+            record_cache.invalidate(request_url)
 
 
-    def create(self, payload):
+    @profiled('create')
+    def create(self, payload, retry=False):
         """Create Entity.
 
         Args:
-            payload (dict): The payload (message body) passed in.
+            payload (dict | str): The payload (message body) passed in,
+                a dict is serialized with the JSON codec.
+            retry (bool): Determine whether or not to send the create
+                again on a transient error, which may create a duplicate
+                if the first attempt reached the service.
 
         Returns:
             A string for the unique identifier (ID) of the Entity.
         """
 
         # Create request URL
-        request_url = f'{self.root_url}/{self.label}'
+        request_url = self.url
+
+        return self._create(request_url, payload, retry)
+
+
+    def _create(self, request_url, payload, retry=False):
+        """Send the create request, see `create`."""
 
         # Send the request for a response
-        r = requests.post(url=request_url,
-                          headers=self.header,
-                          data=payload)
+        r = self.transport.post(url=request_url,
+                                headers=self.get_header(),
+                                data=self._encode(payload),
+                                idempotent=retry or None)
 
         # Check the status code
         if r.status_code == 204:
-            # Parse the unique identifier (ID) of the entity
-            entity_url = r.headers['OData-EntityId']
-            begin_id = entity_url.find('(') + 1
-            end_id = entity_url.find(')')
-            entity_id = entity_url[begin_id:end_id]
-            # Return the unique identifier (ID) of the entity
-            return entity_id
+            # Parse and return the unique identifier (ID) of the entity
+            return parse_entity_id(r.headers['OData-EntityId'])
 
         # There was an error
         return None
 
 
-    def read(self, id=None):
+    @profiled('read')
+    def read(self, id=None, stream=False, page=False, page_size=None, prefetch=0, as_columns=False,
+             store=None, key=None):
         """Read Entity.
 
         Args:
             id (str): The unique identifier (ID) of the entity.
+            stream (bool): Determine whether or not to return a generator
+                yielding the read result as each page arrives (see
+                `iter_read`) instead of a list with all the read result.
+            page (bool): Determine whether or not the stream yields a
+                list per page instead of each record.
+            page_size (int): The maximum number of records per page
+                (`odata.maxpagesize`), default to the service page size.
+            prefetch (int): The number of pages to fetch ahead on a
+                background thread, 0 to fetch on demand.
+            as_columns (bool | str): Determine whether or not to return
+                the read result as Columns built as each page arrives,
+                `numpy` or `array` to choose the column type, default to
+                NumPy when installed.
+            store (object): The checkpoint store of the stream, see
+                `iter_read`, only with `stream`.
+            key (str): The checkpoint key of the stream.
 
         Returns:
-            A string formatted JSON for the read request
+            A list for the read result, or None if a request failed (a
+            partial read result is never returned).
+            A generator if `stream` is True, Columns if `as_columns`.
+
+        Raises:
+            ValueError: A checkpoint store is given without `stream`, a
+                list read never resumes from the middle.
         """
 
+        if store is not None and not stream:
+            raise ValueError('A checkpoint store requires a stream read.')
+
+        # Return the read result as it arrives
+        if stream:
+            return self.iter_read(id, page=page, page_size=page_size, prefetch=prefetch, store=store, key=key)
+
+        # Create request URL
+        request_url = self._read_url(id)
+
+        # Read a single record through the record cache
+        if id is not None and self.record_cache is not None:
+            return self._read_cached(request_url)
+
+        # Send the request for the first page
+        read_result = self._read_page(request_url, page_size)
+
+        # Check the failure status code
+        if read_result is None:
+            return None
+
         # Create a read result list to store all the read result
         read_result_list = []
 
+        # Get the pages following the first one
+        pages = self._iter_pages(read_result, page_size, strict=True)
+        if prefetch:
+            pages = PrefetchPager(pages, depth=prefetch)
+
+        try:
+            # Build the columns
+            if as_columns:
+                return self._build_columns(pages, as_columns)
+
+            # Add the read result of each page to list
+            for records in pages:
+                read_result_list.extend(records)
+        except IncompleteReadError:
+            # There was an error, the read result is incomplete
+            return None
+
+        # Return all the read result
+        return read_result_list
+
+
+    def iter_read(self, id=None, page=False, page_size=None, prefetch=0, store=None, key=None):
+        """Iterate Read Entity.
+
+        Follow the `@odata.nextLink` the same way as `read`, but yield
+        the read result as each page arrives, so only one page is held
+        in memory at a time (plus `prefetch` pages fetched ahead).
+
+        With a checkpoint store, the `@odata.nextLink` and record count
+        are saved once each page is consumed, and a read of the same
+        request URL resumes from the saved `@odata.nextLink`. The
+        checkpoint is deleted when the last page is consumed.
+
+        Args:
+            id (str): The unique identifier (ID) of the entity.
+            page (bool): Determine whether or not to yield a list per
+                page instead of each record.
+            page_size (int): The maximum number of records per page
+                (`odata.maxpagesize`), default to the service page size.
+            prefetch (int): The number of pages to fetch ahead on a
+                background thread while the current page is consumed,
+                0 to fetch on demand.
+            store (object): The checkpoint store (see `Checkpoint`), None
+                to not checkpoint the read.
+            key (str): The checkpoint key, default to the request URL.
+
+        Returns:
+            A generator for the read result.
+
+        Raises:
+            IncompleteReadError: A page request failed, with the number
+                of records read (including the resumed ones) and the
+                link of the failed page.
+        """
+
         # Create request URL
-        if id is not None:
-            # Read a single record
-            request_url = f'{self.root_url}/{self.label}({id})'
+        request_url = self._read_url(id)
+
+        # Get the pages
+        if store is not None:
+            pages = self._iter_checkpoint_pages(request_url, page_size, prefetch, store, key or request_url)
+        else:
+            pages = self._iter_url_pages(request_url, page_size, strict=True)
+            if prefetch:
+                pages = PrefetchPager(pages, depth=prefetch)
+
+        # Yield the whole page
+        if page:
+            return iter(pages)
+
+        # Yield each record
+        return self._iter_records(pages)
+
+
+    def parallel_read(self, partitions=4, key='createdon', ordered=False, page=False,
+                      page_size=None, filter=None, prefetch=1):
+        """Parallel Read Entity.
+
+        Read the whole entity set as `partitions` disjoint key ranges,
+        each one paged on its own worker thread, and merge them into a
+        single stream. A datetime key (e.g. `createdon`) is split into
+        equal time ranges between its smallest and largest value, a
+        unique identifier (GUID) key (e.g. `accountid`) is split in the
+        SQL Server `uniqueidentifier` order.
+
+        Args:
+            partitions (int): The number of partitions read concurrently.
+            key (str): The attribute to partition on, a key ending with
+                `id` is a GUID, any other is a datetime.
+            ordered (bool): Determine whether or not to yield the read
+                result in ascending key order (`$orderby` the key, one
+                partition after the other while the following ones are
+                fetched ahead) instead of as each page arrives.
+            page (bool): Determine whether or not to yield a list per
+                page instead of each record.
+            page_size (int): The maximum number of records per page
+                (`odata.maxpagesize`), default to the service page size.
+            filter (str): The filter expression applied to all the
+                partitions.
+            prefetch (int): The number of pages to fetch ahead for each
+                partition.
+
+        Returns:
+            A generator for the read result.
+
+        Raises:
+            IncompleteReadError: A page request of a partition failed,
+                with the number of records read from that partition.
+        """
+
+        if partitions < 1:
+            raise ValueError('The number of partitions must be at least 1.')
+
+        # Create the filter of each partition
+        if partitions == 1:
+            bounds = []
+        elif key.lower().endswith('id'):
+            bounds = guid_bounds(partitions)
+        else:
+            bounds = self._datetime_bounds(key, partitions, filter)
+
+        # Create request URL of each partition
+        request_urls = []
+        for expression in partition_filters(key, bounds):
+            if filter:
+                expression = f'({filter}) and {expression}' if expression else filter
+            query = [f'$filter={quote(expression)}'] if expression else []
+            if ordered:
+                query.append(f'$orderby={key}%20asc')
+            request_urls.append(f'{self.url}?' + '&'.join(query) if query else self.url)
+
+        sources = [self._iter_url_pages(request_url, page_size, strict=True) for request_url in request_urls]
+
+        # Get the pages
+        if ordered:
+            pages = self._iter_ordered_pages(sources, prefetch)
         else:
-            # Read all records
-            request_url = f'{self.root_url}/{self.label}'
+            pages = MergePager(sources, depth=prefetch * len(sources))
+
+        # Yield the whole page
+        if page:
+            return iter(pages)
+
+        # Yield each record
+        return self._iter_records(pages)
+
+
+    def _datetime_bounds(self, key, partitions, filter=None):
+        """Split the range of a datetime key into partitions.
+
+        Returns:
+            A list of the lower bound of each partition after the first
+            one, empty (a single partition) if no record has a key value
+            or the range request failed. The records with a null key are
+            read by the first partition, see `partition_filters`.
+        """
+
+        # The range of the non null key values
+        expression = f'{key} ne null' if not filter else f'({filter}) and {key} ne null'
+
+        values = []
+        for direction in ('asc', 'desc'):
+            request_url = (f'{self.url}?$select={key}&$filter={quote(expression)}'
+                           f'&$orderby={key}%20{direction}&$top=1')
+
+            read_result = self._read_page(request_url)
+
+            # Check the failure status code
+            if not read_result or not read_result.get('value'):
+                return []
+
+            values.append(parse_datetime(read_result['value'][0][key]))
+
+        return datetime_bounds(values[0], values[1], partitions)
+
+
+    @staticmethod
+    def _iter_ordered_pages(sources, prefetch):
+        """Iterate the pages of each partition one after the other, all
+        of them fetched ahead concurrently."""
+
+        pagers = [PrefetchPager(pages, depth=prefetch) for pages in sources]
+
+        try:
+            for pager in pagers:
+                pager.start()
+            for pager in pagers:
+                yield from pager
+        finally:
+            for pager in pagers:
+                pager.close()
+
+
+    def _read_cached(self, request_url):
+        """Read a single record through the record cache.
+
+        A fresh cached record is used as is, a stale one is revalidated
+        with `If-None-Match` and used again on 304 Not Modified.
+
+        Args:
+            request_url (str): The request URL of the record.
+
+        Returns:
+            A list for the record, or None if the request failed.
+        """
+
+        record_cache = self.record_cache
+        entry = record_cache.get(request_url)
+
+        # Use the fresh cached record
+        if entry is not None and entry[2]:
+            return [entry[1]]
+
+        # Create header
+        header = self.get_header()
+        if entry is not None:
+            header['If-None-Match'] = entry[0]
 
         # Send the request for a response
-        r = requests.get(url=request_url,
-                         headers=self.header)
+        r = self.transport.get(url=request_url,
+                               headers=header)
+
+        # Check the status code
+        if r.status_code == 304 and entry is not None:
+            # The cached record is not modified
+            record_cache.refresh(request_url)
+            return [entry[1]]
+
+        if r.status_code != 200:
+            return None
+
+        # Parse the read result
+        record = self.codec.loads(r.content)
+
+        # Cache the record with its version
+        etag = record.get('@odata.etag') or r.headers.get('ETag')
+        if etag is not None:
+            record_cache.set(request_url, etag, record)
+
+        return [record]
+
+
+    def _build_columns(self, pages, as_columns=True):
+        """Build the columns of the pages.
+
+        The column types come from the metadata of the entity set when
+        it is loaded, see `Entity.get_metadata`.
+
+        Args:
+            pages (iterable): The pages (list of records).
+            as_columns (bool | str): `numpy` or `array` to choose the
+                column type, True for the default.
+
+        Returns:
+            The Columns of all the records.
+        """
+
+        metadata = self.client.get_metadata(load=False)
+        types = metadata.attributes(self.label) if metadata is not None else None
+
+        use_numpy = {'numpy': True, 'array': False}.get(as_columns) if isinstance(as_columns, str) else None
+        builder = ColumnBuilder(types, use_numpy=use_numpy)
+
+        for records in pages:
+            builder.add(records)
+
+        return builder.build()
+
+
+    def _iter_url_pages(self, request_url, page_size=None, strict=False):
+        """Iterate the pages starting from the request URL.
+
+        Args:
+            request_url (str): The request URL of the first page.
+            page_size (int): The maximum number of records per page.
+            strict (bool): Determine whether or not to raise an
+                IncompleteReadError when a page request failed.
+
+        Returns:
+            A generator yielding a list of records per page, nothing is
+            yielded if the first request failed.
+        """
+
+        # Send the request for the first page
+        read_result = self._read_page(request_url, page_size, strict)
 
         # Check the failure status code
+        if read_result is None:
+            return
+
+        yield from self._iter_pages(read_result, page_size, strict)
+
+
+    @staticmethod
+    def _iter_records(pages):
+        """Iterate the records of each page."""
+
+        for records in pages:
+            yield from records
+
+
+    def _read_page(self, request_url, page_size=None, strict=False):
+        """Read Page.
+
+        Args:
+            request_url (str): The request URL of the page.
+            page_size (int): The maximum number of records per page.
+            strict (bool): Determine whether or not to raise an
+                IncompleteReadError when the request failed.
+
+        Returns:
+            A dictionary for the parsed page, or None if the request
+            failed.
+        """
+
+        # Create header
+        header = self.get_header()
+        if page_size is not None:
+            header['Prefer'] = f'odata.maxpagesize={page_size}'
+
+        # Send the request for a response
+        r = self.transport.get(url=request_url,
+                               headers=header)
+
+        # Check the status code
         if r.status_code != 200:
+            if strict:
+                raise IncompleteReadError(request_url, r.status_code)
             return None
 
-        # Check the success status code
-        if r.status_code == 200:
-            # Parse the read result
-            read_result = json.loads(r.text)
+        # Parse the read result
+        return self.codec.loads(r.content)
+
+
+    def _iter_pages(self, read_result, page_size=None, strict=False, links=False):
+        """Iterate Pages.
 
-            # Add the read result to list
+        Args:
+            read_result (dict): The parsed first page.
+            page_size (int): The maximum number of records per page.
+            strict (bool): Determine whether or not to raise an
+                IncompleteReadError when a page request failed.
+            links (bool): Determine whether or not to yield a tuple
+                (records, `@odata.nextLink` or None) per page.
+
+        Returns:
+            A generator yielding a list of records per page, stop when
+            there is no `@odata.nextLink` or a page request failed.
+        """
+
+        count = 0
+
+        while read_result is not None:
             if 'value' in read_result:
-                # Use extend for multiple result
-                read_result_list.extend(read_result['value'])
+                # Multiple result
+                records = read_result['value']
             else:
-                # Use append for single result
-                read_result_list.append(read_result)
+                # Single result
+                records = [read_result]
+
+            next_link = read_result.get('@odata.nextLink')
+            yield (records, next_link) if links else records
+            count += len(records)
+
+            # Check if there are more result
+            if next_link is None:
+                break
 
-        # Check if there are more result
-        while '@odata.nextLink' in read_result:
-            # If there are more result
             # Parse the URL for the next set of result
-            request_url = read_result['@odata.nextLink']
+            try:
+                read_result = self._read_page(next_link, page_size, strict)
+            except IncompleteReadError as e:
+                e.count = count
+                raise
+
+
+    def _iter_checkpoint_pages(self, request_url, page_size, prefetch, store, key):
+        """Iterate the pages with a checkpoint, see `iter_read`.
+
+        The checkpoint of a page is saved on the caller side once the
+        page is consumed, after the pages prefetched on the worker thread.
+
+        Returns:
+            A generator yielding a list of records per page.
+        """
+
+        url = request_url
+        count = 0
+
+        # Resume from the checkpoint of the same request URL
+        checkpoint = store.get(key)
+        if checkpoint is not None and checkpoint.get('request_url') == request_url:
+            url = checkpoint['next_link']
+            count = checkpoint['count']
+
+        def pages():
+            # Send the request for the first page
+            yield from self._iter_pages(self._read_page(url, page_size, strict=True), page_size,
+                                        strict=True, links=True)
+
+        pages = PrefetchPager(pages(), depth=prefetch) if prefetch else pages()
+
+        try:
+            for records, next_link in pages:
+                yield records
+                count += len(records)
+
+                # Save the checkpoint of the consumed page
+                if next_link is None:
+                    store.delete(key)
+                else:
+                    store.set(key, {'request_url': request_url, 'next_link': next_link, 'count': count})
+        except IncompleteReadError as e:
+            # The number of records read including the resumed ones
+            e.count = count
+            raise
+
+
+    @profiled('read_changes')
+    def read_changes(self, select=None, store=None, key=None, delta_link=None, page_size=None, save=True):
+        """Read Entity Changes.
+
+        Read the new, updated and deleted records since the last call
+        with change tracking (`Prefer: odata.track-changes`). The first
+        call reads all the records, the `@odata.deltaLink` returned with
+        the last page is kept in the checkpoint store so the next call
+        reads only the changes since then. A delta link the service no
+        longer accepts (410 Gone) falls back to a full read.
+
+        Change tracking must be enabled on the table.
+
+        Args:
+            select (list | str): The attributes to read, default to all.
+            store (MemoryCheckpointStore | FileCheckpointStore): The
+                checkpoint store keeping the delta link between calls.
+            key (str): The checkpoint key, default to the entity set name.
+            delta_link (str): The delta link to read the changes from,
+                default to the one in the checkpoint store.
+            page_size (int): The maximum number of records per page
+                (`odata.maxpagesize`), default to the service page size.
+            save (bool): Determine whether or not to save the new delta
+                link in the checkpoint store, set to False to save it
+                (`store.set(key, {'delta_link': ...})`) only after the
+                changes are applied.
+
+        Returns:
+            A ChangeResult for the changes, or None if the request
+            failed (the checkpoint is left unchanged).
+        """
+
+        key = key or self.label
+
+        # Get the delta link of the last read
+        if delta_link is None and store is not None:
+            delta_link = (store.get(key) or {}).get('delta_link')
+
+        # Create request URL
+        initial_url = self.url
+        if select:
+            initial_url += '?$select=' + (select if isinstance(select, str) else ','.join(select))
+
+        # Create header
+        prefer = ['odata.track-changes']
+        if page_size is not None:
+            prefer.append(f'odata.maxpagesize={page_size}')
+
+        initial = delta_link is None
+        request_url = initial_url if initial else delta_link
+
+        changed = []
+        deleted = []
+        new_delta_link = None
+
+        while request_url is not None:
+            header = self.get_header()
+            header['Prefer'] = ','.join(prefer)
+
             # Send the request for a response
-            r = requests.get(url=request_url,
-                             headers=self.header)
+            r = self.transport.get(url=request_url,
+                                   headers=header)
+
+            # Read all the records again when the delta link expired
+            if r.status_code == 410 and not initial and not changed and not deleted:
+                initial = True
+                request_url = initial_url
+                continue
 
             # Check the status code
-            if r.status_code == 200:
-                # Parse the read result
-                read_result = json.loads(r.text)
+            if r.status_code != 200:
+                return None
+
+            # Parse the read result
+            read_result = self.codec.loads(r.content)
 
-                # Add the read result to list
-                if 'value' in read_result:
-                    # Use extend for multiple result
-                    read_result_list.extend(read_result['value'])
+            for record in read_result.get('value', []):
+                if is_deleted(record):
+                    deleted.append(record.get('id'))
                 else:
-                    # Use append for single result
-                    read_result_list.append(read_result)
+                    changed.append(record)
 
-        # Return all the read result
-        return read_result_list
+            # Follow the next page, the delta link comes with the last one
+            request_url = read_result.get('@odata.nextLink')
+            new_delta_link = read_result.get('@odata.deltaLink', new_delta_link)
 
+        # Save the delta link for the next read
+        if save and store is not None and new_delta_link is not None:
+            store.set(key, {'delta_link': new_delta_link})
 
+        return ChangeResult(changed, deleted, new_delta_link, initial)
+
+
+    @profiled('update')
     def update(self, id, payload):
         """Update Entity.
 
         Args:
             id (str): The unique identifier (ID) of the entity.
-            payload (dict): The payload (message body) passed in.
+            payload (dict | str): The payload (message body) passed in,
+                a dict is serialized with the JSON codec.
 
         Returns:
             An integer for the status code of the update request.
         """
 
         # Create request URL
-        request_url = f'{self.root_url}/{self.label}({id})'
+        request_url = f'{self.url}({id})'
+
+        return self._update(request_url, payload)
 
-        # Update header
+
+    def _update(self, request_url, payload):
+        """Send the update request, see `update`."""
+
+        # Create header
         # Don't perform create for this update
-        self.header['If-Match'] = '*'
+        header = self.get_header(self.update_header)
 
         # Send the request for a response
-        r = requests.patch(url=request_url,
-                           headers=self.header,
-                           data=payload)
+        r = self.transport.patch(url=request_url,
+                                 headers=header,
+                                 data=self._encode(payload))
+
+        # The cached record is out of date
+        self._invalidate(request_url)
 
         # Check the status code
         if r.status_code == 204:
@@ -190,6 +714,7 @@ class Entity(object):
         # TODO: Implementation
 
 
+    @profiled('delete')
     def delete(self, id):
         """Delete Entity.
 
@@ -201,11 +726,20 @@ class Entity(object):
         """
 
         # Create request URL
-        request_url = f'{self.root_url}/{self.label}({id})'
+        request_url = f'{self.url}({id})'
+
+        return self._delete(request_url)
+
+
+    def _delete(self, request_url):
+        """Send the delete request, see `delete`."""
 
         # Send the request for a response
-        r = requests.delete(url=request_url,
-                            headers=self.header)
+        r = self.transport.delete(url=request_url,
+                                  headers=self.get_header())
+
+        # The cached record is out of date
+        self._invalidate(request_url)
 
         # Check the status code
         if r.status_code == 204:
@@ -216,6 +750,7 @@ class Entity(object):
         return None
 
 
+    @profiled('associate')
     def associate(self, primary_id, collection, secondary, secondary_id, update=False):
         """Associate Entity.
 
@@ -233,25 +768,16 @@ class Entity(object):
                 operation to change the reference.
         """
 
-        # Create request URL
-        request_url = f'{self.root_url}/{self.label}({primary_id})/{collection}/$ref'
-
-        # Create payload
-        if update:
-            # Change the reference in a single valued navigation property
-            payload = {
-                '@odata.id': f'{secondary}({secondary_id})'
-            }
-        else:
-            # Add a reference to a collection value navigation property
-            payload = {
-                '@odata.id': f'{self.root_url}/{secondary}({secondary_id})'
-            }
+        # Create request URL and payload
+        request_url, payload = self._associate_request(primary_id, collection, secondary, secondary_id, update)
 
         # Send the request for a response
-        r = requests.post(url=request_url,
-                          headers=self.header,
-                          data=json.dumps(payload))
+        r = self.transport.post(url=request_url,
+                                headers=self.get_header(),
+                                data=self.codec.dumps(payload))
+
+        # The cached primary record is out of date
+        self._invalidate(f'{self.url}({primary_id})')
 
         # Check the status code
         if r.status_code == 204:
@@ -262,6 +788,7 @@ class Entity(object):
         return None
 
 
+    @profiled('disassociate')
     def disassociate(self, primary_id, collection, collection_id=None, secondary=None, secondary_id=None):
         """Disassociate Entity.
 
@@ -280,18 +807,16 @@ class Entity(object):
         """
 
         # Create request URL
-        if secondary and collection_id is None:
-            # Disassociate with primary and secondary entity
-            request_url = f'{self.root_url}/{self.label}({primary_id})/{collection}/$ref?$id={self.root_url}/{secondary}({secondary_id})'
-        elif collection_id and (secondary is None and secondary_id is None):
-            # Disassociate with primary and collection entity
-            request_url = f'{self.root_url}/{self.label}({primary_id})/{collection}({collection_id})'
-        else:
+        request_url = self._disassociate_url(primary_id, collection, collection_id, secondary, secondary_id)
+        if request_url is None:
             return None
 
         # Send the request for a response
-        r = requests.delete(url=request_url,
-                            headers=self.header)
+        r = self.transport.delete(url=request_url,
+                                  headers=self.get_header())
+
+        # The cached primary record is out of date
+        self._invalidate(f'{self.url}({primary_id})')
 
         # Check the status code
         if r.status_code == 204:
@@ -302,7 +827,299 @@ class Entity(object):
         return None
 
 
-    def query(self, **kwargs):
+    @profiled('create_many')
+    def create_many(self, records, logical_name=None, max_size=BULK_MAX_SIZE, max_bytes=BULK_MAX_BYTES):
+        """Create Multiple Entity.
+
+        Create the records with the `CreateMultiple` bound action, split
+        in chunks by record count and payload size.
+
+        .. _Use Bulk Operation Messages:
+        https://learn.microsoft.com/en-us/power-apps/developer/data-platform/bulk-operations
+
+        Args:
+            records (iterable): The payload (dict) of each record.
+            logical_name (str): The entity logical name, default to the
+                entity set name in singular.
+            max_size (int): The maximum number of records per request.
+            max_bytes (int): The maximum payload size per request.
+
+        Returns:
+            A list for the unique identifier (ID) of each created
+            entity in input order, None for the records of a failed
+            request.
+        """
+
+        return self._bulk('CreateMultiple', records, logical_name, max_size, max_bytes)
+
+
+    @profiled('update_many')
+    def update_many(self, records, logical_name=None, max_size=BULK_MAX_SIZE, max_bytes=BULK_MAX_BYTES):
+        """Update Multiple Entity.
+
+        Update the records with the `UpdateMultiple` bound action, each
+        record must include its primary key (e.g. `accountid`).
+
+        Args:
+            records (iterable): The payload (dict) of each record.
+            logical_name (str): The entity logical name, default to the
+                entity set name in singular.
+            max_size (int): The maximum number of records per request.
+            max_bytes (int): The maximum payload size per request.
+
+        Returns:
+            A list for the unique identifier (ID) of each updated
+            entity in input order, None for the records of a failed
+            request.
+        """
+
+        return self._bulk('UpdateMultiple', records, logical_name, max_size, max_bytes)
+
+
+    @profiled('upsert_many')
+    def upsert_many(self, records, logical_name=None, max_size=BULK_MAX_SIZE, max_bytes=BULK_MAX_BYTES):
+        """Upsert Multiple Entity.
+
+        Create or update the records with the `UpsertMultiple` bound
+        action, each record must include its primary key or alternate
+        key (`@odata.id`).
+
+        Args:
+            records (iterable): The payload (dict) of each record.
+            logical_name (str): The entity logical name, default to the
+                entity set name in singular.
+            max_size (int): The maximum number of records per request.
+            max_bytes (int): The maximum payload size per request.
+
+        Returns:
+            A list for the unique identifier (ID) of each created or
+            updated entity in input order, None for the records of a
+            failed request.
+        """
+
+        return self._bulk('UpsertMultiple', records, logical_name, max_size, max_bytes)
+
+
+    def _bulk(self, action, records, logical_name, max_size, max_bytes):
+        """Send the records with a bulk bound action.
+
+        Args:
+            action (str): The bound action name, e.g. `CreateMultiple`.
+            records (iterable): The payload (dict) of each record.
+            logical_name (str): The entity logical name.
+            max_size (int): The maximum number of records per request.
+            max_bytes (int): The maximum payload size per request.
+
+        Returns:
+            A list for the unique identifier (ID) of each record.
+        """
+
+        # Resolve the logical name and primary key from the loaded metadata
+        metadata = self.client.get_metadata(load=False)
+        primary_key = None
+        if metadata is not None:
+            logical_name = logical_name or metadata.logical_name(self.label)
+            primary_key = metadata.primary_key(logical_name or self.label)
+
+        # Create request URL
+        logical_name = logical_name or logical_name_of(self.label)
+        request_url = f'{self.url}/Microsoft.Dynamics.CRM.{action}'
+
+        ids = []
+
+        for targets, target_ids in self._bulk_chunks(records, logical_name, max_size, max_bytes, primary_key, self.codec):
+            # Create payload from the serialized targets
+            payload = b'{"Targets":[' + b','.join(targets) + b']}'
+
+            # Send the request for a response
+            r = self.transport.post(url=request_url,
+                                    headers=self.get_header(),
+                                    data=payload)
+
+            # The cached records are out of date
+            for target_id in target_ids:
+                if target_id is not None:
+                    self._invalidate(f'{self.url}({target_id})')
+
+            # Check the status code
+            if r.status_code == 200:
+                # Parse the unique identifier (ID) of each entity
+                ids.extend(self.codec.loads(r.content).get('Ids', target_ids))
+            elif r.status_code == 204:
+                ids.extend(target_ids)
+            else:
+                # There was an error
+                ids.extend([None] * len(targets))
+
+        return ids
+
+
+    @staticmethod
+    def _bulk_chunks(records, logical_name, max_size, max_bytes, primary_key=None, codec=JsonCodec):
+        """Serialize the records and split them in chunks.
+
+        Returns:
+            A generator yielding a tuple (list of serialized targets,
+            list of primary key) per chunk.
+        """
+
+        odata_type = f'Microsoft.Dynamics.CRM.{logical_name}'
+        primary_key = primary_key or f'{logical_name}id'
+
+        targets = []
+        target_ids = []
+        size = 0
+
+        for record in records:
+            # Serialize the target with its type
+            target = codec.dumps({'@odata.type': odata_type, **record})
+            target_size = len(target) + 1
+
+            # Start a new chunk
+            if targets and (len(targets) >= max_size or size + target_size > max_bytes):
+                yield targets, target_ids
+                targets = []
+                target_ids = []
+                size = 0
+
+            targets.append(target)
+            target_ids.append(record.get(primary_key))
+            size += target_size
+
+        if targets:
+            yield targets, target_ids
+
+
+    def run_many(self, op, items, max_workers=8, progress=None, retry=False):
+        """Run Many Entity.
+
+        Run a single record operation on each item over a thread pool,
+        the entity set is fixed when called so the client can be used
+        from other threads meanwhile.
+
+        Args:
+            op (str | callable): The operation, `create` (item is the
+                payload), `update` (item is a tuple of unique identifier
+                (ID) and payload) or `delete` (item is the unique
+                identifier (ID)), or a callable run on each item.
+            items (iterable): The items to run the operation on.
+            max_workers (int): The maximum number of concurrent requests.
+            progress (callable): Called with the number of finished items
+                and the total number of items (None for an iterable
+                without length) after each item.
+            retry (bool): Determine whether or not to send the `create`
+                again on a transient error (see `create`).
+
+        Returns:
+            A list for the OperationResult of each item in input order,
+            with the return value of the operation or the error raised.
+        """
+
+        # Create request URL
+        request_url = self.url
+
+        if op == 'create':
+            function = lambda payload: self._create(request_url, payload, retry)
+        elif op == 'update':
+            function = lambda item: self._update(f'{request_url}({item[0]})', item[1])
+        elif op == 'delete':
+            function = lambda id: self._delete(f'{request_url}({id})')
+        elif callable(op):
+            function = op
+        else:
+            raise ValueError(f'Unknown operation: {op}.')
+
+        return run_many(function, items, max_workers=max_workers, progress=progress)
+
+
+    @profiled('import_file')
+    def import_file(self, path, mapping=None, validate=None, operation='create', format=None,
+                    chunk_size=100, max_workers=4, bulk=True, store=None, key=None, reject_path=None):
+        """Import File.
+
+        Import the rows of a CSV (with a header) or NDJSON file, mapped
+        and validated, in chunks written on a thread pool, see
+        `Importer`. With a checkpoint store, each done chunk is saved so
+        the import of the same file (same size and modification time)
+        resumes where a crashed one stopped; the checkpoint is deleted
+        once the import is complete.
+        A string value is converted to the attribute type of the loaded
+        metadata (see `Entity.get_metadata`).
+
+        Args:
+            path (str): The path of the file, e.g. `accounts.csv.gz`.
+            mapping (dict | callable): The attribute of each column, or a
+                callable returning the payload of a row.
+            validate (callable): Called with each payload, returns an
+                error message (or raises ValueError) to reject it.
+            operation (str): The write operation, `create`, `update` or
+                `upsert`.
+            format (str): The format, `csv` or `ndjson`, default to the
+                one of the file extension.
+            chunk_size (int): The number of rows per chunk (and bulk
+                request).
+            max_workers (int): The maximum number of concurrent chunks.
+            bulk (bool): Determine whether or not to write a chunk with
+                a bulk bound action (e.g. `CreateMultiple`) instead of a
+                request per row.
+            store (object): The checkpoint store (see `Checkpoint`) of
+                the done chunks, None to not resume.
+            key (str): The checkpoint key, default to the entity set
+                name and file path.
+            reject_path (str): The path of the reject file (NDJSON),
+                default to the file path with `.rejects.ndjson`.
+
+        Returns:
+            An ImportResult for the number of rows imported and rejected.
+        """
+
+        path = os.path.abspath(path)
+
+        # A checkpoint of another version of the file is ignored
+        stat = os.stat(path)
+        source = {'size': stat.st_size, 'mtime': stat.st_mtime_ns}
+
+        importer = Importer(self, mapping=mapping, validate=validate, operation=operation,
+                            chunk_size=chunk_size, max_workers=max_workers, bulk=bulk, store=store,
+                            key=key or f'import:{self.label}:{path}',
+                            reject_path=reject_path or f'{path}.rejects.ndjson')
+
+        return importer.run(read_rows(path, format=format, codec=self.codec), source=source)
+
+
+    @contextlib.contextmanager
+    def batch(self, max_size=BATCH_MAX_SIZE, continue_on_error=True):
+        """Batch Entity.
+
+        Queue the `create`, `update`, `delete` and `associate`
+        operations within the context and send them as `$batch`
+        requests when the context exits.
+
+        .. _Execute Batch Operations Using The Web API:
+        https://docs.microsoft.com/en-us/powerapps/developer/data-platform/webapi/execute-batch-operations-using-web-api
+
+        Args:
+            max_size (int): The maximum number of operations per
+                `$batch` request.
+            continue_on_error (bool): Determine whether or not the
+                service continues with the rest of the batch after an
+                operation failed.
+
+        Returns:
+            A Batch to queue the operations on, its `results` are filled
+            in when the context exits.
+        """
+
+        batch = Batch(self, self.label, max_size=max_size, continue_on_error=continue_on_error)
+
+        yield batch
+
+        # Send the queued operations
+        batch.send()
+
+
+    @profiled('query')
+    def query(self, query=None, stream=False, page=False, as_columns=False, **kwargs):
         """Query Entity.
 
         .. _Query Data Using The Web API:
@@ -312,30 +1129,53 @@ class Entity(object):
         https://docs.microsoft.com/en-us/powerapps/developer/common-data-service/webapi/web-api-query-data-sample
 
         Args:
-            kwargs (dict): The keyword arguments for the query.
+            query (Query): The compiled query, see `Query`.
+            stream (bool): Determine whether or not to return a generator
+                yielding the result of every page as it arrives, following
+                the `@odata.nextLink` or the FetchXML paging cookie (see
+                `iter_fetch`), instead of the first page.
+            page (bool): Determine whether or not the stream yields a
+                list per page instead of each record.
+            as_columns (bool | str): Determine whether or not to return
+                the result of every page as Columns, see `read`.
+            kwargs (dict): The parameters of the compiled query, or the
+                query options (e.g. `select='name'`) without a compiled
+                query.
 
         Returns:
             A string formatted JSON for the result of the query.
+            A generator if `stream` is True, Columns if `as_columns` (or
+            None if a request failed).
+
+        Raises:
+            IncompleteReadError: A page request of the stream failed,
+                with the number of records read.
         """
 
-        # Initialize query
-        query = ''
-        # query = urlencode(kwargs, safe='$,')
+        # Build the columns as each page arrives
+        if as_columns:
+            pages = self.query(query, stream=True, page=True, **kwargs)
+            try:
+                return self._build_columns(pages, as_columns)
+            except IncompleteReadError:
+                # There was an error, the result is incomplete
+                return None
 
-        # Build query
-        # Loop through `kwargs` parameter(s) and join them with `&`
-        # The `fetchXml` parameter does not prepend with `$`
-        query = '&'.join(f'${key}={value}'
-                         if key != 'fetchXml'
-                         else f'{key}={value}'
-                         for key, value in kwargs.items())
+        # Return the result of every page as it arrives
+        if stream:
+            fetch_xml = kwargs.get('fetchXml') if query is None else query.fetch_xml(**kwargs)
+            if fetch_xml is not None:
+                return self.iter_fetch(fetch_xml, page=page)
+
+            pages = self._iter_url_pages(self._query_url(query, **kwargs), strict=True)
+            return iter(pages) if page else self._iter_records(pages)
 
         # Create request URL
-        request_url = f'{self.root_url}/{self.label}?{query}'
+        request_url = self._query_url(query, **kwargs)
 
         # Send the request for a response
-        r = requests.get(url=request_url,
-                         headers=self.header)
+        r = self.transport.get(url=request_url,
+                               headers=self.get_header())
 
         # Check the status code
         if r.status_code == 200:
@@ -343,4 +1183,310 @@ class Entity(object):
             return r.text
 
         # There was an error
-        return None
\ No newline at end of file
+        return None
+
+
+    def iter_fetch(self, fetch_xml, page=False, page_size=None, prefetch=0):
+        """Iterate FetchXML.
+
+        Send the FetchXML page by page, each page with the paging cookie
+        and page number of the previous one, and yield the rows as each
+        page arrives. A FetchXML with a `top` is sent once.
+
+        .. _Page Results Using FetchXml:
+        https://learn.microsoft.com/en-us/power-apps/developer/data-platform/fetchxml/page-results
+
+        Args:
+            fetch_xml (str): The FetchXML.
+            page (bool): Determine whether or not to yield a list per
+                page instead of each row.
+            page_size (int): The number of rows per page (the `count`),
+                default to the one of the FetchXML or 5000.
+            prefetch (int): The number of pages to fetch ahead on a
+                background thread, 0 to fetch on demand.
+
+        Returns:
+            A generator for the rows.
+
+        Raises:
+            IncompleteReadError: A page request failed, with the number
+                of rows read.
+        """
+
+        pages = self._iter_fetch_pages(fetch_xml, page_size, strict=True)
+        if prefetch:
+            pages = PrefetchPager(pages, depth=prefetch)
+
+        # Yield the whole page
+        if page:
+            return iter(pages)
+
+        # Yield each row
+        return self._iter_records(pages)
+
+
+    def _iter_fetch_pages(self, fetch_xml, page_size=None, strict=False):
+        """Iterate the pages of the FetchXML.
+
+        Args:
+            fetch_xml (str): The FetchXML.
+            page_size (int): The number of rows per page.
+            strict (bool): Determine whether or not to raise an
+                IncompleteReadError when a page request failed.
+
+        Returns:
+            A generator yielding a list of rows per page.
+        """
+
+        # The `top` can not be paged
+        if fetch_xml_top(fetch_xml) is not None:
+            page_number = None
+            page_xml = fetch_xml
+        else:
+            page_number = 1
+            page_xml = page_fetch_xml(fetch_xml, page_number, count=page_size)
+
+        count = 0
+
+        while True:
+            # Create request URL
+            request_url = f'{self.url}?fetchXml={quote(page_xml, safe=SAFE_CHARACTERS)}'
+
+            # Create header
+            header = self.get_header()
+            header['Prefer'] = ('odata.include-annotations="Microsoft.Dynamics.CRM.fetchxmlpagingcookie,'
+                                'Microsoft.Dynamics.CRM.morerecords"')
+
+            # Send the request for a response
+            r = self.transport.get(url=request_url,
+                                   headers=header)
+
+            # Check the status code
+            if r.status_code != 200:
+                if strict:
+                    raise IncompleteReadError(request_url, r.status_code, count)
+                return
+
+            # Parse the read result
+            read_result = self.codec.loads(r.content)
+            records = read_result.get('value', [])
+            yield records
+            count += len(records)
+
+            # Check if there are more rows
+            if page_number is None or not read_result.get('@Microsoft.Dynamics.CRM.morerecords'):
+                return
+
+            # Set the paging cookie and number of the next page
+            next_page_number, paging_cookie = parse_paging_cookie(
+                read_result.get('@Microsoft.Dynamics.CRM.fetchxmlpagingcookie', ''))
+            page_number = next_page_number or page_number + 1
+            page_xml = page_fetch_xml(fetch_xml, page_number, paging_cookie, page_size)
+
+
+    @profiled('export')
+    def export(self, path, format=None, compression=None, query=None, page_size=None, prefetch=1,
+               columns=None, **kwargs):
+        """Export Entity.
+
+        Stream the pages of the entity set, or of a query, straight to a
+        NDJSON, CSV or Parquet (requires `pyarrow`) file as each page
+        arrives, so only the current page (plus `prefetch` pages) is held
+        in memory. The file is written atomically, it is only replaced
+        once every page is written.
+
+        Args:
+            path (str): The path of the file, e.g. `accounts.ndjson.gz`.
+            format (str): The format, `ndjson`, `csv` or `parquet`,
+                default to the one of the file extension.
+            compression (str): The compression, `gzip`, `bz2` or `xz` for
+                a NDJSON or CSV file, a Parquet compression (e.g. `zstd`)
+                for a Parquet file, default to the one of the file
+                extension.
+            query (Query): The compiled query, see `Query`.
+            page_size (int): The maximum number of records per page.
+            prefetch (int): The number of pages to fetch ahead on a
+                background thread while the current page is written, 0
+                to fetch on demand.
+            columns (list): The CSV and Parquet columns, default to the
+                attributes of the first page.
+            kwargs (dict): The parameters of the compiled query, or the
+                query options (e.g. `select='name'`) without a compiled
+                query.
+
+        Returns:
+            An integer for the number of records exported, or None if a
+            request failed (the file is left as is).
+
+        Raises:
+            ValueError: A value does not fit the type of its Parquet
+                column (the file is left as is).
+        """
+
+        # Get the pages of the query, or of the whole entity set
+        fetch_xml = kwargs.get('fetchXml') if query is None else query.fetch_xml(**kwargs)
+        if fetch_xml is not None:
+            pages = self._iter_fetch_pages(fetch_xml, page_size, strict=True)
+        elif query is not None or kwargs:
+            pages = self._iter_url_pages(self._query_url(query, **kwargs), page_size, strict=True)
+        else:
+            pages = self._iter_url_pages(self._read_url(), page_size, strict=True)
+
+        # The Parquet column types
+        metadata = self.client.get_metadata(load=False)
+        types = metadata.attributes(self.label) if metadata is not None else None
+
+        # The pager is closed by the export, even when it fails
+        if prefetch:
+            pages = PrefetchPager(pages, depth=prefetch)
+
+        try:
+            return export_pages(pages, path, format=format, compression=compression, codec=self.codec,
+                                columns=columns, types=types)
+        except IncompleteReadError:
+            # There was an error
+            return None
+
+
+class Entity(Common):
+    """Entity.
+
+    Client of the Microsoft Dynamics 365 Web API. Each entity set is
+    an attribute of the client (e.g. `entity.accounts`), returning a
+    cached, immutable EntitySet handle, so a single client can be
+    shared by many threads.
+    """
+
+    entity_set_class = EntitySet
+
+    def __init__(self, access, hostname, transport=None, root_url=None, record_cache=None,
+                 metadata_cache=None, codec=None):
+        """Constructor.
+
+        Args:
+            access (str | Access): The Microsoft Dynamics 365 access
+                token, or the Access object to read the current
+                (refreshed) access token from on each request.
+            hostname (str): The Hostname of the environment.
+            transport (Transport): The pooled HTTP transport to send the
+                requests with, a new one is created if None.
+            root_url (str): The root URL of the Web API, default to the
+                one of the environment.
+            record_cache (RecordCache | bool): The cache of the records
+                read by unique identifier (ID), True to use the default
+                RecordCache, or None to disable it.
+            metadata_cache (FileMetadataCache | bool): The on disk cache
+                of the metadata, True to use the default cache directory,
+                or None to fetch the metadata on each start.
+            codec (str | JsonCodec): The JSON codec (`orjson`, `msgspec`
+                or `json`), default to the fastest installed one.
+        """
+
+        # Set the access token, URL (Uniform Resource Locator) and header
+        super().__init__(access, hostname, root_url=root_url, codec=codec)
+
+        # Set the transport
+        self.transport = transport if transport is not None else Transport()
+
+        # Record the JSON decoding with the profiler of the transport
+        profiler = getattr(self.transport, 'profiler', None)
+        if profiler is not None:
+            self.codec = ProfiledCodec(self.codec, profiler)
+
+        # Set the record cache
+        if record_cache is True:
+            record_cache = RecordCache()
+        self.record_cache = record_cache if record_cache is not False else None
+
+        # Set the metadata cache, the metadata is loaded on first use
+        self.metadata_cache = FileMetadataCache() if metadata_cache is True else (metadata_cache or None)
+        self._metadata = None
+        self._metadata_cache_read = False
+        self._metadata_lock = threading.Lock()
+
+
+    def get_metadata(self, refresh=False, load=True):
+        """Get Metadata.
+
+        Load the metadata on first use from the metadata cache, or fetch
+        the EntityDefinitions (and save them to the metadata cache).
+
+        Args:
+            refresh (bool): Determine whether or not to fetch the
+                metadata again, ignoring the cached one.
+            load (bool): Determine whether or not to fetch the metadata
+                if it is not loaded yet. The metadata cache is read
+                (once) either way, without a request.
+
+        Returns:
+            The Metadata, or None if it is not loaded (not in the
+            metadata cache and `load` is False) or the request failed.
+        """
+
+        with self._metadata_lock:
+            if self._metadata is not None and not refresh:
+                return self._metadata
+
+            # Load the cached metadata, a missing one is not looked up again
+            metadata = None
+            if self.metadata_cache is not None and not refresh and not self._metadata_cache_read:
+                self._metadata_cache_read = True
+                metadata = self.metadata_cache.load(self.hostname, D365_API_V)
+
+            if metadata is None:
+                if not load and not refresh:
+                    return None
+
+                metadata = self._fetch_metadata()
+                if metadata is None:
+                    return None
+
+                # Save the metadata for the next start
+                if self.metadata_cache is not None:
+                    self.metadata_cache.save(self.hostname, D365_API_V, metadata)
+
+            self._metadata = metadata
+
+        return metadata
+
+
+    def _fetch_metadata(self):
+        """Fetch the EntityDefinitions.
+
+        Returns:
+            The Metadata, or None if the request failed.
+        """
+
+        # Create request URL
+        request_url = f'{self.root_url}/EntityDefinitions?{ENTITY_DEFINITIONS_QUERY}'
+
+        # Send the request for a response
+        r = self.transport.get(url=request_url,
+                               headers=self.get_header())
+
+        # Check the status code
+        if r.status_code != 200:
+            return None
+
+        # Parse and index the entity definitions
+        return Metadata.from_entity_definitions(self.codec.loads(r.content)['value'])
+
+
+    def close(self):
+        """Stop the background refresh of the access token and close the
+        pooled connections of the transport."""
+
+        # An access token string has nothing to refresh
+        close_access = getattr(self.access, 'close', None)
+        if close_access is not None:
+            close_access()
+
+        self.transport.close()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,98 @@
+"""
+D365FW.Executor
+~~~~~~~~~~~~~~~
+"""
+
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+class OperationResult(object):
+    """Operation Result.
+
+    The result of running the operation on a single item.
+    """
+
+    def __init__(self, index, item, value=None, error=None):
+        """Constructor.
+
+        Args:
+            index (int): The position of the item in the input.
+            item (object): The item the operation ran on.
+            value (object): The return value of the operation.
+            error (Exception): The error raised by the operation.
+        """
+
+        self.index = index
+        self.item = item
+        self.value = value
+        self.error = error
+
+
+    @property
+    def success(self):
+        """True if the operation returned a value without error."""
+
+        return self.error is None and self.value is not None
+
+
+    def __repr__(self):
+        return f'<OperationResult {self.index} value={self.value!r} error={self.error!r}>'
+
+
+def run_many(function, items, max_workers=8, progress=None):
+    """Run Many.
+
+    Run the function on each item over a thread pool of at most
+    `max_workers` threads. The items are read from the iterable as the
+    operations finish, at most two per worker ahead, so a generator of
+    items is never read all at once.
+
+    Args:
+        function (callable): The operation to run on each item.
+        items (iterable): The items to run the operation on.
+        max_workers (int): The maximum number of concurrent operations.
+        progress (callable): Called with the number of finished items
+            and the total number of items (None for an iterable without
+            length) after each item.
+
+    Returns:
+        A list for the OperationResult of each item, in input order.
+        The errors raised by the operation are captured per item.
+    """
+
+    total = len(items) if hasattr(items, '__len__') else None
+    results = []
+    done = 0
+
+    def run(index, item):
+        try:
+            return OperationResult(index, item, value=function(item))
+        except Exception as e:
+            return OperationResult(index, item, error=e)
+
+    def collect(futures):
+        nonlocal done
+
+        for future in futures:
+            result = future.result()
+            results[result.index] = result
+            done += 1
+
+            # Report the progress
+            if progress is not None:
+                progress(done, total)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = set()
+
+        for index, item in enumerate(items):
+            # Submit at most two items per worker ahead
+            if len(pending) >= max_workers * 2:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(finished)
+
+            results.append(None)
+            pending.add(executor.submit(run, index, item))
+
+        collect(wait(pending).done)
+
+    return results
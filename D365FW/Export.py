@@ -0,0 +1,386 @@
+"""
+D365FW.Export
+~~~~~~~~~~~~~
+"""
+
+import bz2
+import contextlib
+import csv
+import gzip
+import io
+import lzma
+import os
+
+from D365FW.Codec import get_codec
+from D365FW.Column import ATTRIBUTE_KINDS
+from D365FW.Storage import atomic_write
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# The export format of each file extension
+FORMAT_EXTENSIONS = {
+    '.ndjson': 'ndjson',
+    '.jsonl': 'ndjson',
+    '.csv': 'csv',
+    '.parquet': 'parquet'
+}
+
+# The compression of each file extension
+COMPRESSION_EXTENSIONS = {
+    '.gz': 'gzip',
+    '.bz2': 'bz2',
+    '.xz': 'xz'
+}
+
+# The compressed file of each compression of a NDJSON or CSV export
+COMPRESSORS = {
+    'gzip': lambda f: gzip.GzipFile(fileobj=f, mode='wb'),
+    'bz2': lambda f: bz2.BZ2File(f, mode='wb'),
+    'xz': lambda f: lzma.LZMAFile(f, mode='wb')
+}
+
+def guess_format(path):
+    """Guess the export format and compression of a file path.
+
+    Args:
+        path (str): The path, e.g. `accounts.ndjson.gz`.
+
+    Returns:
+        A tuple (format, compression), None for the one not guessed.
+    """
+
+    root, extension = os.path.splitext(path.lower())
+
+    compression = COMPRESSION_EXTENSIONS.get(extension)
+    if compression is not None:
+        root, extension = os.path.splitext(root)
+
+    return FORMAT_EXTENSIONS.get(extension), compression
+
+
+def _is_annotation(name):
+    """Check if a record key is an annotation (e.g. `@odata.etag`)."""
+
+    return '@' in name
+
+
+class NdjsonWriter(object):
+    """NDJSON Writer.
+
+    Write each record as is (with its annotations) on its own line of
+    NDJSON (Newline Delimited JSON), encoded with the JSON codec.
+    """
+
+    def __init__(self, f, codec):
+        """Constructor.
+
+        Args:
+            f (file): The binary file.
+            codec (JsonCodec): The JSON codec.
+        """
+
+        self.f = f
+        self.codec = codec
+
+
+    def write(self, records):
+        """Write the records of a page."""
+
+        dumps = self.codec.dumps
+        self.f.write(b''.join(dumps(record) + b'\n' for record in records))
+
+
+    def close(self):
+        pass
+
+
+class CsvWriter(object):
+    """CSV Writer.
+
+    Write the records as CSV (Comma Separated Values) rows. The header
+    is the given columns, or the attributes of the first page (without
+    the annotations); an attribute missing from a record is empty, an
+    attribute not in the header is dropped. A list or dict value is
+    written as JSON.
+    """
+
+    def __init__(self, f, codec, columns=None):
+        """Constructor.
+
+        Args:
+            f (file): The binary file.
+            codec (JsonCodec): The JSON codec of the list and dict values.
+            columns (list): The columns, default to the attributes of
+                the first page.
+        """
+
+        self.f = io.TextIOWrapper(f, encoding='utf-8', newline='', write_through=True)
+        self.codec = codec
+        self.columns = list(columns) if columns is not None else None
+        self._writer = None
+
+
+    def _start(self, records):
+        """Write the header."""
+
+        if self.columns is None:
+            self.columns = list(dict.fromkeys(
+                name for record in records for name in record if not _is_annotation(name)))
+
+        self._writer = csv.writer(self.f)
+        if self.columns:
+            self._writer.writerow(self.columns)
+
+
+    def _format(self, value):
+        """Format a value of a CSV field."""
+
+        if value is None:
+            return ''
+        if isinstance(value, (list, dict)):
+            return self.codec.dumps(value).decode('utf-8')
+
+        return value
+
+
+    def write(self, records):
+        """Write the records of a page."""
+
+        if self._writer is None:
+            self._start(records)
+
+        columns = self.columns
+        self._writer.writerows([self._format(record.get(name)) for name in columns] for record in records)
+
+
+    def close(self):
+        # Write the header of an empty export
+        if self._writer is None:
+            self._start([])
+
+        # Leave the binary file open for the atomic write
+        self.f.flush()
+        self.f.detach()
+
+
+class ParquetWriter(object):
+    """Parquet Writer.
+
+    Write each page as a row group of an Apache Parquet file, requires
+    `pyarrow`. The schema is fixed by the first page: the type of each
+    attribute in the metadata when known, otherwise the type of its
+    values in the first page (a float for any number, a later page may
+    hold a decimal), a string when it has none. A list or dict value is
+    written as a JSON string. A value of a later page not fitting the
+    type of its column raises ValueError.
+    """
+
+    # The Arrow type of each column kind
+    KIND_TYPES = {
+        'q': 'int64',
+        'd': 'float64',
+        'b': 'bool_',
+        'str': 'string'
+    }
+
+    def __init__(self, f, codec, columns=None, types=None, compression=None):
+        """Constructor.
+
+        Args:
+            f (file): The binary file.
+            codec (JsonCodec): The JSON codec of the list and dict values.
+            columns (list): The columns, default to the attributes of
+                the first page.
+            types (dict): The metadata attribute type of each attribute,
+                see `Metadata.attributes`.
+            compression (str): The Parquet compression (e.g. `snappy`,
+                `gzip`, `zstd`), default to `snappy`.
+        """
+
+        if pyarrow is None:
+            raise ImportError('The Parquet export requires pyarrow, install it with `pip install d365fw[parquet]`.')
+
+        self.f = f
+        self.codec = codec
+        self.columns = list(columns) if columns is not None else None
+        self.types = types or {}
+        self.compression = compression or 'snappy'
+        self._schema = None
+        self._writer = None
+
+
+    def _kind_of(self, name, values):
+        """Get the column kind of an attribute."""
+
+        # The lookup value of an attribute (e.g. `_parentaccountid_value`)
+        attribute = name[1:-6] if name.startswith('_') and name.endswith('_value') else name
+        kind = ATTRIBUTE_KINDS.get(self.types.get(attribute))
+        if kind is not None:
+            return kind
+
+        types = {type(value) for value in values if value is not None}
+        if types == {bool}:
+            return 'b'
+        if types and types <= {int, float}:
+            return 'd'
+
+        return 'str'
+
+
+    def _start(self, records):
+        """Create the schema and the Parquet writer."""
+
+        if self.columns is None:
+            self.columns = list(dict.fromkeys(
+                name for record in records for name in record if not _is_annotation(name)))
+
+        fields = []
+        for name in self.columns:
+            kind = self._kind_of(name, (record.get(name) for record in records))
+            if kind == 'datetime':
+                data_type = pyarrow.timestamp('ms', tz='UTC')
+            else:
+                data_type = getattr(pyarrow, self.KIND_TYPES[kind])()
+            fields.append(pyarrow.field(name, data_type))
+
+        self._schema = pyarrow.schema(fields)
+        self._writer = pyarrow.parquet.ParquetWriter(self.f, self._schema, compression=self.compression)
+
+
+    def _format(self, value):
+        """Format a list or dict value as JSON."""
+
+        if isinstance(value, (list, dict)):
+            return self.codec.dumps(value).decode('utf-8')
+
+        return value
+
+
+    def _array(self, field, values):
+        """Create the array of the values of a column."""
+
+        if pyarrow.types.is_string(field.type):
+            return pyarrow.array([None if v is None else str(v) for v in values], field.type)
+        if pyarrow.types.is_timestamp(field.type):
+            # Parse the ISO 8601 datetime strings
+            return pyarrow.array(values, pyarrow.string()).cast(field.type)
+
+        # A safe cast of the values, raising on a truncated decimal
+        return pyarrow.array(values).cast(field.type)
+
+
+    def write(self, records):
+        """Write the records of a page.
+
+        Raises:
+            ValueError: A value does not fit the type of its column.
+        """
+
+        if self._writer is None:
+            self._start(records)
+
+        arrays = []
+        for field in self._schema:
+            values = [self._format(record.get(field.name)) for record in records]
+            try:
+                arrays.append(self._array(field, values))
+            except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError) as e:
+                raise ValueError(f'The values of the Parquet column {field.name} do not fit its type {field.type}: {e}') from e
+
+        self._writer.write_table(pyarrow.Table.from_arrays(arrays, schema=self._schema))
+
+
+    def close(self):
+        # Write the schema of an empty export
+        if self._writer is None:
+            self._start([])
+
+        self._writer.close()
+
+
+def export_pages(pages, path, format=None, compression=None, codec=None, columns=None, types=None):
+    """Export Pages.
+
+    Write the pages to a file as each one arrives, so only one page is
+    held in memory at a time. The file is written atomically: it is
+    replaced only when every page is written, and left as is if reading
+    or writing a page raised. The pages are closed (e.g. a
+    PrefetchPager) when the export ends.
+
+    Args:
+        pages (iterable): The pages (list of records).
+        path (str): The path of the file.
+        format (str): The format, `ndjson`, `csv` or `parquet`, default
+            to the one of the file extension.
+        compression (str): The compression of a NDJSON or CSV file
+            (`gzip`, `bz2` or `xz`), or a Parquet file (e.g. `snappy`,
+            `zstd`), default to the one of the file extension.
+        codec (JsonCodec): The JSON codec, default to the fastest
+            installed one.
+        columns (list): The CSV and Parquet columns, default to the
+            attributes of the first page.
+        types (dict): The metadata attribute type of each attribute, the
+            Parquet column types.
+
+    Returns:
+        An integer for the number of records written.
+
+    Raises:
+        ValueError: The format or compression is unknown, or a value
+            does not fit the type of its Parquet column.
+    """
+
+    guessed_format, guessed_compression = guess_format(path)
+    format = format or guessed_format
+    compression = compression or guessed_compression
+
+    if format not in ('ndjson', 'csv', 'parquet'):
+        raise ValueError(f'Unknown export format: {format}')
+    if format != 'parquet' and compression is not None and compression not in COMPRESSORS:
+        raise ValueError(f'Unknown export compression: {compression}')
+
+    codec = get_codec(codec)
+    count = 0
+
+    with atomic_write(path, 'wb') as f:
+        # Compress a NDJSON or CSV file
+        target = COMPRESSORS[compression](f) if format != 'parquet' and compression else f
+
+        if format == 'ndjson':
+            writer = NdjsonWriter(target, codec)
+        elif format == 'csv':
+            writer = CsvWriter(target, codec, columns)
+        else:
+            writer = ParquetWriter(target, codec, columns, types, compression)
+
+        try:
+            for records in pages:
+                writer.write(records)
+                count += len(records)
+        except BaseException:
+            # Release the writer before the temporary file is removed,
+            # keeping the error of the page
+            with contextlib.suppress(Exception):
+                _close(writer, target, f)
+            raise
+        finally:
+            # Stop fetching the pages ahead
+            close = getattr(pages, 'close', None)
+            if close is not None:
+                close()
+
+        _close(writer, target, f)
+
+    return count
+
+
+def _close(writer, target, f):
+    """Close the writer, then the compressed file of the file."""
+
+    writer.close()
+    if target is not f:
+        target.close()
@@ -0,0 +1,453 @@
+"""
+D365FW.Import
+~~~~~~~~~~~~~
+"""
+
+import bz2
+import csv
+import gzip
+import io
+import lzma
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from D365FW.Codec import get_codec
+from D365FW.Column import ATTRIBUTE_KINDS
+from D365FW.Common import logical_name_of
+from D365FW.Constant import BULK_MAX_BYTES
+from D365FW.Export import guess_format
+
+# The decompressed file of each compression
+DECOMPRESSORS = {
+    'gzip': lambda path: gzip.open(path, 'rb'),
+    'bz2': lambda path: bz2.open(path, 'rb'),
+    'xz': lambda path: lzma.open(path, 'rb')
+}
+
+# The bulk bound action of each import operation
+IMPORT_ACTIONS = {
+    'create': 'CreateMultiple',
+    'update': 'UpdateMultiple',
+    'upsert': 'UpsertMultiple'
+}
+
+def read_rows(path, format=None, compression=None, codec=None):
+    """Read Rows.
+
+    Read the rows of a CSV (with a header) or NDJSON file one at a time,
+    an empty CSV field is None.
+
+    Args:
+        path (str): The path of the file, e.g. `accounts.csv.gz`.
+        format (str): The format, `csv` or `ndjson`, default to the one
+            of the file extension.
+        compression (str): The compression (`gzip`, `bz2` or `xz`),
+            default to the one of the file extension.
+        codec (JsonCodec): The JSON codec of a NDJSON file.
+
+    Returns:
+        A generator yielding a tuple (row number, row, error) per row,
+        the error is a string for a row that can not be parsed.
+
+    Raises:
+        ValueError: The format or compression is unknown.
+    """
+
+    guessed_format, guessed_compression = guess_format(path)
+    format = format or guessed_format
+    compression = compression or guessed_compression
+
+    if format not in ('csv', 'ndjson'):
+        raise ValueError(f'Unknown import format: {format}')
+    if compression is not None and compression not in DECOMPRESSORS:
+        raise ValueError(f'Unknown import compression: {compression}')
+
+    codec = get_codec(codec)
+
+    with (DECOMPRESSORS[compression](path) if compression else open(path, 'rb')) as f:
+        if format == 'csv':
+            reader = csv.DictReader(io.TextIOWrapper(f, encoding='utf-8-sig', newline=''))
+            for number, row in enumerate(reader, 1):
+                yield number, {name: value if value != '' else None for name, value in row.items()}, None
+            return
+
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                row = codec.loads(line)
+            except Exception as e:
+                # The decode error type depends on the codec
+                yield number, line.decode('utf-8', 'replace').rstrip('\n'), f'Invalid JSON: {e}'
+                continue
+            if not isinstance(row, dict):
+                yield number, row, 'The row is not a JSON object.'
+                continue
+            yield number, row, None
+
+
+def convert_value(kind, value):
+    """Convert a string value (e.g. a CSV field) to its column kind.
+
+    Args:
+        kind (str): The column kind, see `ATTRIBUTE_KINDS`.
+        value (object): The value, only a string is converted.
+
+    Returns:
+        The converted value.
+
+    Raises:
+        ValueError: The string is not a value of the kind.
+    """
+
+    if not isinstance(value, str):
+        return value
+
+    if kind == 'q':
+        return int(value)
+    if kind == 'd':
+        return float(value)
+    if kind == 'b':
+        boolean = value.strip().lower()
+        if boolean not in ('true', 'false', '1', '0'):
+            raise ValueError(f'Invalid boolean: {value}')
+        return boolean in ('true', '1')
+
+    return value
+
+
+class ImportResult(object):
+    """Import Result.
+
+    The number of rows imported and rejected by a run of the import,
+    and the chunks resumed (skipped as done by a previous run) or failed
+    (left for the next run).
+    """
+
+    def __init__(self):
+        """Constructor."""
+
+        self.imported = 0
+        self.rejected = 0
+        self.resumed = 0
+        self.errors = []
+
+
+    @property
+    def complete(self):
+        """True if every chunk is done, nothing is left for the next run."""
+
+        return not self.errors
+
+
+    def __repr__(self):
+        return (f'<ImportResult imported={self.imported} rejected={self.rejected} '
+                f'resumed={self.resumed} failed={len(self.errors)}>')
+
+
+class Importer(object):
+    """Importer.
+
+    Import rows through an entity set: map each row to a payload,
+    validate it, and write the rows in chunks (one bulk request per
+    chunk, `CreateMultiple` for `create`) on a thread pool. A row that
+    does not map or validate, or fails to be written, is rejected to the
+    reject file (NDJSON with the row number, row and reason). A failed
+    `UpsertMultiple` request fails its chunk instead, an upsert can only
+    be sent in bulk.
+
+    The chunks are numbered in the row order, each finished chunk is
+    saved to the checkpoint store, so a run after a crash skips the done
+    chunks and writes the others again. A chunk is done once its rows
+    are written or rejected. The checkpoint is deleted once every chunk
+    is done, and ignored when its source fingerprint (e.g. the size and
+    modification time of the file) differs from the one of the run.
+    """
+
+    def __init__(self, entity_set, mapping=None, validate=None, operation='create', chunk_size=100,
+                 max_workers=4, bulk=True, store=None, key=None, reject_path=None):
+        """Constructor.
+
+        Args:
+            entity_set (EntitySet): The entity set to import to.
+            mapping (dict | callable): The attribute of each column (the
+                other columns are dropped), or a callable returning the
+                payload of a row, default to the row as is.
+            validate (callable): Called with each payload, returns an
+                error message (or raises ValueError) to reject it.
+            operation (str): The write operation, `create`, `update` or
+                `upsert`; an `update` payload includes its primary key.
+            chunk_size (int): The number of rows per chunk.
+            max_workers (int): The maximum number of concurrent chunks.
+            bulk (bool): Determine whether or not to write a chunk with
+                a bulk bound action instead of a request per row. A
+                failed bulk request is retried a row at a time, except
+                an `upsert` which requires it.
+            store (object): The checkpoint store (see `Checkpoint`) of
+                the done chunks, None to not resume.
+            key (str): The checkpoint key.
+            reject_path (str): The path of the reject file, appended to.
+
+        Raises:
+            ValueError: The operation is unknown, or an `upsert` without
+                bulk.
+        """
+
+        if operation not in IMPORT_ACTIONS:
+            raise ValueError(f'Unknown import operation: {operation}.')
+        if operation == 'upsert' and not bulk:
+            raise ValueError('An upsert import requires bulk.')
+
+        self.entity_set = entity_set
+        self.mapping = mapping
+        self.validate = validate
+        self.operation = operation
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers
+        self.bulk = bulk
+        self.store = store
+        self.key = key
+        self.reject_path = reject_path
+
+        # The attribute types and primary key from the loaded metadata
+        metadata = entity_set.client.get_metadata(load=False)
+        self.types = metadata.attributes(entity_set.label) if metadata is not None else {}
+        self.primary_key = metadata.primary_key(entity_set.label) if metadata is not None else None
+
+        self._lock = threading.Lock()
+        self._checkpoint = None
+
+
+    def map(self, row):
+        """Map a row to its payload.
+
+        Args:
+            row (dict): The row.
+
+        Returns:
+            A dictionary for the payload.
+
+        Raises:
+            ValueError: A value does not convert to its attribute type,
+                or an attribute is unknown in the loaded metadata.
+        """
+
+        if self.mapping is None:
+            payload = dict(row)
+        elif callable(self.mapping):
+            payload = self.mapping(row)
+        else:
+            payload = {attribute: row.get(column) for column, attribute in self.mapping.items()}
+
+        if not self.types:
+            return payload
+
+        for name, value in payload.items():
+            # Skip the annotations (e.g. `parentaccountid@odata.bind`)
+            if '@' in name:
+                continue
+
+            # The lookup value of an attribute (e.g. `_parentaccountid_value`)
+            attribute = name[1:-6] if name.startswith('_') and name.endswith('_value') else name
+            if attribute not in self.types:
+                raise ValueError(f'Unknown attribute: {name}')
+
+            kind = ATTRIBUTE_KINDS.get(self.types[attribute])
+            try:
+                payload[name] = convert_value(kind, value)
+            except ValueError:
+                raise ValueError(f'Invalid {self.types[attribute]} value of {name}: {value}')
+
+        return payload
+
+
+    def run(self, rows, source=None):
+        """Run the import.
+
+        Args:
+            rows (iterable): A tuple (row number, row, error) per row,
+                see `read_rows`.
+            source (dict): The JSON serializable fingerprint of the rows
+                source (e.g. the size and modification time of the
+                file), a checkpoint of another source is ignored.
+
+        Returns:
+            An ImportResult for the run.
+        """
+
+        result = ImportResult()
+
+        # Load the done chunks of the same source
+        checkpoint = self.store.get(self.key) if self.store is not None else None
+        if checkpoint is None or checkpoint.get('source') != source:
+            checkpoint = {'chunk_size': self.chunk_size, 'next': 0, 'done': [], 'imported': 0, 'rejected': 0,
+                          'source': source}
+        self._checkpoint = checkpoint
+
+        # Keep the chunk numbering of the previous runs
+        chunk_size = checkpoint['chunk_size']
+        done = set(checkpoint['done'])
+
+        def collect(futures):
+            for future in futures:
+                error = future.exception()
+                if error is not None:
+                    result.errors.append(error)
+                else:
+                    imported, rejected = future.result()
+                    result.imported += imported
+                    result.rejected += rejected
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = set()
+
+            for index, chunk in enumerate(self._chunks(rows, chunk_size)):
+                # Skip the chunks done by a previous run
+                if index < checkpoint['next'] or index in done:
+                    result.resumed += 1
+                    continue
+
+                # Read ahead at most two chunks per worker
+                if len(pending) >= self.max_workers * 2:
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(finished)
+
+                pending.add(executor.submit(self._run_chunk, index, chunk))
+
+            collect(wait(pending).done)
+
+        # Every chunk is done, a next run starts over
+        if result.complete and self.store is not None:
+            self.store.delete(self.key)
+
+        return result
+
+
+    @staticmethod
+    def _chunks(rows, chunk_size):
+        """Split the rows in chunks of `chunk_size` rows."""
+
+        chunk = []
+
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+
+        if chunk:
+            yield chunk
+
+
+    def _run_chunk(self, index, chunk):
+        """Map, validate and write a chunk, run on a worker thread.
+
+        Returns:
+            A tuple (number of imported rows, number of rejected rows).
+        """
+
+        items = []
+        rejects = []
+
+        for number, row, error in chunk:
+            if error is None:
+                try:
+                    payload = self.map(row)
+                    error = self.validate(payload) if self.validate is not None else None
+                except (ValueError, TypeError, KeyError) as e:
+                    error = str(e)
+
+            if error:
+                rejects.append((number, row, error))
+            else:
+                items.append((number, row, payload))
+
+        imported, failed = self._write(items)
+        rejects.extend(failed)
+
+        self._complete(index, imported, rejects)
+
+        return imported, len(rejects)
+
+
+    def _write(self, items):
+        """Write the payloads of a chunk.
+
+        Args:
+            items (list): A tuple (row number, row, payload) per row.
+
+        Returns:
+            A tuple (number of written rows, list of rejected rows).
+
+        Raises:
+            RuntimeError: The `UpsertMultiple` request failed.
+        """
+
+        if not items:
+            return 0, []
+
+        entity_set = self.entity_set
+
+        if self.bulk:
+            ids = entity_set._bulk(IMPORT_ACTIONS[self.operation], [payload for _, _, payload in items],
+                                   None, len(items), BULK_MAX_BYTES)
+            failed = [item for item, id in zip(items, ids) if id is None]
+            if not failed:
+                return len(items), []
+
+            # An upsert is not sent a row at a time, the chunk is left for the next run
+            if self.operation == 'upsert':
+                raise RuntimeError(f'The {IMPORT_ACTIONS[self.operation]} request of rows '
+                                   f'{items[0][0]} to {items[-1][0]} failed.')
+
+            # Write the rows of the failed request one at a time
+            written = len(items) - len(failed)
+            items = failed
+        else:
+            written = 0
+
+        rejects = []
+        primary_key = self.primary_key or f'{logical_name_of(entity_set.label)}id'
+
+        for number, row, payload in items:
+            if self.operation == 'create':
+                success = entity_set._create(entity_set.url, payload) is not None
+            elif self.operation == 'update' and payload.get(primary_key) is not None:
+                fields = {name: value for name, value in payload.items() if name != primary_key}
+                success = entity_set._update(f'{entity_set.url}({payload[primary_key]})', fields) is not None
+            else:
+                success = False
+
+            if success:
+                written += 1
+            else:
+                rejects.append((number, row, f'The {self.operation} request failed.'))
+
+        return written, rejects
+
+
+    def _complete(self, index, imported, rejects):
+        """Save the rejected rows and the checkpoint of a done chunk."""
+
+        with self._lock:
+            # Append the rejected rows
+            if rejects and self.reject_path is not None:
+                codec = self.entity_set.codec
+                with open(self.reject_path, 'ab') as f:
+                    f.write(b''.join(codec.dumps({'row': number, 'data': row, 'reason': reason}) + b'\n'
+                                     for number, row, reason in rejects))
+
+            checkpoint = self._checkpoint
+            checkpoint['imported'] += imported
+            checkpoint['rejected'] += len(rejects)
+
+            # Keep the number of leading done chunks and the done ones after it
+            done = set(checkpoint['done'])
+            done.add(index)
+            while checkpoint['next'] in done:
+                done.remove(checkpoint['next'])
+                checkpoint['next'] += 1
+            checkpoint['done'] = sorted(done)
+
+            if self.store is not None:
+                self.store.set(self.key, checkpoint)
@@ -0,0 +1,328 @@
+"""
+D365FW.Metadata
+~~~~~~~~~~~~~~~
+"""
+
+import json
+import os
+import time
+
+from D365FW.Constant import METADATA_CACHE_DIR
+from D365FW.Storage import file_lock, atomic_write
+
+# The version of the metadata cache file format
+METADATA_CACHE_VERSION = 1
+
+# The EntityDefinitions query of the indexed metadata
+ENTITY_DEFINITIONS_QUERY = (
+    '$select=LogicalName,EntitySetName,PrimaryIdAttribute,PrimaryNameAttribute'
+    '&$expand=Attributes($select=LogicalName,AttributeType),'
+    'Keys($select=LogicalName,KeyAttributes),'
+    'ManyToOneRelationships($select=ReferencingEntityNavigationPropertyName,ReferencedEntity),'
+    'OneToManyRelationships($select=ReferencedEntityNavigationPropertyName,ReferencingEntity),'
+    'ManyToManyRelationships($select=Entity1LogicalName,Entity1NavigationPropertyName,'
+    'Entity2LogicalName,Entity2NavigationPropertyName)'
+)
+
+class Metadata(object):
+    """Metadata.
+
+    Index of the entity definitions of an environment: the entity set
+    name, primary key, attributes (with their type), navigation
+    properties and alternate keys of each entity, looked up by logical
+    name (e.g. `account`) or entity set name (e.g. `accounts`).
+
+    .. _Query Table Definitions Using The Web API:
+    https://learn.microsoft.com/en-us/power-apps/developer/data-platform/webapi/query-metadata-web-api
+    """
+
+    def __init__(self, entities, fetched_on=None):
+        """Constructor.
+
+        Args:
+            entities (dict): The entity definition of each logical name,
+                see `from_entity_definitions`.
+            fetched_on (float): The time (seconds since the epoch) the
+                metadata was fetched, default to now.
+        """
+
+        self.entities = entities
+        self.fetched_on = time.time() if fetched_on is None else fetched_on
+
+        # Index the logical name of each entity set
+        self._logical_names = {entity['entity_set']: logical_name
+                               for logical_name, entity in entities.items()
+                               if entity.get('entity_set')}
+
+
+    @classmethod
+    def from_entity_definitions(cls, definitions):
+        """Create the Metadata from the EntityDefinitions.
+
+        Args:
+            definitions (list): The EntityDefinitions read with the
+                `ENTITY_DEFINITIONS_QUERY`.
+
+        Returns:
+            A Metadata for the definitions.
+        """
+
+        entities = {}
+
+        for definition in definitions:
+            logical_name = definition['LogicalName']
+
+            # Index the navigation properties
+            navigation = {}
+            for relationship in definition.get('ManyToOneRelationships', []):
+                name = relationship.get('ReferencingEntityNavigationPropertyName')
+                if name:
+                    navigation[name] = relationship['ReferencedEntity']
+            for relationship in definition.get('OneToManyRelationships', []):
+                name = relationship.get('ReferencedEntityNavigationPropertyName')
+                if name:
+                    navigation[name] = relationship['ReferencingEntity']
+            for relationship in definition.get('ManyToManyRelationships', []):
+                if relationship.get('Entity1LogicalName') == logical_name:
+                    navigation[relationship['Entity1NavigationPropertyName']] = relationship['Entity2LogicalName']
+                if relationship.get('Entity2LogicalName') == logical_name:
+                    navigation[relationship['Entity2NavigationPropertyName']] = relationship['Entity1LogicalName']
+
+            entities[logical_name] = {
+                'entity_set': definition.get('EntitySetName'),
+                'primary_key': definition.get('PrimaryIdAttribute'),
+                'primary_name': definition.get('PrimaryNameAttribute'),
+                'attributes': {attribute['LogicalName']: attribute.get('AttributeType')
+                               for attribute in definition.get('Attributes', [])},
+                'navigation': navigation,
+                'keys': [list(key.get('KeyAttributes', [])) for key in definition.get('Keys', [])]
+            }
+
+        return cls(entities)
+
+
+    def entity(self, name):
+        """Get Entity Definition.
+
+        Args:
+            name (str): The logical name or entity set name.
+
+        Returns:
+            A dictionary for the entity definition, or None if unknown.
+        """
+
+        entity = self.entities.get(name)
+        if entity is None and name in self._logical_names:
+            entity = self.entities[self._logical_names[name]]
+
+        return entity
+
+
+    def logical_name(self, name):
+        """Get the logical name of an entity set name (or logical name).
+
+        Returns:
+            A string for the logical name, or None if unknown.
+        """
+
+        if name in self.entities:
+            return name
+
+        return self._logical_names.get(name)
+
+
+    def entity_set(self, name):
+        """Get the entity set name of a logical name (or entity set name).
+
+        Returns:
+            A string for the entity set name, or None if unknown.
+        """
+
+        entity = self.entity(name)
+
+        return None if entity is None else entity['entity_set']
+
+
+    def primary_key(self, name):
+        """Get the primary key attribute of an entity.
+
+        Returns:
+            A string for the primary key, or None if unknown.
+        """
+
+        entity = self.entity(name)
+
+        return None if entity is None else entity['primary_key']
+
+
+    def attributes(self, name):
+        """Get the attributes of an entity.
+
+        Returns:
+            A dictionary for the type (e.g. `String`, `Lookup`) of each
+            attribute, empty if the entity is unknown.
+        """
+
+        entity = self.entity(name)
+
+        return {} if entity is None else entity['attributes']
+
+
+    def navigation(self, name):
+        """Get the navigation properties of an entity.
+
+        Returns:
+            A dictionary for the related logical name of each navigation
+            property, empty if the entity is unknown.
+        """
+
+        entity = self.entity(name)
+
+        return {} if entity is None else entity['navigation']
+
+
+    def alternate_keys(self, name):
+        """Get the alternate keys of an entity.
+
+        Returns:
+            A list for the attributes of each alternate key, empty if
+            the entity is unknown.
+        """
+
+        entity = self.entity(name)
+
+        return [] if entity is None else entity['keys']
+
+
+    def validate_select(self, name, attributes):
+        """Validate the attributes of a `$select`.
+
+        Args:
+            name (str): The logical name or entity set name.
+            attributes (list): The selected attributes, a lookup may be
+                given as `_<attribute>_value`.
+
+        Returns:
+            A string for the `$select` value.
+
+        Raises:
+            ValueError: The entity or an attribute is unknown.
+        """
+
+        entity = self.entity(name)
+        if entity is None:
+            raise ValueError(f'Unknown entity: {name}')
+
+        unknown = [attribute for attribute in attributes
+                   if attribute not in entity['attributes'] and
+                   not (attribute.startswith('_') and attribute.endswith('_value') and
+                        attribute[1:-6] in entity['attributes'])]
+        if unknown:
+            raise ValueError(f'Unknown attribute of {name}: {", ".join(unknown)}')
+
+        return ','.join(attributes)
+
+
+    def to_dict(self):
+        """Serialize the Metadata to a JSON (JavaScript Object Notation)
+        serializable dictionary."""
+
+        return {'fetched_on': self.fetched_on, 'entities': self.entities}
+
+
+    @classmethod
+    def from_dict(cls, data):
+        """Create the Metadata from the dictionary of `to_dict`."""
+
+        return cls(data['entities'], fetched_on=data.get('fetched_on'))
+
+
+    def __repr__(self):
+        return f'<Metadata {len(self.entities)} entities>'
+
+
+class FileMetadataCache(object):
+    """File Metadata Cache.
+
+    On disk metadata cache, one JSON (JavaScript Object Notation) file
+    per environment, reloaded at startup instead of fetching the
+    multi-megabyte metadata again. A file written with another cache
+    format version or API version, or older than `max_age`, is ignored.
+    """
+
+    def __init__(self, directory=None, max_age=24 * 60 * 60):
+        """Constructor.
+
+        Args:
+            directory (str): The directory of the cache files, default
+                to `~/.d365fw/metadata`.
+            max_age (float): The number of seconds the cached metadata
+                is used for, or None to use it until it is refreshed.
+        """
+
+        self.directory = directory or os.path.join(os.path.expanduser('~'), METADATA_CACHE_DIR)
+        self.max_age = max_age
+
+        # Create the cache directory
+        os.makedirs(self.directory, exist_ok=True)
+
+
+    def get_path(self, hostname):
+        """Get the path of the cache file of an environment."""
+
+        return os.path.join(self.directory, f'{hostname}.json')
+
+
+    def load(self, hostname, api_version):
+        """Load Metadata.
+
+        Args:
+            hostname (str): The Hostname of the environment.
+            api_version (str): The Web API version.
+
+        Returns:
+            The cached Metadata, or None if there is no valid one.
+        """
+
+        path = self.get_path(hostname)
+
+        with file_lock(f'{path}.lock'):
+            try:
+                with open(path, 'r') as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                return None
+
+        # Check the cache file version
+        if data.get('version') != METADATA_CACHE_VERSION or data.get('api_version') != api_version:
+            return None
+
+        metadata = Metadata.from_dict(data['metadata'])
+
+        # Check the age of the metadata
+        if self.max_age is not None and time.time() - metadata.fetched_on > self.max_age:
+            return None
+
+        return metadata
+
+
+    def save(self, hostname, api_version, metadata):
+        """Save Metadata.
+
+        Args:
+            hostname (str): The Hostname of the environment.
+            api_version (str): The Web API version.
+            metadata (Metadata): The metadata to cache.
+        """
+
+        path = self.get_path(hostname)
+
+        data = {
+            'version': METADATA_CACHE_VERSION,
+            'api_version': api_version,
+            'metadata': metadata.to_dict()
+        }
+
+        with file_lock(f'{path}.lock'):
+            with atomic_write(path) as f:
+                json.dump(data, f)
@@ -0,0 +1,273 @@
+"""
+D365FW.Metrics
+~~~~~~~~~~~~~~
+"""
+
+import re
+import threading
+from urllib.parse import urlsplit, unquote
+
+# The upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+class RequestEvent(object):
+    """Request Event.
+
+    The report of a request sent through the Transport, passed to each
+    hook once the request is done. The latency, retries and throttle
+    waits cover every attempt of the call.
+    """
+
+    __slots__ = ('operation', 'entity_set', 'method', 'url', 'status_code', 'latency', 'request_bytes',
+                 'response_bytes', 'retries', 'throttle_retries', 'throttle_wait', 'error')
+
+    def __init__(self, operation, entity_set, method, url, status_code=None, latency=0.0, request_bytes=0,
+                 response_bytes=0, retries=0, throttle_retries=0, throttle_wait=0.0, error=None):
+        """Constructor.
+
+        Args:
+            operation (str): The operation, e.g. `read`, `create`,
+                `CreateMultiple`, `batch`, `login`.
+            entity_set (str): The entity set name, or None.
+            method (str): The HTTP method.
+            url (str): The request URL.
+            status_code (int): The status code of the last response, or
+                None if the request failed without one.
+            latency (float): The number of seconds of the call.
+            request_bytes (int): The size of the request body.
+            response_bytes (int): The size of the response body.
+            retries (int): The number of attempts sent again after a
+                transient error.
+            throttle_retries (int): The number of attempts sent again
+                after a throttled (429) response.
+            throttle_wait (float): The number of seconds waited for the
+                throttle (the `Retry-After` and a free request slot).
+            error (Exception): The error raised by the request.
+        """
+
+        self.operation = operation
+        self.entity_set = entity_set
+        self.method = method
+        self.url = url
+        self.status_code = status_code
+        self.latency = latency
+        self.request_bytes = request_bytes
+        self.response_bytes = response_bytes
+        self.retries = retries
+        self.throttle_retries = throttle_retries
+        self.throttle_wait = throttle_wait
+        self.error = error
+
+
+    def __repr__(self):
+        return (f'<RequestEvent {self.operation} {self.entity_set} {self.status_code} '
+                f'{self.latency * 1000:.1f}ms>')
+
+
+def describe_request(method, url):
+    """Describe the operation and entity set of a request.
+
+    Args:
+        method (str): The HTTP method.
+        url (str): The request URL, e.g.
+            `https://org.api.crm.dynamics.com/api/data/v9.2/accounts(id)`.
+
+    Returns:
+        A tuple (operation, entity set name or None).
+    """
+
+    parts = urlsplit(url)
+    if parts.netloc.startswith('login.'):
+        return 'login', None
+
+    segments = [unquote(segment) for segment in parts.path.split('/') if segment]
+
+    # Skip the `/api/data/v9.2` root of the Web API
+    if len(segments) >= 3 and segments[0] == 'api' and segments[1] == 'data':
+        segments = segments[3:]
+
+    if not segments:
+        return method.lower(), None
+    if segments[0] == '$batch':
+        return 'batch', None
+
+    entity_set = re.match(r'[^(]*', segments[0]).group()
+
+    # A bound action (e.g. `Microsoft.Dynamics.CRM.CreateMultiple`)
+    if segments[-1].startswith('Microsoft.Dynamics.CRM.'):
+        return segments[-1][len('Microsoft.Dynamics.CRM.'):], entity_set
+
+    if segments[-1] == '$ref':
+        return 'associate' if method in ('POST', 'PUT') else 'disassociate', entity_set
+
+    if method == 'GET':
+        return 'query' if '$filter' in unquote(parts.query) or 'fetchXml' in parts.query else 'read', entity_set
+
+    return {'POST': 'create', 'PATCH': 'update', 'DELETE': 'delete'}.get(method, method.lower()), entity_set
+
+
+def _format_labels(labels):
+    """Format the labels of a Prometheus sample."""
+
+    items = []
+
+    for name, value in labels:
+        value = str('' if value is None else value)
+        value = value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        items.append(f'{name}="{value}"')
+
+    return '{' + ','.join(items) + '}'
+
+
+def _format_value(value):
+    """Format the value of a Prometheus sample."""
+
+    if value == float('inf'):
+        return '+Inf'
+
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metrics(object):
+    """Metrics.
+
+    In memory counters and latency histograms of the requests, per
+    operation and entity set. A Metrics is a Transport hook, export it
+    with `to_prometheus` in the Prometheus text format.
+
+    Example:
+        metrics = Metrics()
+        transport = Transport(hooks=[metrics])
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS, namespace='d365fw'):
+        """Constructor.
+
+        Args:
+            buckets (tuple): The upper bounds (seconds) of the latency
+                histogram buckets.
+            namespace (str): The prefix of the metric names.
+        """
+
+        self.buckets = tuple(sorted(buckets))
+        self.namespace = namespace
+
+        self._lock = threading.Lock()
+        self.reset()
+
+
+    def reset(self):
+        """Reset all the metrics."""
+
+        with self._lock:
+            # Map (operation, entity set, status) to the number of requests
+            self._requests = {}
+            # Map (operation, entity set) to the latency, bytes, retries and waits
+            self._series = {}
+
+
+    def __call__(self, event):
+        """Record a RequestEvent, see `Transport`."""
+
+        status = 'error' if event.status_code is None else str(event.status_code)
+        key = (event.operation, event.entity_set)
+
+        with self._lock:
+            request_key = key + (status,)
+            self._requests[request_key] = self._requests.get(request_key, 0) + 1
+
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {
+                    'buckets': [0] * len(self.buckets),
+                    'latency_sum': 0.0,
+                    'count': 0,
+                    'request_bytes': 0,
+                    'response_bytes': 0,
+                    'retries': 0,
+                    'throttle_retries': 0,
+                    'throttle_wait': 0.0
+                }
+
+            # Count the latency in its bucket, the cumulative counts are exported
+            for index, bound in enumerate(self.buckets):
+                if event.latency <= bound:
+                    series['buckets'][index] += 1
+                    break
+
+            series['latency_sum'] += event.latency
+            series['count'] += 1
+            series['request_bytes'] += event.request_bytes
+            series['response_bytes'] += event.response_bytes
+            series['retries'] += event.retries
+            series['throttle_retries'] += event.throttle_retries
+            series['throttle_wait'] += event.throttle_wait
+
+
+    def snapshot(self):
+        """Snapshot the metrics.
+
+        Returns:
+            A dictionary with the `requests` count of each (operation,
+            entity set, status) and the `series` (latency, bytes,
+            retries and throttle waits) of each (operation, entity set).
+        """
+
+        with self._lock:
+            return {
+                'requests': dict(self._requests),
+                'series': {key: dict(series, buckets=list(series['buckets']))
+                           for key, series in self._series.items()}
+            }
+
+
+    def to_prometheus(self):
+        """Export the metrics in the Prometheus text format.
+
+        .. _Exposition Formats:
+        https://prometheus.io/docs/instrumenting/exposition_formats/
+
+        Returns:
+            A string for the metrics.
+        """
+
+        snapshot = self.snapshot()
+        name = self.namespace
+        lines = []
+
+        def metric(suffix, kind, description, samples):
+            lines.append(f'# HELP {name}_{suffix} {description}')
+            lines.append(f'# TYPE {name}_{suffix} {kind}')
+            for sample_suffix, labels, value in samples:
+                lines.append(f'{name}_{suffix}{sample_suffix}{_format_labels(labels)} {_format_value(value)}')
+
+        def labels_of(key):
+            return [('operation', key[0]), ('entity_set', key[1])]
+
+        series = sorted(snapshot['series'].items(), key=lambda item: tuple(str(part) for part in item[0]))
+
+        metric('requests_total', 'counter', 'The number of requests.',
+               [('', labels_of(key) + [('status', key[2])], count)
+                for key, count in sorted(snapshot['requests'].items(),
+                                         key=lambda item: tuple(str(part) for part in item[0]))])
+
+        samples = []
+        for key, values in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets, values['buckets']):
+                cumulative += count
+                samples.append(('_bucket', labels_of(key) + [('le', _format_value(float(bound)))], cumulative))
+            samples.append(('_bucket', labels_of(key) + [('le', '+Inf')], values['count']))
+            samples.append(('_sum', labels_of(key), values['latency_sum']))
+            samples.append(('_count', labels_of(key), values['count']))
+        metric('request_duration_seconds', 'histogram', 'The latency of the requests, including the retries.', samples)
+
+        for suffix, field, description in (
+                ('request_bytes_total', 'request_bytes', 'The size of the request bodies.'),
+                ('response_bytes_total', 'response_bytes', 'The size of the response bodies.'),
+                ('retries_total', 'retries', 'The number of attempts sent again after a transient error.'),
+                ('throttle_retries_total', 'throttle_retries', 'The number of attempts sent again after a 429.'),
+                ('throttle_wait_seconds_total', 'throttle_wait', 'The time waited for the throttle.')):
+            metric(suffix, 'counter', description, [('', labels_of(key), values[field]) for key, values in series])
+
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,195 @@
+"""
+D365FW.Pager
+~~~~~~~~~~~~
+"""
+
+import queue
+import threading
+
+class IncompleteReadError(Exception):
+    """Incomplete Read Error.
+
+    A page request failed, the pages read before it are incomplete. The
+    read can be resumed from the `url` (the `@odata.nextLink` of the
+    failed page).
+    """
+
+    def __init__(self, url, status_code, count=0):
+        """Constructor.
+
+        Args:
+            url (str): The request URL of the failed page.
+            status_code (int): The status code of the response.
+            count (int): The number of records read before the failed
+                page.
+        """
+
+        super().__init__(f'The page request failed with status code {status_code}: {url}')
+
+        self.url = url
+        self.status_code = status_code
+        self.count = count
+
+
+class PrefetchPager(object):
+    """Prefetch Pager.
+
+    Fetch the pages of a page iterator on a background worker thread
+    while the caller consumes the current page. At most `depth` pages
+    are fetched ahead, the worker waits (backpressure) until the caller
+    catches up.
+    """
+
+    # Sentinel marking the end of the pages
+    _DONE = object()
+
+    def __init__(self, pages, depth=1):
+        """Constructor.
+
+        Args:
+            pages (iterable): The page iterator to prefetch from.
+            depth (int): The maximum number of pages to fetch ahead.
+        """
+
+        if depth < 1:
+            raise ValueError('The prefetch depth must be at least 1.')
+
+        self.pages = pages
+        self.depth = depth
+        self._queue = queue.Queue(maxsize=depth)
+        self._stop = threading.Event()
+        self._worker = None
+
+
+    def start(self):
+        """Start fetching the pages on the worker thread."""
+
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._fetch, daemon=True)
+            self._worker.start()
+
+
+    def _fetch(self, pages=None):
+        """Fetch the pages, run on the worker thread."""
+
+        pages = self.pages if pages is None else pages
+
+        try:
+            for page in pages:
+                if not self._put((page, None)):
+                    return
+        except BaseException as e:
+            # Hand the error over to the caller
+            self._put((self._DONE, e))
+        else:
+            self._put((self._DONE, None))
+        finally:
+            close = getattr(pages, 'close', None)
+            if close is not None:
+                close()
+
+
+    def _put(self, item):
+        """Put an item in the queue unless the pager is closed.
+
+        Returns:
+            True if the item was put, False if the pager is closed.
+        """
+
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+
+        return False
+
+
+    def close(self):
+        """Stop the worker thread and discard the prefetched pages."""
+
+        self._stop.set()
+
+        # Unblock the worker waiting on a full queue
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+
+
+    def __iter__(self):
+        self.start()
+
+        try:
+            while True:
+                page, error = self._queue.get()
+                if page is self._DONE:
+                    if error is not None:
+                        raise error
+                    return
+                yield page
+        finally:
+            self.close()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class MergePager(PrefetchPager):
+    """Merge Pager.
+
+    Fetch the pages of many page iterators concurrently, one worker
+    thread each, and merge them into a single iterator in the order
+    they arrive. At most `depth` pages are fetched ahead in total.
+    """
+
+    def __init__(self, sources, depth=None):
+        """Constructor.
+
+        Args:
+            sources (list): The page iterators to fetch from.
+            depth (int): The maximum number of pages to fetch ahead,
+                default to one per page iterator.
+        """
+
+        self.sources = list(sources)
+
+        super().__init__(None, depth=depth or max(len(self.sources), 1))
+
+        self._workers = []
+
+
+    def start(self):
+        """Start fetching the pages, one worker thread per page iterator."""
+
+        if self._workers:
+            return
+
+        for pages in self.sources:
+            worker = threading.Thread(target=self._fetch, args=(pages,), daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+
+    def __iter__(self):
+        self.start()
+
+        try:
+            remaining = len(self.sources)
+            while remaining:
+                page, error = self._queue.get()
+                if page is self._DONE:
+                    if error is not None:
+                        raise error
+                    remaining -= 1
+                    continue
+                yield page
+        finally:
+            self.close()
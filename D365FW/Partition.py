@@ -0,0 +1,108 @@
+"""
+D365FW.Partition
+~~~~~~~~~~~~~~~~
+"""
+
+from datetime import datetime, timezone
+
+# The format of a datetime literal in the OData filter
+DATETIME_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+
+def guid_bounds(partitions):
+    """Split the unique identifier (GUID) key range.
+
+    SQL Server orders the `uniqueidentifier` by its last 6 bytes first,
+    so the range is split on the most significant of them (the first
+    byte of the last group), which keeps the sequential GUIDs generated
+    by the service spread over the partitions.
+
+    Args:
+        partitions (int): The number of partitions, at most 256.
+
+    Returns:
+        A list of `partitions - 1` GUID strings, the lower bound of
+        each partition after the first one.
+    """
+
+    if not 1 <= partitions <= 256:
+        raise ValueError('The number of GUID partitions must be between 1 and 256.')
+
+    return [f'00000000-0000-0000-0000-{(256 * i) // partitions:02x}0000000000'
+            for i in range(1, partitions)]
+
+
+def datetime_bounds(start, end, partitions):
+    """Split the datetime key range into equal time ranges.
+
+    Args:
+        start (datetime): The smallest key value.
+        end (datetime): The largest key value.
+        partitions (int): The number of partitions.
+
+    Returns:
+        A list of at most `partitions - 1` datetime literals, the lower
+        bound of each partition after the first one.
+    """
+
+    if partitions < 1:
+        raise ValueError('The number of partitions must be at least 1.')
+
+    step = (end - start) / partitions
+
+    bounds = []
+    for i in range(1, partitions):
+        bound = format_datetime(start + step * i)
+        # Drop the empty partitions of a short range
+        if not bounds or bounds[-1] != bound:
+            bounds.append(bound)
+
+    return bounds
+
+
+def partition_filters(key, bounds):
+    """Create the filter of each partition.
+
+    The first partition has no lower bound and also has the records
+    with a null key, and the last one has no upper bound, so the
+    partitions cover the whole table, including the records created
+    while it is read.
+
+    Args:
+        key (str): The attribute to partition on.
+        bounds (list): The lower bound literal of each partition after
+            the first one, in ascending order.
+
+    Returns:
+        A list of `len(bounds) + 1` filter expressions.
+    """
+
+    filters = []
+    lower = None
+    for upper in list(bounds) + [None]:
+        conditions = []
+        if lower is not None:
+            conditions.append(f'{key} ge {lower}')
+        if upper is not None and lower is None:
+            # A null key is not in any range
+            conditions.append(f'({key} lt {upper} or {key} eq null)')
+        elif upper is not None:
+            conditions.append(f'{key} lt {upper}')
+        filters.append(' and '.join(conditions))
+        lower = upper
+
+    return filters
+
+
+def parse_datetime(value):
+    """Parse an OData datetime value (e.g. `2020-01-01T00:00:00Z`)."""
+
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
+def format_datetime(value):
+    """Format a datetime as an OData datetime literal in UTC."""
+
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+
+    return value.strftime(DATETIME_FORMAT)
@@ -0,0 +1,352 @@
+"""
+D365FW.Profiler
+~~~~~~~~~~~~~~~
+"""
+
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from D365FW.Storage import atomic_write
+
+# The profiler of the request sent on the current thread
+_active = threading.local()
+
+class Profiler(object):
+    """Profiler.
+
+    Latency waterfall of the requests, each one broken into phases:
+    `connection_acquire` (wait for a pooled connection), `tcp_connect`
+    and `tls_handshake` (new connection), `send`, `ttfb` (time to first
+    byte, until the response headers), `body` (download), `json_decode`,
+    and the `assemble` time of each operation (its time outside of the
+    other phases). The spans are saved in the Chrome trace event format,
+    open the file with `chrome://tracing` or https://ui.perfetto.dev.
+
+    .. _Trace Event Format:
+    https://docs.google.com/document/d/1CvAClvFfyA5R-PhYUmn5OOQtYMH4h6I0nSsKchNAySU
+
+    Example:
+        profiler = Profiler('trace.json')
+        transport = Transport(profiler=profiler)
+        ...
+        profiler.save()
+    """
+
+    def __init__(self, path=None, max_events=1000000):
+        """Constructor.
+
+        Args:
+            path (str): The path of the trace file, see `save`.
+            max_events (int): The maximum number of spans kept, the
+                spans past it are dropped (and counted in `dropped`).
+        """
+
+        self.path = path
+        self.max_events = max_events
+        self.events = []
+        self.dropped = 0
+
+        self._origin = time.perf_counter()
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+
+    @contextlib.contextmanager
+    def span(self, name, category='phase', **args):
+        """Record a span.
+
+        The time of the nested spans is subtracted from the `self_ms` of
+        an `operation` span, reported as its `assemble` phase.
+
+        Args:
+            name (str): The span name, e.g. `ttfb`.
+            category (str): The span category, `operation`, `request`
+                or `phase`.
+            args (dict): The arguments shown with the span.
+
+        Returns:
+            A context manager timing its block.
+        """
+
+        # The nested spans of the thread
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+
+        frame = [0.0]
+        stack.append(frame)
+        start = time.perf_counter()
+
+        try:
+            yield args
+        finally:
+            end = time.perf_counter()
+            stack.pop()
+
+            duration = end - start
+            if stack:
+                stack[-1][0] += duration
+
+            if category == 'operation':
+                args['self_ms'] = round((duration - frame[0]) * 1000, 3)
+
+            self.add(name, category, start, end, args)
+
+
+    def add(self, name, category, start, end, args=None):
+        """Add a span from its `time.perf_counter` bounds."""
+
+        event = {
+            'name': name,
+            'cat': category,
+            'ph': 'X',
+            'ts': round((start - self._origin) * 1000000, 3),
+            'dur': round((end - start) * 1000000, 3),
+            'pid': self._pid,
+            'tid': threading.get_ident(),
+            'args': args or {}
+        }
+
+        with self._lock:
+            if len(self.events) < self.max_events:
+                self.events.append(event)
+            else:
+                self.dropped += 1
+
+
+    @contextlib.contextmanager
+    def activate(self):
+        """Profile the requests sent on the current thread within the
+        context, see `Transport.request`."""
+
+        previous = getattr(_active, 'profiler', None)
+        _active.profiler = self
+
+        try:
+            yield self
+        finally:
+            _active.profiler = previous
+
+
+    def summary(self):
+        """Summarize the phases.
+
+        Returns:
+            A dictionary for the `count`, `total_ms`, `p50_ms`, `p99_ms`
+            and `max_ms` of each phase (and of each operation `assemble`
+            time).
+        """
+
+        with self._lock:
+            events = list(self.events)
+
+        durations = {}
+        for event in events:
+            if event['cat'] == 'operation':
+                durations.setdefault('assemble', []).append(event['args']['self_ms'])
+            else:
+                durations.setdefault(event['name'], []).append(round(event['dur'] / 1000, 3))
+
+        summary = {}
+        for name, values in durations.items():
+            values.sort()
+            summary[name] = {
+                'count': len(values),
+                'total_ms': round(sum(values), 3),
+                'p50_ms': values[int(0.5 * (len(values) - 1))],
+                'p99_ms': values[int(0.99 * (len(values) - 1))],
+                'max_ms': values[-1]
+            }
+
+        return summary
+
+
+    def save(self, path=None):
+        """Save the spans to a trace file (Chrome trace event JSON).
+
+        Args:
+            path (str): The path of the trace file, default to `path`.
+        """
+
+        with self._lock:
+            events = list(self.events)
+
+        trace = {
+            'traceEvents': events,
+            'displayTimeUnit': 'ms',
+            'otherData': {'dropped': self.dropped}
+        }
+
+        with atomic_write(path or self.path) as f:
+            json.dump(trace, f)
+
+
+    def clear(self):
+        """Drop all the spans."""
+
+        with self._lock:
+            self.events = []
+            self.dropped = 0
+
+
+def _span(name, **args):
+    """Record a span with the profiler of the current thread, if any."""
+
+    profiler = getattr(_active, 'profiler', None)
+    if profiler is None:
+        return contextlib.nullcontext()
+
+    return profiler.span(name, **args)
+
+
+def profiled(operation):
+    """Profile an entity set operation (e.g. `read`) with the profiler
+    of its transport, a no-op when profiling is disabled."""
+
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(self, *args, **kwargs):
+            profiler = getattr(self.transport, 'profiler', None)
+            if profiler is None:
+                return function(self, *args, **kwargs)
+
+            with profiler.span(operation, 'operation', entity_set=self.label):
+                return function(self, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class ProfiledCodec(object):
+    """Profiled Codec.
+
+    Record a `json_decode` span around the decoding of the codec.
+    """
+
+    def __init__(self, codec, profiler):
+        """Constructor.
+
+        Args:
+            codec (JsonCodec): The codec to profile.
+            profiler (Profiler): The profiler.
+        """
+
+        self.codec = codec
+        self.profiler = profiler
+        self.name = codec.name
+
+
+    def loads(self, data):
+        """Decode the JSON bytes (or str) to an object."""
+
+        with self.profiler.span('json_decode', bytes=len(data)):
+            return self.codec.loads(data)
+
+
+    def dumps(self, obj):
+        """Encode the object to JSON bytes."""
+
+        return self.codec.dumps(obj)
+
+
+class _ProfiledConnectionMixin(object):
+    """Record the phases of a connection."""
+
+    def _new_conn(self):
+        with _span('tcp_connect', host=self.host):
+            return super()._new_conn()
+
+
+    def request(self, *args, **kwargs):
+        # Open a new connection before the send, not within it
+        if self.sock is None and getattr(_active, 'profiler', None) is not None:
+            self.connect()
+
+        with _span('send'):
+            return super().request(*args, **kwargs)
+
+
+    def getresponse(self, *args, **kwargs):
+        with _span('ttfb'):
+            return super().getresponse(*args, **kwargs)
+
+
+class ProfiledHTTPConnection(_ProfiledConnectionMixin, HTTPConnection):
+    """HTTP connection recording its phases."""
+
+
+class ProfiledHTTPSConnection(_ProfiledConnectionMixin, HTTPSConnection):
+    """HTTPS connection recording its phases, the `tls_handshake` is the
+    time of the connect after the `tcp_connect`."""
+
+    def _new_conn(self):
+        sock = super()._new_conn()
+        self._connected_at = time.perf_counter()
+        return sock
+
+
+    def connect(self):
+        profiler = getattr(_active, 'profiler', None)
+        if profiler is None:
+            return super().connect()
+
+        self._connected_at = None
+        super().connect()
+
+        if self._connected_at is not None:
+            profiler.add('tls_handshake', 'phase', self._connected_at, time.perf_counter(), {'host': self.host})
+
+
+class ProfiledHTTPConnectionPool(HTTPConnectionPool):
+    """HTTP connection pool recording the `connection_acquire` phase."""
+
+    ConnectionCls = ProfiledHTTPConnection
+
+    def _get_conn(self, *args, **kwargs):
+        with _span('connection_acquire'):
+            return super()._get_conn(*args, **kwargs)
+
+
+class ProfiledHTTPSConnectionPool(HTTPSConnectionPool):
+    """HTTPS connection pool recording the `connection_acquire` phase."""
+
+    ConnectionCls = ProfiledHTTPSConnection
+
+    def _get_conn(self, *args, **kwargs):
+        with _span('connection_acquire'):
+            return super()._get_conn(*args, **kwargs)
+
+
+class ProfilingAdapter(HTTPAdapter):
+    """HTTP adapter with the profiled connection pools, recording the
+    `body` download of each response."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': ProfiledHTTPConnectionPool,
+            'https': ProfiledHTTPSConnectionPool
+        }
+
+
+    def send(self, request, stream=False, **kwargs):
+        r = super().send(request, stream=stream, **kwargs)
+
+        # Download the body as the session would, within its span
+        profiler = getattr(_active, 'profiler', None)
+        if profiler is not None and not stream:
+            with profiler.span('body') as args:
+                args['bytes'] = len(r.content)
+
+        return r
@@ -0,0 +1,268 @@
+"""
+D365FW.Query
+~~~~~~~~~~~~
+"""
+
+import datetime
+import functools
+import string
+import uuid
+import xml.etree.ElementTree as ElementTree
+from urllib.parse import quote, unquote
+from xml.sax.saxutils import escape
+
+# The characters left as is in a query option value
+SAFE_CHARACTERS = "'(),:/@*!$;"
+
+class Query(object):
+    """Query.
+
+    Compiled query options (`$select`, `$filter`, `$orderby`, `$expand`,
+    `$top`, `fetchXml` ...) of an entity set. The options are URL
+    (Uniform Resource Locator) encoded once into a template, a `{name}`
+    slot in an option is a parameter bound on each call, so a query run
+    in a loop only formats and encodes its parameter values.
+
+    A parameter of an OData option is formatted as a literal (a `str`
+    is quoted, do not quote the slot in the template), a parameter of
+    the `fetchXml` is XML escaped.
+
+    Example:
+        query = Query(select=['name'], filter='accountnumber eq {number}', top=1)
+        entity.accounts.query(query, number='A-0001')
+    """
+
+    def __init__(self, **options):
+        """Constructor.
+
+        Args:
+            options (dict): The query options without the `$` prefix
+                (e.g. `select`, `filter`, `orderby`, `expand`, `top`,
+                `fetchXml`), a list value is joined with `,`.
+        """
+
+        self.options = options
+
+        # Compile the template, a list of encoded text and parameter slots
+        self._segments = []
+        self.parameters = set()
+
+        for index, (key, value) in enumerate(options.items()):
+            # The `fetchXml` parameter does not prepend with `$`
+            name = key if key == 'fetchXml' else f'${key}'
+            kind = 'xml' if key == 'fetchXml' else 'odata'
+
+            if not isinstance(value, str) and isinstance(value, (list, tuple)):
+                value = ','.join(str(item) for item in value)
+
+            self._add_text(('&' if index else '') + f'{name}=')
+
+            for text, field, _, _ in string.Formatter().parse(str(value)):
+                self._add_text(quote(text, safe=SAFE_CHARACTERS))
+                if field is not None:
+                    self._segments.append((field, kind))
+                    self.parameters.add(field)
+
+
+    def _add_text(self, text):
+        """Add encoded text to the template."""
+
+        if self._segments and isinstance(self._segments[-1], str):
+            self._segments[-1] += text
+        elif text:
+            self._segments.append(text)
+
+
+    def bind(self, **params):
+        """Bind the parameters.
+
+        Args:
+            params (dict): The value of each parameter slot.
+
+        Returns:
+            A string for the encoded query string.
+
+        Raises:
+            ValueError: A parameter is missing.
+        """
+
+        parts = []
+
+        for segment in self._segments:
+            if isinstance(segment, str):
+                parts.append(segment)
+                continue
+
+            field, kind = segment
+            if field not in params:
+                raise ValueError(f'Missing query parameter: {field}')
+
+            value = params[field]
+            value = escape(str(value), {'"': '&quot;'}) if kind == 'xml' else format_literal(value)
+            parts.append(quote(value, safe=SAFE_CHARACTERS))
+
+        return ''.join(parts)
+
+
+    def fetch_xml(self, **params):
+        """Bind the parameters of the `fetchXml` option.
+
+        Args:
+            params (dict): The value of each parameter slot.
+
+        Returns:
+            A string for the FetchXML (not URL encoded), or None if the
+            query has no `fetchXml` option.
+        """
+
+        fetch_xml = self.options.get('fetchXml')
+        if fetch_xml is None:
+            return None
+
+        params = {key: escape(str(value), {'"': '&quot;'}) for key, value in params.items()}
+
+        return fetch_xml.format(**params)
+
+
+    def url(self, base_url, **params):
+        """Create the query request URL.
+
+        Args:
+            base_url (str): The URL of the entity set.
+            params (dict): The value of each parameter slot.
+
+        Returns:
+            A string for the request URL.
+        """
+
+        query = self.bind(**params)
+
+        return f'{base_url}?{query}' if query else base_url
+
+
+    def __repr__(self):
+        return f'<Query {"".join(s if isinstance(s, str) else "{" + s[0] + "}" for s in self._segments)}>'
+
+
+@functools.lru_cache(maxsize=256)
+def _compile_query(options):
+    """Compile the query options, cached by their items."""
+
+    return Query(**dict(options))
+
+
+def compile_query(options):
+    """Compile Query.
+
+    Args:
+        options (dict): The query options, see `Query`.
+
+    Returns:
+        The Query, the same one for the same options.
+    """
+
+    key = tuple((name, tuple(value) if isinstance(value, list) else value)
+                for name, value in options.items())
+
+    try:
+        return _compile_query(key)
+    except TypeError:
+        # Not hashable
+        return Query(**options)
+
+
+def format_literal(value):
+    """Format a value as an OData literal.
+
+    Args:
+        value (object): The value.
+
+    Returns:
+        A string for the literal, e.g. `'text'`, `true`, `null`.
+    """
+
+    if value is None:
+        return 'null'
+
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+
+    if isinstance(value, (int, float, uuid.UUID)):
+        return str(value)
+
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(datetime.timezone.utc)
+        return value.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+
+    # Quote the string, doubling the quote in it
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def fetch_xml_top(fetch_xml):
+    """Get the `top` of a FetchXML.
+
+    Returns:
+        A string for the `top` attribute of the `fetch` element, or None
+        if there is none.
+    """
+
+    return ElementTree.fromstring(fetch_xml).get('top')
+
+
+def page_fetch_xml(fetch_xml, page_number, paging_cookie=None, count=None):
+    """Set the page of a FetchXML.
+
+    .. _Page Results Using FetchXml:
+    https://learn.microsoft.com/en-us/power-apps/developer/data-platform/fetchxml/page-results
+
+    Args:
+        fetch_xml (str): The FetchXML.
+        page_number (int): The page number, starting at 1.
+        paging_cookie (str): The paging cookie of the previous page.
+        count (int): The number of rows per page, default to the one of
+            the FetchXML.
+
+    Returns:
+        A string for the FetchXML of the page.
+    """
+
+    fetch = ElementTree.fromstring(fetch_xml)
+
+    fetch.set('page', str(page_number))
+    if count is not None:
+        fetch.set('count', str(count))
+    if paging_cookie is not None:
+        fetch.set('paging-cookie', paging_cookie)
+    elif 'paging-cookie' in fetch.attrib:
+        del fetch.attrib['paging-cookie']
+
+    return ElementTree.tostring(fetch, encoding='unicode')
+
+
+def parse_paging_cookie(annotation):
+    """Parse the `@Microsoft.Dynamics.CRM.fetchxmlpagingcookie` annotation.
+
+    Args:
+        annotation (str): The annotation, a `<cookie>` element with the
+            next page number and the double URL encoded paging cookie.
+
+    Returns:
+        A tuple (next page number, paging cookie), the page number is
+        None if the annotation is invalid.
+    """
+
+    try:
+        cookie = ElementTree.fromstring(annotation)
+        page_number = int(cookie.get('pagenumber'))
+    except (ElementTree.ParseError, TypeError, ValueError):
+        return None, None
+
+    paging_cookie = cookie.get('pagingcookie')
+    if paging_cookie is not None:
+        paging_cookie = unquote(unquote(paging_cookie))
+
+    return page_number, paging_cookie
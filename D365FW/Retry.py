@@ -0,0 +1,115 @@
+"""
+D365FW.Retry
+~~~~~~~~~~~~
+"""
+
+import random
+import time
+
+# The methods that are safe to send again
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'])
+
+class RetryPolicy(object):
+    """Retry Policy.
+
+    Send the requests failing with a transient error (502, 503, 504 or
+    a connection error) again with exponential backoff and jitter,
+    within a deadline per call. Only the idempotent requests are sent
+    again: GET, PUT, DELETE and PATCH with `If-Match`, POST only when
+    the caller opts in.
+    """
+
+    def __init__(self, max_attempts=4, backoff=0.5, max_backoff=30, jitter=True,
+                 statuses=(502, 503, 504), deadline=120):
+        """Constructor.
+
+        Args:
+            max_attempts (int): The maximum number of attempts per call,
+                including the first one.
+            backoff (float): The backoff in seconds before the second
+                attempt, doubled for each following attempt.
+            max_backoff (float): The maximum backoff in seconds.
+            jitter (bool): Determine whether or not to randomize the
+                backoff (full jitter) so the clients do not retry in
+                lockstep.
+            statuses (tuple): The transient status codes.
+            deadline (float): The maximum number of seconds per call,
+                including all the attempts and backoff, or None for no
+                deadline.
+        """
+
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.statuses = frozenset(statuses)
+        self.deadline = deadline
+
+
+    @staticmethod
+    def is_idempotent(method, headers=None, idempotent=None):
+        """Check if the request is safe to send again.
+
+        Args:
+            method (str): The HTTP method.
+            headers (dict): The request header.
+            idempotent (bool): The caller decision, None to decide from
+                the method and header.
+
+        Returns:
+            True if the request can be sent again.
+        """
+
+        if idempotent is not None:
+            return idempotent
+
+        method = method.upper()
+
+        if method in IDEMPOTENT_METHODS:
+            return True
+
+        # A conditional update does not create a record
+        if method == 'PATCH':
+            return 'If-Match' in (headers or {})
+
+        return False
+
+
+    def get_backoff(self, attempt):
+        """Get Backoff.
+
+        Args:
+            attempt (int): The number of attempts made so far.
+
+        Returns:
+            A float for the number of seconds to wait before the next
+            attempt.
+        """
+
+        backoff = min(self.max_backoff, self.backoff * (2 ** (attempt - 1)))
+
+        return random.uniform(0, backoff) if self.jitter else backoff
+
+
+    def next_backoff(self, attempts, deadline=None):
+        """Get the backoff before the next attempt of a call.
+
+        Args:
+            attempts (int): The number of attempts made so far.
+            deadline (float): The `time.monotonic` deadline of the call,
+                or None for no deadline.
+
+        Returns:
+            A float for the number of seconds to wait, or None if there
+            is no attempt left within the deadline.
+        """
+
+        if attempts >= self.max_attempts:
+            return None
+
+        backoff = self.get_backoff(attempts)
+
+        if deadline is not None and time.monotonic() + backoff >= deadline:
+            return None
+
+        return backoff
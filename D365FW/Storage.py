@@ -0,0 +1,72 @@
+"""
+D365FW.Storage
+~~~~~~~~~~~~~~
+"""
+
+import contextlib
+import os
+import tempfile
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+    import msvcrt
+
+@contextlib.contextmanager
+def file_lock(path):
+    """Hold an exclusive lock on the lock file.
+
+    Other processes (and threads) wait in `file_lock` until it is
+    released.
+
+    Args:
+        path (str): The path of the lock file, created if missing.
+    """
+
+    with open(path, 'a+') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+@contextlib.contextmanager
+def atomic_write(path, mode='w', permission=None):
+    """Write a file atomically.
+
+    The content is written to a temporary file in the same directory
+    which replaces the file on success, so a reader never sees a
+    partially written file.
+
+    Args:
+        path (str): The path of the file.
+        mode (str): The open mode, `w` or `wb`.
+        permission (int): The file permission (e.g. `0o600`), default
+            to the one of the temporary file.
+
+    Returns:
+        A context manager yielding the open temporary file.
+    """
+
+    directory = os.path.dirname(os.path.abspath(path))
+    name = os.path.basename(path)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f'.{name}.')
+    try:
+        with os.fdopen(fd, mode) as f:
+            yield f
+        if permission is not None:
+            os.chmod(temp_path, permission)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
@@ -0,0 +1,112 @@
+"""
+D365FW.StubServer
+~~~~~~~~~~~~~~~~~
+"""
+
+import json
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Local stub of the Web API, each request is answered by the route
+    of its method and path (without the query) in the route table of
+    the server, 404 Not Found without one."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def send(self, status_code, header=None, body=b''):
+        self.send_response(status_code)
+        for key, value in (header or {}).items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def handle_route(self):
+        self.server.paths.append(self.path)
+
+        # Read the request body
+        length = int(self.headers.get('Content-Length') or 0)
+        self.body = self.rfile.read(length) if length else b''
+
+        route = self.server.routes.get((self.command, urlsplit(self.path).path))
+        if route is None:
+            return self.send(404)
+
+        # A route returns a tuple (status code, body) or (status code,
+        # body, header), a body other than bytes is sent as JSON
+        status_code, body, header = (tuple(route(self)) + (None,))[:3]
+        header = dict(header or {})
+        if body is None:
+            body = b''
+        elif not isinstance(body, bytes):
+            header['Content-Type'] = 'application/json'
+            body = json.dumps(body).encode('utf-8')
+
+        self.send(status_code, header, body)
+
+    do_GET = do_POST = do_PATCH = do_DELETE = handle_route
+
+
+class StubServer(ThreadingHTTPServer):
+    """Stub Server.
+
+    Serve the StubHandler of a route table on a free local port, on a
+    daemon thread. The route table maps a tuple (method, path) to a
+    callable answering the StubHandler of the request, which has the
+    `server` (e.g. its `url` and state), `path`, `headers` and `body`.
+    The path of each request is added to `paths`.
+    """
+
+    def __init__(self, routes):
+        """Constructor.
+
+        Args:
+            routes (dict): The route table.
+        """
+
+        super().__init__(('127.0.0.1', 0), StubHandler)
+
+        self.routes = routes
+        self.url = f'http://127.0.0.1:{self.server_port}'
+        self.paths = []
+
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+
+    def stop(self):
+        """Stop serving and close the socket."""
+
+        self.shutdown()
+        self.server_close()
+
+
+class StubServerMixin(object):
+    """Test case mixin running a StubServer of the `routes` of the test
+    class while its tests run, as `server`."""
+
+    routes = {}
+
+    @classmethod
+    def setUpClass(cls):
+        """Prepare test set up class.
+
+        Start the local stub server.
+        """
+
+        cls.server = StubServer(cls.routes)
+
+
+    @classmethod
+    def tearDownClass(cls):
+        """Prepare test tear down class.
+
+        Stop the local stub server.
+        """
+
+        cls.server.stop()
@@ -0,0 +1,197 @@
+"""
+D365FW.TestAsyncEntity
+~~~~~~~~~~~~~~~~~~~~~~
+"""
+
+import asyncio
+import threading
+import time
+import unittest
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from D365FW.Access import Access
+from D365FW.AsyncEntity import AsyncEntity
+from D365FW.Metrics import Metrics
+from D365FW.Retry import RetryPolicy
+from D365FW.Test.StubServer import StubServerMixin
+from D365FW.Token import Token
+from D365FW.Transport import Transport
+
+
+def read_accounts(request):
+    """Two pages of Account."""
+
+    if request.path == '/accounts':
+        return 200, {'value': [{'name': 'Account-1'}], '@odata.nextLink': f'{request.server.url}/accounts?page=2'}
+    if request.path == '/accounts?page=2':
+        return 200, {'value': [{'name': 'Account-2'}]}
+
+    return 404, None
+
+
+def read_contacts(request):
+    """Throttled once, then a page of Contact."""
+
+    if request.server.paths.count('/contacts') == 1:
+        return 429, None, {'Retry-After': '0.2'}
+
+    return 200, {'value': [{'fullname': 'Contact-1'}]}
+
+
+def create(request):
+    """Create an entity with the ID of its entity set."""
+
+    label = request.path.strip('/')
+    return 204, None, {'OData-EntityId': f'{request.server.url}/{label}({label}-id)'}
+
+
+def update(request):
+    """Update an entity, without create."""
+
+    return 204 if request.headers.get('If-Match') == '*' else 400, None
+
+
+def unavailable(request):
+    """Always failing with a transient error."""
+
+    return 503, None
+
+
+@unittest.skipIf(aiohttp is None, 'aiohttp is not installed')
+class TestAsyncEntity(StubServerMixin, unittest.TestCase):
+    """Test the AsyncEntity module against a local stub server."""
+
+    routes = {
+        ('GET', '/accounts'): read_accounts,
+        ('GET', '/contacts'): read_contacts,
+        ('GET', '/leads'): unavailable,
+        ('POST', '/accounts'): create,
+        ('POST', '/contacts'): create,
+        ('POST', '/leads'): unavailable,
+        ('PATCH', '/accounts(accounts-id)'): update,
+        ('DELETE', '/accounts(accounts-id)'): lambda request: (204, None)
+    }
+
+    def setUp(self):
+        """Clear the requests of the stub server."""
+
+        self.server.paths = []
+
+
+    def run_entity(self, function, access='token', transport=None):
+        """Run the coroutine function with an AsyncEntity of the stub server."""
+
+        async def main():
+            async with AsyncEntity(access, 'stub', root_url=self.server.url, transport=transport) as entity:
+                return await function(entity)
+
+        return asyncio.run(main())
+
+
+    def test_read_pages(self):
+        """Test read follows the `@odata.nextLink`.
+
+        Should result in the Account of both pages.
+        """
+
+        accounts = self.run_entity(lambda entity: entity.accounts.read())
+
+        # Test to ensure both pages are read
+        self.assertEqual([account['name'] for account in accounts], ['Account-1', 'Account-2'])
+
+
+    def test_create_concurrent(self):
+        """Test concurrent create on different entity sets.
+
+        Create Account and Contact concurrently. Should result in each
+        unique identifier (ID) coming from its own entity set.
+        """
+
+        async def create(entity):
+            return await asyncio.gather(entity.accounts.create('{}'),
+                                        entity.contacts.create('{}'))
+
+        # Test to ensure each create uses its own entity set
+        self.assertEqual(self.run_entity(create), ['accounts-id', 'contacts-id'])
+
+
+    def test_update_delete(self):
+        """Test update and delete.
+
+        Should result in status code 204 No Content for both.
+        """
+
+        async def update_delete(entity):
+            return [await entity.accounts.update('accounts-id', '{}'),
+                    await entity.accounts.delete('accounts-id')]
+
+        # Test to ensure HTTP status code is 204 No Content
+        self.assertEqual(self.run_entity(update_delete), [204, 204])
+
+
+    def test_throttled(self):
+        """Test read of a throttled (429) entity set.
+
+        Should result in the read sent again after the `Retry-After`,
+        reported once to the hooks with its throttle retry.
+        """
+
+        metrics = Metrics()
+        start = time.monotonic()
+
+        contacts = self.run_entity(lambda entity: entity.contacts.read(), transport=Transport(hooks=[metrics]))
+
+        self.assertEqual(contacts, [{'fullname': 'Contact-1'}])
+        self.assertEqual(self.server.paths, ['/contacts', '/contacts'])
+        self.assertGreaterEqual(time.monotonic() - start, 0.2)
+
+        series = metrics.snapshot()['series'][('read', 'contacts')]
+        self.assertEqual((series['count'], series['throttle_retries']), (1, 1))
+
+
+    def test_retry(self):
+        """Test read and create of an entity set failing with 503.
+
+        Should result in the read sent again up to the maximum attempts,
+        the create (not idempotent) sent once, and the create opting in
+        to retry sent again up to the maximum attempts.
+        """
+
+        transport = Transport(retry=RetryPolicy(max_attempts=3, backoff=0.01))
+
+        async def read_create(entity):
+            return [await entity.leads.read(), await entity.leads.create('{}'),
+                    await entity.leads.create('{}', retry=True)]
+
+        self.assertEqual(self.run_entity(read_create, transport=transport), [None, None, None])
+        self.assertEqual(self.server.paths, ['/leads'] * 3 + ['/leads'] + ['/leads'] * 3)
+
+
+    def test_refresh_in_executor(self):
+        """Test a request with an expired access token.
+
+        Should result in the token refreshed on an executor thread, not
+        on the event loop thread.
+        """
+
+        threads = []
+
+        class StubAccess(Access):
+            def request_token(self):
+                threads.append(threading.current_thread())
+                return Token('token', time.time() + 3600)
+
+        access = StubAccess('stub', 'client', 'secret', 'tenant', auto_refresh=False)
+        access.token = Token('expired', time.time() - 1)
+
+        self.assertEqual(len(self.run_entity(lambda entity: entity.accounts.read(), access=access)), 2)
+        self.assertEqual(len(threads), 1)
+        self.assertIsNot(threads[0], threading.main_thread())
+
+
+if __name__ == '__main__':
+    unittest.main()
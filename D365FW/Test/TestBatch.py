@@ -0,0 +1,164 @@
+"""
+D365FW.TestBatch
+~~~~~~~~~~~~~~~~
+"""
+
+import unittest
+
+from requests import Response
+from requests.adapters import HTTPAdapter
+
+from D365FW.Batch import Batch, build_batch, parse_batch
+from D365FW.Codec import JsonCodec
+from D365FW.Entity import Entity
+from D365FW.Transport import Transport
+
+
+class _Entity(object):
+    """Entity stand in, the batch is built without sending it."""
+
+    root_url = 'https://org.api.crm.dynamics.com/api/data/v9.2'
+    codec = JsonCodec
+
+
+class RecordingCodec(JsonCodec):
+    """JSON codec recording its calls."""
+
+    calls = []
+
+    @classmethod
+    def loads(cls, data):
+        cls.calls.append('loads')
+        return JsonCodec.loads(data)
+
+    @classmethod
+    def dumps(cls, obj):
+        cls.calls.append('dumps')
+        return JsonCodec.dumps(obj)
+
+
+class BatchAdapter(HTTPAdapter):
+    """Adapter answering a `$batch` with a created record in UTF-8,
+    without a charset in the content type."""
+
+    def send(self, request, **kwargs):
+        self.body = request.body
+
+        r = Response()
+        r.status_code = 200
+        r.request = request
+        r.headers['Content-Type'] = 'multipart/mixed; boundary=batchresponse_1'
+        r._content = ('--batchresponse_1\r\n'
+                      'Content-Type: application/http\r\n'
+                      'Content-Transfer-Encoding: binary\r\n\r\n'
+                      'HTTP/1.1 201 Created\r\n'
+                      'Content-Type: application/json\r\n\r\n'
+                      '{"name": "Café-1"}\r\n'
+                      '--batchresponse_1--\r\n').encode('utf-8')
+        return r
+
+
+class TestBatch(unittest.TestCase):
+    """Test the Batch module."""
+
+    def test_build_batch_changeset(self):
+        """Test the multipart body of a batch with a changeset.
+
+        Queue an operation and a changeset of two operations. Should
+        result in a body with one nested changeset and a `Content-ID`
+        per changeset operation.
+        """
+
+        batch = Batch(_Entity(), 'accounts')
+        batch.delete('00000000-0000-0000-0000-000000000001')
+        with batch.changeset():
+            batch.create({'name': 'Account-1'})
+            batch.update('00000000-0000-0000-0000-000000000002', {'name': 'Account-2'})
+
+        body = build_batch(batch.items, 'batch_test')
+
+        # Test to ensure the operations and changeset are in the body
+        self.assertEqual(len(batch), 3)
+        self.assertIn('DELETE https://org.api.crm.dynamics.com/api/data/v9.2/accounts(00000000-0000-0000-0000-000000000001) HTTP/1.1', body)
+        self.assertIn('Content-Type: multipart/mixed; boundary="changeset_', body)
+        self.assertIn('Content-ID: 2', body)
+        self.assertTrue(body.endswith('--batch_test--\r\n'))
+
+
+    def test_chunk_keeps_changeset(self):
+        """Test the chunks of a batch never split a changeset.
+
+        Queue one operation and a changeset of two operations with a
+        maximum of two operations per request. Should result in two
+        chunks.
+        """
+
+        batch = Batch(_Entity(), 'accounts', max_size=2)
+        batch.delete('1')
+        with batch.changeset():
+            batch.delete('2')
+            batch.delete('3')
+
+        chunks = list(batch._chunks(batch.items))
+
+        # Test to ensure the changeset is sent on its own
+        self.assertEqual([len(chunk) for chunk in chunks], [1, 1])
+
+
+    def test_parse_batch(self):
+        """Test the parse of a multipart batch response.
+
+        Parse a response with an operation and a changeset. Should
+        result in a tuple for the operation and a list for the
+        changeset.
+        """
+
+        text = ('--batchresponse_1\r\n'
+                'Content-Type: application/http\r\n'
+                'Content-Transfer-Encoding: binary\r\n\r\n'
+                'HTTP/1.1 204 No Content\r\n'
+                'OData-EntityId: https://org.api.crm.dynamics.com/api/data/v9.2/accounts(1)\r\n\r\n\r\n'
+                '--batchresponse_1\r\n'
+                'Content-Type: multipart/mixed; boundary=changesetresponse_1\r\n\r\n'
+                '--changesetresponse_1\r\n'
+                'Content-Type: application/http\r\n'
+                'Content-Transfer-Encoding: binary\r\n'
+                'Content-ID: 1\r\n\r\n'
+                'HTTP/1.1 400 Bad Request\r\n'
+                'Content-Type: application/json\r\n\r\n'
+                '{"error": {}}\r\n'
+                '--changesetresponse_1--\r\n'
+                '--batchresponse_1--\r\n')
+
+        responses = parse_batch(text, 'multipart/mixed; boundary=batchresponse_1')
+
+        # Test to ensure the responses are parsed
+        self.assertEqual(responses[0][0], 204)
+        self.assertTrue(responses[0][1]['OData-EntityId'].endswith('accounts(1)'))
+        self.assertEqual(responses[1], [(400, {'Content-Type': 'application/json'}, '{"error": {}}', '1')])
+
+
+    def test_send_codec(self):
+        """Test a batch sent with the codec of the client.
+
+        Should result in the payload serialized and the response parsed
+        with the codec, the UTF-8 response body decoded as such.
+        """
+
+        adapter = BatchAdapter()
+        transport = Transport(throttle=False, retry=False)
+        transport.session.mount('http://stub/', adapter)
+        entity = Entity('token', 'stub', root_url='http://stub', transport=transport, codec=RecordingCodec)
+        RecordingCodec.calls.clear()
+
+        with entity.accounts.batch() as batch:
+            result = batch.create({'name': 'Café-1'})
+
+        self.assertIn('{"name":"Café-1"}'.encode('utf-8'), adapter.body)
+        self.assertEqual(result.status_code, 201)
+        self.assertEqual(result.json(), {'name': 'Café-1'})
+        self.assertEqual(RecordingCodec.calls, ['dumps', 'loads'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+"""
+D365FW.TestBulk
+~~~~~~~~~~~~~~~
+"""
+
+import json
+import unittest
+
+from D365FW.Entity import EntitySet
+
+
+class TestBulk(unittest.TestCase):
+    """Test the bulk chunks of the Entity module."""
+
+    def test_max_size(self):
+        """Test the chunks of 25 records with at most 10 per chunk.
+
+        Should result in chunks of 10, 10 and 5 records, each target
+        typed with the logical name.
+        """
+
+        records = [{'name': f'Account-{index}'} for index in range(25)]
+        chunks = list(EntitySet._bulk_chunks(records, 'account', 10, 1024 * 1024))
+
+        self.assertEqual([len(targets) for targets, _ in chunks], [10, 10, 5])
+
+        target = json.loads(chunks[0][0][0])
+        self.assertEqual(target, {'@odata.type': 'Microsoft.Dynamics.CRM.account', 'name': 'Account-0'})
+
+
+    def test_max_bytes(self):
+        """Test the chunks of records with room for two per chunk.
+
+        Should result in chunks of two records under the byte limit, and
+        a record over the limit alone in its chunk.
+        """
+
+        records = [{'name': 'x' * 100} for _ in range(5)]
+        target_size = len(json.dumps({'@odata.type': 'Microsoft.Dynamics.CRM.account', 'name': 'x' * 100},
+                                     separators=(',', ':'))) + 1
+
+        chunks = list(EntitySet._bulk_chunks(records, 'account', 1000, target_size * 2 + 1))
+
+        self.assertEqual([len(targets) for targets, _ in chunks], [2, 2, 1])
+        for targets, _ in chunks:
+            self.assertLessEqual(sum(len(target) + 1 for target in targets), target_size * 2 + 1)
+
+        chunks = list(EntitySet._bulk_chunks(records[:2], 'account', 1000, 10))
+        self.assertEqual([len(targets) for targets, _ in chunks], [1, 1])
+
+
+    def test_primary_key(self):
+        """Test the primary keys of the chunks.
+
+        Should result in the key of each record, None for a record
+        without it.
+        """
+
+        records = [{'accountid': '1', 'name': 'A'}, {'name': 'B'}, {'code': '3'}]
+
+        chunks = list(EntitySet._bulk_chunks(records, 'account', 2, 1024))
+        self.assertEqual([ids for _, ids in chunks], [['1', None], [None]])
+
+        chunks = list(EntitySet._bulk_chunks(records, 'account', 2, 1024, primary_key='code'))
+        self.assertEqual([ids for _, ids in chunks], [[None, None], ['3']])
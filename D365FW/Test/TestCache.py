@@ -0,0 +1,49 @@
+"""
+D365FW.TestCache
+~~~~~~~~~~~~~~~~
+"""
+
+import unittest
+
+from D365FW.Cache import RecordCache
+
+
+class TestCache(unittest.TestCase):
+    """Test the Cache module."""
+
+    def test_record_cache_lru(self):
+        """Test the least recently used eviction.
+
+        Cache 3 records in a cache of 2 after reading the first one.
+        Should result in the second record dropped.
+        """
+
+        record_cache = RecordCache(max_size=2)
+        record_cache.set('accounts(1)', 'W/"1"', {'name': '1'})
+        record_cache.set('accounts(2)', 'W/"1"', {'name': '2'})
+        record_cache.get('accounts(1)')
+        record_cache.set('accounts(3)', 'W/"1"', {'name': '3'})
+
+        self.assertIsNotNone(record_cache.get('accounts(1)'))
+        self.assertIsNone(record_cache.get('accounts(2)'))
+
+
+    def test_record_cache_ttl(self):
+        """Test the revalidation of a record.
+
+        Cache a record without time to live. Should result in a stale
+        copy of the record with its etag.
+        """
+
+        record_cache = RecordCache(ttl=0)
+        record_cache.set('accounts(1)', 'W/"1"', {'name': '1'})
+        etag, record, fresh = record_cache.get('accounts(1)')
+        record['name'] = '2'
+
+        self.assertEqual(etag, 'W/"1"')
+        self.assertFalse(fresh)
+        self.assertEqual(record_cache.get('accounts(1)')[1], {'name': '1'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+"""
+D365FW.TestChange
+~~~~~~~~~~~~~~~~~
+"""
+
+import unittest
+
+from D365FW.Checkpoint import MemoryCheckpointStore
+from D365FW.Entity import Entity
+from D365FW.Test.StubServer import StubServerMixin
+
+
+def read_accounts(request):
+    """The change tracking pages of Account: a full read of two pages,
+    the changes since the delta token 1, and 410 Gone for an expired
+    delta token."""
+
+    if 'odata.track-changes' not in request.headers.get('Prefer', ''):
+        return 400, None
+
+    url = request.server.url
+    context = f'{url}/$metadata#accounts'
+
+    if '$deltatoken=expired' in request.path:
+        return 410, None
+
+    if '$deltatoken=1' in request.path:
+        return 200, {'value': [{'@odata.context': f'{context}/$entity', 'accountid': 'a1', 'name': 'Account-1b'},
+                               {'@odata.context': f'{context}/$deletedEntity', 'id': 'a2', 'reason': 'deleted'}],
+                     '@odata.deltaLink': f'{url}/accounts?$deltatoken=2'}
+
+    if 'page=2' in request.path:
+        return 200, {'value': [{'accountid': 'a3', 'name': 'Account-3'}],
+                     '@odata.deltaLink': f'{url}/accounts?$deltatoken=1'}
+
+    return 200, {'value': [{'accountid': 'a1', 'name': 'Account-1'}, {'accountid': 'a2', 'name': 'Account-2'}],
+                 '@odata.nextLink': f'{url}/accounts?page=2'}
+
+
+class TestChange(StubServerMixin, unittest.TestCase):
+    """Test the change tracking reads against a local stub server."""
+
+    routes = {
+        ('GET', '/accounts'): read_accounts
+    }
+
+    def setUp(self):
+        """Create an Entity of the stub server."""
+
+        self.server.paths = []
+        self.entity = Entity('token', 'stub', root_url=self.server.url)
+        self.store = MemoryCheckpointStore()
+
+
+    def test_read_changes(self):
+        """Test a full read, then the changes since its delta link.
+
+        Should result in all the records of both pages first, then the
+        updated record and the ID of the deleted one, each delta link
+        saved in the checkpoint store.
+        """
+
+        changes = self.entity.accounts.read_changes(store=self.store)
+
+        self.assertTrue(changes.initial)
+        self.assertEqual([account['name'] for account in changes.changed], ['Account-1', 'Account-2', 'Account-3'])
+        self.assertEqual(changes.deleted, [])
+        self.assertEqual(self.store.get('accounts'), {'delta_link': f'{self.server.url}/accounts?$deltatoken=1'})
+
+        changes = self.entity.accounts.read_changes(store=self.store)
+
+        self.assertFalse(changes.initial)
+        self.assertEqual([account['name'] for account in changes.changed], ['Account-1b'])
+        self.assertEqual(changes.deleted, ['a2'])
+        self.assertEqual(self.store.get('accounts'), {'delta_link': f'{self.server.url}/accounts?$deltatoken=2'})
+
+
+    def test_read_changes_no_save(self):
+        """Test the changes since a delta link without saving the new one.
+
+        Should result in the new delta link returned and the checkpoint
+        store left unchanged until the caller saves it.
+        """
+
+        delta_link = f'{self.server.url}/accounts?$deltatoken=1'
+        self.store.set('accounts', {'delta_link': delta_link})
+
+        changes = self.entity.accounts.read_changes(store=self.store, save=False)
+
+        self.assertEqual(changes.deleted, ['a2'])
+        self.assertEqual(changes.delta_link, f'{self.server.url}/accounts?$deltatoken=2')
+        self.assertEqual(self.store.get('accounts'), {'delta_link': delta_link})
+
+
+    def test_read_changes_expired(self):
+        """Test the changes since a delta link the service no longer
+        accepts (410 Gone).
+
+        Should result in a full read of all the records and its delta
+        link saved.
+        """
+
+        self.store.set('accounts', {'delta_link': f'{self.server.url}/accounts?$deltatoken=expired'})
+
+        changes = self.entity.accounts.read_changes(store=self.store)
+
+        self.assertTrue(changes.initial)
+        self.assertEqual(len(changes.changed), 3)
+        self.assertEqual(self.server.paths, ['/accounts?$deltatoken=expired', '/accounts', '/accounts?page=2'])
+        self.assertEqual(self.store.get('accounts'), {'delta_link': f'{self.server.url}/accounts?$deltatoken=1'})
+
+
+if __name__ == '__main__':
+    unittest.main()
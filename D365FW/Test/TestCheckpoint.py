@@ -0,0 +1,49 @@
+"""
+D365FW.TestCheckpoint
+~~~~~~~~~~~~~~~~~~~~~
+"""
+
+import os
+import tempfile
+import unittest
+
+from D365FW.Checkpoint import MemoryCheckpointStore, FileCheckpointStore
+
+
+class TestCheckpoint(unittest.TestCase):
+    """Test the Checkpoint module."""
+
+    def test_file_checkpoint_store(self):
+        """Test the file checkpoint store.
+
+        Set a checkpoint, read it from another store on the same file,
+        then delete it. Should result in the same checkpoint, then None.
+        """
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'checkpoint', 'checkpoint.json')
+
+            FileCheckpointStore(path).set('accounts', {'delta_link': 'https://delta'})
+            store = FileCheckpointStore(path)
+
+            self.assertEqual(store.get('accounts'), {'delta_link': 'https://delta'})
+            store.delete('accounts')
+            self.assertIsNone(store.get('accounts'))
+
+
+    def test_memory_checkpoint_store(self):
+        """Test the memory checkpoint store.
+
+        Set a checkpoint and change the returned copy. Should result in
+        the stored checkpoint left unchanged.
+        """
+
+        store = MemoryCheckpointStore()
+        store.set('accounts', {'count': 1})
+        store.get('accounts')['count'] = 2
+
+        self.assertEqual(store.get('accounts'), {'count': 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
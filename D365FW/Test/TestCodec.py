@@ -0,0 +1,52 @@
+"""
+D365FW.TestCodec
+~~~~~~~~~~~~~~~~
+"""
+
+import unittest
+
+from D365FW.Codec import CODECS, JsonCodec, get_codec, encode_payload
+
+
+class TestCodec(unittest.TestCase):
+    """Test the Codec module."""
+
+    def test_codec_round_trip(self):
+        """Test each installed codec.
+
+        Encode and decode a record. Should result in UTF-8 bytes and
+        the same record.
+        """
+
+        record = {'name': 'Dynamics 365 – Ünïcode', 'revenue': 1.5, 'active': True, 'parentid': None}
+
+        for codec in CODECS.values():
+            if codec is None:
+                continue
+            data = codec.dumps(record)
+            self.assertIsInstance(data, bytes)
+            self.assertEqual(codec.loads(data), record)
+            self.assertEqual(JsonCodec.loads(data), record)
+
+
+    def test_get_codec(self):
+        """Test the codec selection."""
+
+        self.assertIs(get_codec('json'), JsonCodec)
+        self.assertIsNotNone(get_codec())
+        self.assertRaises(ValueError, get_codec, 'unknown')
+
+
+    def test_encode_payload(self):
+        """Test the payload encoding.
+
+        Encode a serialized and a dict payload. Should result in the
+        serialized payload as is and the dict encoded.
+        """
+
+        self.assertEqual(encode_payload(JsonCodec, '{"name": "a"}'), '{"name": "a"}')
+        self.assertEqual(encode_payload(JsonCodec, {'name': 'a'}), b'{"name":"a"}')
+
+
+if __name__ == '__main__':
+    unittest.main()
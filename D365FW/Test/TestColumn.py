@@ -0,0 +1,132 @@
+"""
+D365FW.TestColumn
+~~~~~~~~~~~~~~~~~
+"""
+
+import math
+import unittest
+
+from D365FW.Column import ColumnBuilder
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class TestColumn(unittest.TestCase):
+    """Test the Column module."""
+
+    def test_column_builder(self):
+        """Test the columns of two pages.
+
+        Add two pages with missing values and an integer column getting
+        a float. Should result in typed arrays with the missing values
+        marked, and the annotations skipped.
+        """
+
+        builder = ColumnBuilder(types={'revenue': 'Money'}, use_numpy=False)
+        builder.add([{'@odata.etag': 'W/"1"', 'name': 'a', 'employees': 1, 'revenue': 10}])
+        builder.add([{'name': 'b', 'employees': None, 'rating': 2},
+                     {'name': None, 'employees': 3, 'rating': 2.5, 'revenue': None}])
+        columns = builder.build()
+
+        self.assertEqual(columns.length, 3)
+        self.assertNotIn('@odata.etag', columns)
+        self.assertEqual(columns['name'], ['a', 'b', None])
+        self.assertEqual(columns['employees'].typecode, 'q')
+        self.assertEqual(list(columns.masks['employees']), [1, 0, 1])
+        self.assertEqual(columns['revenue'].typecode, 'd')
+        self.assertTrue(math.isnan(columns['revenue'][2]))
+        self.assertEqual(columns['rating'].typecode, 'd')
+        self.assertTrue(math.isnan(columns['rating'][0]))
+
+
+    def test_missing_values(self):
+        """Test columns starting with missing values and attributes
+        missing from a record.
+
+        Should result in the kind chosen by the first value, the missing
+        values before it kept, and the missing attributes filled.
+        """
+
+        builder = ColumnBuilder(use_numpy=False)
+        builder.add([{'name': 'a'}, {'name': 'b', 'employees': None, 'active': None}])
+        builder.add([{'employees': 2, 'active': True}, {}])
+        columns = builder.build()
+
+        self.assertEqual(columns.length, 4)
+        self.assertEqual(columns['name'], ['a', 'b', None, None])
+        self.assertEqual(columns['employees'].typecode, 'q')
+        self.assertEqual(list(columns.masks['employees']), [0, 0, 1, 0])
+        self.assertEqual(columns['active'].typecode, 'b')
+        self.assertEqual(list(columns.masks['active']), [0, 0, 1, 0])
+
+
+    def test_mixed_numbers(self):
+        """Test numeric columns getting values of another type.
+
+        Should result in an integer column widened to float with its
+        values kept, an integer kept in a float column, and a column
+        getting a string widened to a list with None for the missing
+        values.
+        """
+
+        builder = ColumnBuilder(use_numpy=False)
+        builder.add([{'employees': 1, 'rating': 1.5, 'code': 1},
+                     {'employees': None, 'rating': 2, 'code': None},
+                     {'employees': 2.5, 'rating': 3.5, 'code': 'A'}])
+        columns = builder.build()
+
+        self.assertEqual(columns['employees'].typecode, 'd')
+        self.assertEqual(columns['employees'][0], 1.0)
+        self.assertTrue(math.isnan(columns['employees'][1]))
+        self.assertNotIn('employees', columns.masks)
+        self.assertEqual(list(columns['rating']), [1.5, 2.0, 3.5])
+        self.assertEqual(columns['code'], [1, None, 'A'])
+        self.assertNotIn('code', columns.masks)
+
+
+    def test_datetime(self):
+        """Test a datetime column of the metadata getting a value other
+        than a string.
+
+        Should result in the datetime values in a list, and the column
+        widened to a list for the other value.
+        """
+
+        types = {'createdon': 'DateTime', 'modifiedon': 'DateTime'}
+        builder = ColumnBuilder(types=types, use_numpy=False)
+        builder.add([{'createdon': '2020-01-01T00:00:00Z', 'modifiedon': '2020-01-01T00:00:00Z'},
+                     {'createdon': None, 'modifiedon': 0}])
+        columns = builder.build()
+
+        self.assertEqual(columns['createdon'], ['2020-01-01T00:00:00Z', None])
+        self.assertEqual(columns['modifiedon'], ['2020-01-01T00:00:00Z', 0])
+
+
+    @unittest.skipIf(numpy is None, 'numpy is not installed')
+    def test_numpy(self):
+        """Test the NumPy columns.
+
+        Should result in typed NumPy arrays, a datetime64 column in UTC
+        with NaT for the missing value, an object column for a datetime
+        column with a value other than a string, and boolean masks.
+        """
+
+        builder = ColumnBuilder(types={'createdon': 'DateTime', 'modifiedon': 'DateTime'}, use_numpy=True)
+        builder.add([{'employees': 1, 'createdon': '2020-01-01T12:00:00Z', 'modifiedon': 0, 'name': 'a'},
+                     {'employees': None, 'createdon': None, 'modifiedon': None, 'name': 'b'}])
+        columns = builder.build()
+
+        self.assertEqual(columns['employees'].dtype, numpy.int64)
+        self.assertEqual(columns.masks['employees'].tolist(), [True, False])
+        self.assertEqual(columns['createdon'].dtype, numpy.dtype('datetime64[ms]'))
+        self.assertEqual(columns['createdon'][0], numpy.datetime64('2020-01-01T12:00:00'))
+        self.assertTrue(numpy.isnat(columns['createdon'][1]))
+        self.assertEqual(columns['modifiedon'].tolist(), [0, None])
+        self.assertEqual(columns['name'].tolist(), ['a', 'b'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+"""
+D365FW.TestEntitySet
+~~~~~~~~~~~~~~~~~~~~
+"""
+
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from requests import Response
+from requests.adapters import HTTPAdapter
+
+from D365FW.Entity import Entity, EntitySet
+from D365FW.Transport import Transport
+
+
+class CreateAdapter(HTTPAdapter):
+    """Adapter answering a create with an ID naming its entity set."""
+
+    def send(self, request, **kwargs):
+        label = request.url.rsplit('/', 1)[1]
+
+        r = Response()
+        r.status_code = 204
+        r.request = request
+        r.headers['OData-EntityId'] = f'{request.url}({label}-{request.body})'
+        r._content = b''
+        return r
+
+
+class TestEntitySet(unittest.TestCase):
+    """Test the entity set handles of the Entity."""
+
+    def setUp(self):
+        """Create an Entity sending its requests to a CreateAdapter."""
+
+        transport = Transport(throttle=False, retry=False)
+        transport.session.mount('http://stub/', CreateAdapter())
+
+        self.entity = Entity('token', 'stub', root_url='http://stub', transport=transport)
+
+
+    def test_handle(self):
+        """Test the entity set attributes of the client.
+
+        Should result in a cached handle per entity set with its own
+        URL, and AttributeError for a private attribute.
+        """
+
+        accounts = self.entity.accounts
+
+        self.assertIsInstance(accounts, EntitySet)
+        self.assertIs(self.entity.accounts, accounts)
+        self.assertIsNot(self.entity.contacts, accounts)
+        self.assertEqual(accounts.url, 'http://stub/accounts')
+        self.assertEqual(accounts.update_header['If-Match'], '*')
+
+        with self.assertRaises(AttributeError):
+            self.entity._accounts
+
+
+    def test_immutable(self):
+        """Test setting and deleting an attribute of a handle.
+
+        Should result in AttributeError, the handle unchanged.
+        """
+
+        accounts = self.entity.accounts
+
+        with self.assertRaises(AttributeError):
+            accounts.url = 'http://stub/contacts'
+        with self.assertRaises(AttributeError):
+            accounts.other = 1
+        with self.assertRaises(AttributeError):
+            del accounts.label
+
+        self.assertEqual(accounts.url, 'http://stub/accounts')
+
+
+    def test_concurrent_handle(self):
+        """Test the first use of an entity set from many threads.
+
+        Should result in a single handle shared by all the threads.
+        """
+
+        barrier = threading.Barrier(16)
+
+        def get_handle(_):
+            barrier.wait()
+            return self.entity.leads
+
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            handles = list(executor.map(get_handle, range(16)))
+
+        self.assertEqual(len({id(handle) for handle in handles}), 1)
+
+
+    def test_concurrent_create(self):
+        """Test concurrent create on different entity sets of a client.
+
+        Should result in each unique identifier (ID) coming from the
+        entity set it was created in.
+        """
+
+        labels = ['accounts', 'contacts', 'leads', 'opportunities'] * 25
+
+        def create(index):
+            return getattr(self.entity, labels[index]).create(str(index))
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            ids = list(executor.map(create, range(len(labels))))
+
+        self.assertEqual(ids, [f'{label}-{index}' for index, label in enumerate(labels)])
@@ -0,0 +1,67 @@
+"""
+D365FW.TestExecutor
+~~~~~~~~~~~~~~~~~~~
+"""
+
+import threading
+import time
+import unittest
+
+from D365FW.Executor import run_many
+
+
+class TestExecutor(unittest.TestCase):
+    """Test the Executor module."""
+
+    def test_order(self):
+        """Test run_many with an operation raising on some items.
+
+        Should result in a result per item in input order, the error
+        captured in its result.
+        """
+
+        def function(item):
+            if item % 3 == 0:
+                raise ValueError(item)
+            return item * 2
+
+        progress = []
+        results = run_many(function, list(range(10)), max_workers=4,
+                           progress=lambda done, total: progress.append((done, total)))
+
+        self.assertEqual([result.index for result in results], list(range(10)))
+        self.assertEqual([result.value for result in results if result.success],
+                         [item * 2 for item in range(10) if item % 3])
+        self.assertIsInstance(results[3].error, ValueError)
+        self.assertEqual(progress[-1], (10, 10))
+
+
+    def test_window(self):
+        """Test run_many over a generator of slow operations.
+
+        Should result in at most two items per worker read ahead of the
+        finished operations, and no total in the progress.
+        """
+
+        lock = threading.Lock()
+        state = {'read': 0, 'finished': 0, 'ahead': 0}
+
+        def items():
+            for item in range(40):
+                with lock:
+                    state['read'] += 1
+                    state['ahead'] = max(state['ahead'], state['read'] - state['finished'])
+                yield item
+
+        def function(item):
+            time.sleep(0.005)
+            with lock:
+                state['finished'] += 1
+            return item
+
+        totals = set()
+        results = run_many(function, items(), max_workers=2, progress=lambda done, total: totals.add(total))
+
+        self.assertEqual([result.value for result in results], list(range(40)))
+        self.assertLessEqual(state['ahead'], 2 * 2 + 1)
+        self.assertEqual(totals, {None})
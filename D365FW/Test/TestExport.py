@@ -0,0 +1,158 @@
+"""
+D365FW.TestExport
+~~~~~~~~~~~~~~~~~
+"""
+
+import csv
+import gzip
+import json
+import os
+import tempfile
+import unittest
+
+from D365FW.Export import export_pages, guess_format
+from D365FW.Pager import PrefetchPager
+
+try:
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+class TestExport(unittest.TestCase):
+    """Test the Export module."""
+
+    PAGES = [
+        [{'@odata.etag': 'W/"1"', 'name': 'a,b', 'revenue': 10, 'tags': [1, 2]}],
+        [{'name': 'c', 'revenue': 2.5, 'rating': 3}, {'name': None}]
+    ]
+
+    def setUp(self):
+        """Create a temporary directory for the exported files."""
+
+        self.directory = tempfile.TemporaryDirectory()
+
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+
+        self.directory.cleanup()
+
+
+    def test_guess_format(self):
+        """Test guessing the format of the file extensions.
+
+        Should result in the format and compression of each extension.
+        """
+
+        self.assertEqual(guess_format('accounts.ndjson.gz'), ('ndjson', 'gzip'))
+        self.assertEqual(guess_format('accounts.CSV'), ('csv', None))
+        self.assertEqual(guess_format('accounts.parquet'), ('parquet', None))
+        self.assertEqual(guess_format('accounts.txt'), (None, None))
+
+
+    def test_export_ndjson(self):
+        """Test exporting two pages to a gzip NDJSON file.
+
+        Should result in a line per record with the annotations kept.
+        """
+
+        path = os.path.join(self.directory.name, 'accounts.ndjson.gz')
+
+        self.assertEqual(export_pages(iter(self.PAGES), path), 3)
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual(records, self.PAGES[0] + self.PAGES[1])
+
+
+    def test_export_csv(self):
+        """Test exporting two pages to a CSV file.
+
+        Should result in the header of the first page, the missing
+        values empty and the list value as JSON.
+        """
+
+        path = os.path.join(self.directory.name, 'accounts.csv')
+
+        self.assertEqual(export_pages(iter(self.PAGES), path), 3)
+        with open(path, newline='', encoding='utf-8') as f:
+            rows = list(csv.reader(f))
+        self.assertEqual(rows, [['name', 'revenue', 'tags'], ['a,b', '10', '[1,2]'], ['c', '2.5', ''], ['', '', '']])
+
+
+    @unittest.skipIf(pyarrow is None, 'pyarrow is not installed')
+    def test_export_parquet(self):
+        """Test exporting two pages to a Parquet file.
+
+        Should result in a float column for the metadata Money type.
+        """
+
+        path = os.path.join(self.directory.name, 'accounts.parquet')
+
+        self.assertEqual(export_pages(iter(self.PAGES), path, types={'revenue': 'Money'}), 3)
+        table = pyarrow.parquet.read_table(path)
+        self.assertEqual(str(table.schema.field('revenue').type), 'double')
+        self.assertEqual(table.column('revenue').to_pylist(), [10.0, 2.5, None])
+
+
+    @unittest.skipIf(pyarrow is None, 'pyarrow is not installed')
+    def test_export_parquet_types(self):
+        """Test exporting to a Parquet file without the metadata.
+
+        Should result in a float column for an integer first page, and
+        ValueError for a string in it with the file left as is.
+        """
+
+        path = os.path.join(self.directory.name, 'accounts.parquet')
+
+        self.assertEqual(export_pages(iter(self.PAGES), path), 3)
+        table = pyarrow.parquet.read_table(path)
+        self.assertEqual(str(table.schema.field('revenue').type), 'double')
+        self.assertEqual(table.column('revenue').to_pylist(), [10.0, 2.5, None])
+
+        pages = [[{'revenue': 1}], [{'revenue': 'unknown'}]]
+        with self.assertRaisesRegex(ValueError, 'revenue'):
+            export_pages(iter(pages), path)
+        self.assertEqual(pyarrow.parquet.read_table(path).num_rows, 3)
+        self.assertEqual(os.listdir(self.directory.name), ['accounts.parquet'])
+
+
+    def test_export_close_pages(self):
+        """Test a page failing to be written from a PrefetchPager.
+
+        Should result in the error raised and the pager closed.
+        """
+
+        path = os.path.join(self.directory.name, 'accounts.ndjson')
+        pages = PrefetchPager(iter([[{'name': 'a'}], [{'name': object()}]] + [[{}]] * 10))
+
+        with self.assertRaises(TypeError):
+            export_pages(pages, path)
+        self.assertTrue(pages._stop.is_set())
+        self.assertFalse(os.path.exists(path))
+
+
+    def test_export_failed(self):
+        """Test a page raising during the export.
+
+        Should result in the existing file left as is and no temporary
+        file.
+        """
+
+        path = os.path.join(self.directory.name, 'accounts.csv')
+        with open(path, 'w') as f:
+            f.write('previous')
+
+        def pages():
+            yield self.PAGES[0]
+            raise RuntimeError('page')
+
+        with self.assertRaises(RuntimeError):
+            export_pages(pages(), path)
+        with open(path) as f:
+            self.assertEqual(f.read(), 'previous')
+        self.assertEqual(os.listdir(self.directory.name), ['accounts.csv'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+"""
+D365FW.TestFetch
+~~~~~~~~~~~~~~~~
+"""
+
+import unittest
+from urllib.parse import parse_qs, quote, urlsplit
+from xml.etree import ElementTree
+
+from D365FW.Entity import Entity
+from D365FW.Test.StubServer import StubServerMixin
+
+# The FetchXML of all the Account records
+FETCH_XML = '<fetch><entity name="account"><attribute name="name" /></entity></fetch>'
+
+def paging_cookie(page_number):
+    """The paging cookie of a page."""
+
+    return f'<cookie page="{page_number}"><accountid last="{{a{page_number}b}}" first="{{a{page_number}a}}" /></cookie>'
+
+
+def fetch_accounts(request):
+    """Three pages of Account for the page number of the FetchXML, each
+    one with the double URL encoded paging cookie of the next one."""
+
+    fetch_xml = parse_qs(urlsplit(request.path).query)['fetchXml'][0]
+    fetch = ElementTree.fromstring(fetch_xml)
+    request.server.fetches.append(fetch.attrib)
+
+    page_number = int(fetch.get('page', 1))
+    page = {'value': [{'name': f'Account-{page_number}-{index}'} for index in range(2)]}
+
+    if page_number < 3:
+        cookie = quote(quote(paging_cookie(page_number)))
+        page['@Microsoft.Dynamics.CRM.morerecords'] = True
+        page['@Microsoft.Dynamics.CRM.fetchxmlpagingcookie'] = (f'<cookie pagenumber="{page_number + 1}" '
+                                                                 f'pagingcookie="{cookie}" istracking="False" />')
+
+    return 200, page
+
+
+class TestFetch(StubServerMixin, unittest.TestCase):
+    """Test the FetchXML paging against a local stub server."""
+
+    routes = {
+        ('GET', '/accounts'): fetch_accounts
+    }
+
+    def setUp(self):
+        """Create an Entity of the stub server."""
+
+        self.server.fetches = []
+        self.entity = Entity('token', 'stub', root_url=self.server.url)
+
+
+    def test_iter_fetch(self):
+        """Test iterating the pages of a FetchXML.
+
+        Should result in the rows of the 3 pages, each page after the
+        first one sent with its page number and the decoded paging
+        cookie of the previous page.
+        """
+
+        rows = list(self.entity.accounts.iter_fetch(FETCH_XML, page_size=2))
+
+        self.assertEqual(len(rows), 6)
+        self.assertEqual([fetch.get('page') for fetch in self.server.fetches], ['1', '2', '3'])
+        self.assertEqual([fetch.get('paging-cookie') for fetch in self.server.fetches],
+                         [None, paging_cookie(1), paging_cookie(2)])
+        self.assertEqual({fetch.get('count') for fetch in self.server.fetches}, {'2'})
+
+
+    def test_query_fetch_xml_stream(self):
+        """Test a query stream of a FetchXML, a page per item.
+
+        Should result in the 3 pages in order, sent by page number.
+        """
+
+        pages = list(self.entity.accounts.query(fetchXml=FETCH_XML, stream=True, page=True))
+
+        self.assertEqual([[row['name'] for row in rows] for rows in pages],
+                         [[f'Account-{page_number}-{index}' for index in range(2)] for page_number in range(1, 4)])
+        self.assertEqual([fetch.get('page') for fetch in self.server.fetches], ['1', '2', '3'])
+
+
+    def test_iter_fetch_top(self):
+        """Test iterating a FetchXML with a `top`.
+
+        Should result in the FetchXML sent once as is, even when the
+        response has more records.
+        """
+
+        rows = list(self.entity.accounts.iter_fetch(FETCH_XML.replace('<fetch>', '<fetch top="2">')))
+
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(self.server.fetches, [{'top': '2'}])
+
+
+if __name__ == '__main__':
+    unittest.main()
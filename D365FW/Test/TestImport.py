@@ -0,0 +1,178 @@
+"""
+D365FW.TestImport
+~~~~~~~~~~~~~~~~~
+"""
+
+import json
+import os
+import tempfile
+import unittest
+
+from D365FW.Checkpoint import MemoryCheckpointStore
+from D365FW.Codec import JsonCodec
+from D365FW.Import import Importer, read_rows
+from D365FW.Metadata import Metadata
+
+
+class _Client(object):
+    """Client stand in with the metadata of the account."""
+
+    metadata = Metadata({'account': {'entity_set': 'accounts', 'primary_key': 'accountid',
+                                     'attributes': {'accountid': 'Uniqueidentifier', 'name': 'String',
+                                                    'numberofemployees': 'Integer'}}})
+
+    def get_metadata(self, load=True):
+        return self.metadata
+
+
+class _EntitySet(object):
+    """Entity set stand in, the bulk requests are recorded."""
+
+    label = 'accounts'
+    url = 'https://org.api.crm.dynamics.com/api/data/v9.2/accounts'
+    codec = JsonCodec
+
+    def __init__(self, fail=None, reject=None):
+        self.client = _Client()
+        self.fail = fail
+        self.reject = reject
+        self.requests = []
+
+    def _bulk(self, action, records, logical_name, max_size, max_bytes):
+        if self.fail is not None and any(record['name'] == self.fail for record in records):
+            raise RuntimeError('Connection lost')
+        self.requests.append((action, records))
+        if self.reject is not None and any(record['name'] == self.reject for record in records):
+            return [None] * len(records)
+        return ['00000000-0000-0000-0000-000000000001'] * len(records)
+
+
+class TestImport(unittest.TestCase):
+    """Test the Import module."""
+
+    def setUp(self):
+        """Create a CSV file of 5 accounts, the third one invalid."""
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'accounts.csv')
+        self.reject_path = os.path.join(self.directory.name, 'rejects.ndjson')
+
+        with open(self.path, 'w', newline='') as f:
+            f.write('Name,Employees\r\nA,1\r\nB,\r\nC,many\r\nD,4\r\nE,5\r\n')
+
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+
+        self.directory.cleanup()
+
+
+    def test_read_rows(self):
+        """Test reading the rows of a CSV file.
+
+        Should result in the row numbers and the empty field as None.
+        """
+
+        rows = list(read_rows(self.path))
+
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[1], (2, {'Name': 'B', 'Employees': None}, None))
+
+
+    def test_import_rejects(self):
+        """Test importing the rows in chunks of two.
+
+        Should result in the integer converted from the metadata type, a
+        bulk request per chunk, and the invalid row rejected.
+        """
+
+        entity_set = _EntitySet()
+        importer = Importer(entity_set, mapping={'Name': 'name', 'Employees': 'numberofemployees'},
+                            chunk_size=2, reject_path=self.reject_path)
+
+        result = importer.run(read_rows(self.path))
+
+        self.assertEqual((result.imported, result.rejected), (4, 1))
+        self.assertEqual(len(entity_set.requests), 3)
+        self.assertEqual(entity_set.requests[0], ('CreateMultiple', [{'name': 'A', 'numberofemployees': 1},
+                                                                     {'name': 'B', 'numberofemployees': None}]))
+        with open(self.reject_path) as f:
+            reject = json.loads(f.readline())
+        self.assertEqual(reject['row'], 3)
+        self.assertIn('numberofemployees', reject['reason'])
+
+
+    def test_import_resume(self):
+        """Test resuming an import after a failed chunk.
+
+        Fail the chunk of `D` on the first run. Should result in the
+        second run writing only that chunk.
+        """
+
+        store = MemoryCheckpointStore()
+        mapping = {'Name': 'name'}
+
+        result = Importer(_EntitySet(fail='D'), mapping=mapping, chunk_size=2, store=store, key='accounts').run(
+            read_rows(self.path))
+        self.assertFalse(result.complete)
+        self.assertEqual(store.get('accounts')['done'], [2])
+
+        entity_set = _EntitySet()
+        result = Importer(entity_set, mapping=mapping, chunk_size=2, store=store, key='accounts').run(
+            read_rows(self.path))
+
+        self.assertTrue(result.complete)
+        self.assertEqual(result.resumed, 2)
+        self.assertEqual(entity_set.requests, [('CreateMultiple', [{'name': 'C'}, {'name': 'D'}])])
+        self.assertIsNone(store.get('accounts'))
+
+
+    def test_import_source(self):
+        """Test resuming an import of a changed source.
+
+        Fail a chunk of the first source, then run the import of another
+        source with the same key. Should result in every chunk written
+        and nothing resumed.
+        """
+
+        store = MemoryCheckpointStore()
+        mapping = {'Name': 'name'}
+
+        result = Importer(_EntitySet(fail='D'), mapping=mapping, chunk_size=2, store=store, key='accounts').run(
+            read_rows(self.path), source={'size': 1, 'mtime': 1})
+        self.assertFalse(result.complete)
+
+        entity_set = _EntitySet()
+        result = Importer(entity_set, mapping=mapping, chunk_size=2, store=store, key='accounts').run(
+            read_rows(self.path), source={'size': 1, 'mtime': 2})
+
+        self.assertTrue(result.complete)
+        self.assertEqual((result.imported, result.resumed), (5, 0))
+        self.assertEqual(len(entity_set.requests), 3)
+
+
+    def test_import_upsert(self):
+        """Test an upsert import with a failed bulk request.
+
+        Should result in ValueError without bulk, and the failed chunk
+        an error of the run, not rejected, left for the next run.
+        """
+
+        with self.assertRaises(ValueError):
+            Importer(_EntitySet(), operation='upsert', bulk=False)
+
+        store = MemoryCheckpointStore()
+        importer = Importer(_EntitySet(reject='D'), mapping={'Name': 'name'}, operation='upsert', chunk_size=2,
+                            store=store, key='accounts', reject_path=self.reject_path)
+
+        result = importer.run(read_rows(self.path))
+
+        self.assertFalse(result.complete)
+        self.assertEqual((result.imported, result.rejected), (3, 0))
+        self.assertIn('UpsertMultiple', str(result.errors[0]))
+        self.assertEqual(store.get('accounts')['done'], [2])
+        self.assertFalse(os.path.exists(self.reject_path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+"""
+D365FW.TestMetadata
+~~~~~~~~~~~~~~~~~~~
+"""
+
+import tempfile
+import unittest
+
+from requests.adapters import HTTPAdapter
+
+from D365FW.Constant import D365_API_V
+from D365FW.Entity import Entity
+from D365FW.Metadata import Metadata, FileMetadataCache
+from D365FW.Transport import Transport
+
+DEFINITIONS = [{
+    'LogicalName': 'account',
+    'EntitySetName': 'accounts',
+    'PrimaryIdAttribute': 'accountid',
+    'PrimaryNameAttribute': 'name',
+    'Attributes': [
+        {'LogicalName': 'accountid', 'AttributeType': 'Uniqueidentifier'},
+        {'LogicalName': 'name', 'AttributeType': 'String'},
+        {'LogicalName': 'parentaccountid', 'AttributeType': 'Lookup'}
+    ],
+    'Keys': [{'LogicalName': 'accountnumber_key', 'KeyAttributes': ['accountnumber']}],
+    'ManyToOneRelationships': [
+        {'ReferencingEntityNavigationPropertyName': 'parentaccountid', 'ReferencedEntity': 'account'}
+    ],
+    'OneToManyRelationships': [
+        {'ReferencedEntityNavigationPropertyName': 'contact_customer_accounts', 'ReferencingEntity': 'contact'}
+    ],
+    'ManyToManyRelationships': []
+}]
+
+
+class FailingAdapter(HTTPAdapter):
+    """Adapter failing the test on any request."""
+
+    def send(self, request, **kwargs):
+        raise AssertionError(f'Unexpected request: {request.url}')
+
+
+class TestMetadata(unittest.TestCase):
+    """Test the Metadata module."""
+
+    def test_metadata_index(self):
+        """Test the index of the entity definitions.
+
+        Index the account definition. Should result in the same entity
+        looked up by logical name and entity set name.
+        """
+
+        metadata = Metadata.from_entity_definitions(DEFINITIONS)
+
+        self.assertEqual(metadata.logical_name('accounts'), 'account')
+        self.assertEqual(metadata.entity_set('account'), 'accounts')
+        self.assertEqual(metadata.primary_key('accounts'), 'accountid')
+        self.assertEqual(metadata.navigation('account')['contact_customer_accounts'], 'contact')
+        self.assertEqual(metadata.alternate_keys('account'), [['accountnumber']])
+        self.assertEqual(metadata.validate_select('accounts', ['name', '_parentaccountid_value']),
+                         'name,_parentaccountid_value')
+        self.assertRaises(ValueError, metadata.validate_select, 'accounts', ['unknown'])
+
+
+    def test_file_metadata_cache(self):
+        """Test the metadata cache file.
+
+        Save the metadata and load it with the same and another API
+        version. Should result in the metadata, then None.
+        """
+
+        with tempfile.TemporaryDirectory() as directory:
+            metadata_cache = FileMetadataCache(directory)
+            metadata_cache.save('org', '9.2', Metadata.from_entity_definitions(DEFINITIONS))
+
+            self.assertEqual(metadata_cache.load('org', '9.2').entity_set('account'), 'accounts')
+            self.assertIsNone(metadata_cache.load('org', '9.1'))
+
+
+    def test_load_cached(self):
+        """Test the metadata of an Entity with a metadata cache, without
+        loading it (as the metadata consumers do).
+
+        Should result in the cached metadata read from the disk without
+        a request, and None without a cached one.
+        """
+
+        transport = Transport()
+        transport.session.mount('http://stub/', FailingAdapter())
+
+        with tempfile.TemporaryDirectory() as directory:
+            metadata_cache = FileMetadataCache(directory)
+
+            entity = Entity('token', 'org', root_url='http://stub', transport=transport,
+                            metadata_cache=metadata_cache)
+            self.assertIsNone(entity.get_metadata(load=False))
+
+            metadata_cache.save('org', D365_API_V, Metadata.from_entity_definitions(DEFINITIONS))
+
+            entity = Entity('token', 'org', root_url='http://stub', transport=transport,
+                            metadata_cache=metadata_cache)
+            self.assertEqual(entity.get_metadata(load=False).primary_key('accounts'), 'accountid')
+            self.assertIs(entity.get_metadata(load=False), entity.get_metadata())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+"""
+D365FW.TestMetrics
+~~~~~~~~~~~~~~~~~~
+"""
+
+import unittest
+
+from requests import Response
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectionError
+
+from D365FW.Metrics import Metrics, RequestEvent, describe_request
+from D365FW.Transport import Transport
+
+
+class StubAdapter(HTTPAdapter):
+    """Adapter answering `/accounts` with 200 OK, and raising a
+    ConnectionError for any other path."""
+
+    def send(self, request, **kwargs):
+        if not request.url.endswith('/accounts'):
+            raise ConnectionError('Connection refused')
+
+        r = Response()
+        r.status_code = 200
+        r.request = request
+        r._content = b'{}'
+        return r
+
+
+def failing_hook(event):
+    """Hook raising for every request."""
+
+    raise RuntimeError('Hook failed')
+
+
+class TestMetrics(unittest.TestCase):
+    """Test the Metrics module."""
+
+    def test_describe_request(self):
+        """Test the operation and entity set of the request URLs.
+
+        Should result in the operation from the method, bound action or
+        `$ref`, and the entity set without the key.
+        """
+
+        root_url = 'https://org.api.crm.dynamics.com/api/data/v9.2'
+
+        self.assertEqual(describe_request('GET', f'{root_url}/accounts(1)'), ('read', 'accounts'))
+        self.assertEqual(describe_request('GET', f"{root_url}/accounts?$filter=name eq 'A'"), ('query', 'accounts'))
+        self.assertEqual(describe_request('POST', f'{root_url}/accounts/Microsoft.Dynamics.CRM.CreateMultiple'),
+                         ('CreateMultiple', 'accounts'))
+        self.assertEqual(describe_request('DELETE', f'{root_url}/accounts(1)/contacts(2)/$ref'),
+                         ('disassociate', 'accounts'))
+        self.assertEqual(describe_request('POST', f'{root_url}/$batch'), ('batch', None))
+        self.assertEqual(describe_request('POST', 'https://login.microsoftonline.com/tenant/oauth2/token'),
+                         ('login', None))
+
+
+    def test_prometheus(self):
+        """Test the Prometheus export of three requests.
+
+        Should result in the count per status, the cumulative latency
+        buckets, and the retries and throttle waits summed.
+        """
+
+        metrics = Metrics(buckets=(0.1, 1.0))
+        metrics(RequestEvent('read', 'accounts', 'GET', 'url', 200, latency=0.05, response_bytes=100))
+        metrics(RequestEvent('read', 'accounts', 'GET', 'url', 200, latency=0.5, retries=1,
+                             throttle_retries=1, throttle_wait=2.0))
+        metrics(RequestEvent('read', 'accounts', 'GET', 'url', None, latency=5.0))
+
+        text = metrics.to_prometheus()
+
+        self.assertIn('d365fw_requests_total{operation="read",entity_set="accounts",status="200"} 2', text)
+        self.assertIn('d365fw_requests_total{operation="read",entity_set="accounts",status="error"} 1', text)
+        self.assertIn('d365fw_request_duration_seconds_bucket{operation="read",entity_set="accounts",le="1.0"} 2',
+                      text)
+        self.assertIn('d365fw_request_duration_seconds_bucket{operation="read",entity_set="accounts",le="+Inf"} 3',
+                      text)
+        self.assertIn('d365fw_response_bytes_total{operation="read",entity_set="accounts"} 100', text)
+        self.assertIn('d365fw_throttle_wait_seconds_total{operation="read",entity_set="accounts"} 2.0', text)
+
+        metrics.reset()
+        self.assertEqual(metrics.snapshot(), {'requests': {}, 'series': {}})
+
+
+    def test_failing_hook(self):
+        """Test requests with a hook raising an error.
+
+        Should result in the response returned or the ConnectionError of
+        the request raised, the error of the hook logged and the
+        following hook still called.
+        """
+
+        metrics = Metrics()
+        transport = Transport(throttle=False, retry=False, hooks=[failing_hook, metrics])
+        transport.session.mount('http://stub/', StubAdapter())
+
+        with self.assertLogs('D365FW.Transport', 'WARNING') as logs:
+            self.assertEqual(transport.get('http://stub/accounts').status_code, 200)
+
+            with self.assertRaises(ConnectionError):
+                transport.get('http://stub/contacts')
+
+        self.assertEqual(len(logs.records), 2)
+        self.assertIsInstance(logs.records[0].exc_info[1], RuntimeError)
+        self.assertEqual(sum(metrics.snapshot()['requests'].values()), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
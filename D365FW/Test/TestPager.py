@@ -0,0 +1,121 @@
+"""
+D365FW.TestPager
+~~~~~~~~~~~~~~~~
+"""
+
+import threading
+import time
+import unittest
+
+from D365FW.Pager import PrefetchPager, MergePager
+
+
+class TestPager(unittest.TestCase):
+    """Test the Pager module."""
+
+    def test_order(self):
+        """Test the pages prefetched on the worker thread.
+
+        Should result in the pages in the order of the page iterator.
+        """
+
+        pages = [[index] for index in range(20)]
+
+        self.assertEqual(list(PrefetchPager(iter(pages), depth=3)), pages)
+
+
+    def test_backpressure(self):
+        """Test a caller slower than the worker thread.
+
+        Should result in at most `depth` pages fetched ahead of the
+        caller.
+        """
+
+        fetched = []
+
+        def pages():
+            for index in range(10):
+                fetched.append(index)
+                yield [index]
+
+        pager = PrefetchPager(pages(), depth=2)
+        iterator = iter(pager)
+        next(iterator)
+        time.sleep(0.2)
+
+        # The page consumed, the queued pages and the one waiting to be queued
+        self.assertLessEqual(len(fetched), 1 + 2 + 1)
+
+        iterator.close()
+
+
+    def test_error(self):
+        """Test a page iterator raising after two pages.
+
+        Should result in the two pages, then the error raised to the
+        caller.
+        """
+
+        def pages():
+            yield [1]
+            yield [2]
+            raise ValueError('page')
+
+        received = []
+
+        with self.assertRaises(ValueError):
+            for page in PrefetchPager(pages()):
+                received.append(page)
+
+        self.assertEqual(received, [[1], [2]])
+
+
+    def test_close(self):
+        """Test a caller stopping after the first page.
+
+        Should result in the worker thread stopped and the page iterator
+        closed.
+        """
+
+        closed = threading.Event()
+
+        def pages():
+            try:
+                for index in range(100):
+                    yield [index]
+            finally:
+                closed.set()
+
+        pager = PrefetchPager(pages(), depth=1)
+        for _ in pager:
+            break
+
+        self.assertTrue(closed.wait(1))
+        pager._worker.join(1)
+        self.assertFalse(pager._worker.is_alive())
+
+
+    def test_depth(self):
+        """Test a prefetch depth of 0.
+
+        Should result in ValueError.
+        """
+
+        with self.assertRaises(ValueError):
+            PrefetchPager(iter([]), depth=0)
+
+
+    def test_merge(self):
+        """Test the merge of three page iterators.
+
+        Should result in every page of each iterator, in the order of
+        its own iterator.
+        """
+
+        sources = [iter([[f'{name}{index}'] for index in range(5)]) for name in 'abc']
+        pages = list(MergePager(sources))
+
+        self.assertEqual(len(pages), 15)
+        for name in 'abc':
+            self.assertEqual([page for page in pages if page[0][0] == name],
+                             [[f'{name}{index}'] for index in range(5)])
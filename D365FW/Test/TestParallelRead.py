@@ -0,0 +1,109 @@
+"""
+D365FW.TestParallelRead
+~~~~~~~~~~~~~~~~~~~~~~~
+"""
+
+import re
+import unittest
+from urllib.parse import parse_qs, urlsplit, quote
+
+from D365FW.Entity import Entity
+from D365FW.Test.StubServer import StubServerMixin
+
+# The Account records, two of them without a creation date
+ACCOUNTS = [{'name': f'Account-{index}', 'createdon': f'2020-{index:02d}-01T00:00:00Z'} for index in range(1, 10)]
+ACCOUNTS += [{'name': 'Account-A', 'createdon': None}, {'name': 'Account-B', 'createdon': None}]
+
+# The number of records per page
+PAGE_SIZE = 2
+
+def matches(expression, record):
+    """Check if a record matches a filter expression of comparisons
+    joined by `and` and `or`."""
+
+    def compare(match):
+        key, operator, literal = match.groups()
+        value = record.get(key)
+        if literal == 'null':
+            return str((value is None) == (operator == 'eq'))
+        if value is None:
+            return 'False'
+        return str({'lt': value < literal, 'ge': value >= literal, 'eq': value == literal,
+                    'ne': value != literal}[operator])
+
+    return eval(re.sub(r'(\w+) (lt|ge|eq|ne) ([\w:.-]+)', compare, expression))
+
+
+def read_accounts(request):
+    """The Account records of the `$filter`, `$orderby` (null first)
+    and `$top`, paged by `@odata.nextLink`."""
+
+    query = {key: values[0] for key, values in parse_qs(urlsplit(request.path).query).items()}
+
+    records = [record for record in ACCOUNTS if matches(query.get('$filter', 'True'), record)]
+    if '$orderby' in query:
+        key, direction = query['$orderby'].split()
+        records.sort(key=lambda record: (record[key] is not None, record[key] or ''), reverse=direction == 'desc')
+    if '$top' in query:
+        records = records[:int(query['$top'])]
+
+    skip = int(query.get('$skiptoken', 0))
+    page = {'value': records[skip:skip + PAGE_SIZE]}
+    if skip + PAGE_SIZE < len(records):
+        path = re.sub(r'[?&]\$skiptoken=\d+', '', request.path)
+        separator = '&' if '?' in path else '?'
+        page['@odata.nextLink'] = f'{request.server.url}{path}{separator}$skiptoken={skip + PAGE_SIZE}'
+
+    return 200, page
+
+
+class TestParallelRead(StubServerMixin, unittest.TestCase):
+    """Test the partitioned reads against a local stub server."""
+
+    routes = {
+        ('GET', '/accounts'): read_accounts
+    }
+
+    def setUp(self):
+        """Create an Entity of the stub server."""
+
+        self.server.paths = []
+        self.entity = Entity('token', 'stub', root_url=self.server.url)
+
+
+    def test_parallel_read(self):
+        """Test a datetime partitioned read of records with and without
+        a key value.
+
+        Should result in the same records as the read, each one once.
+        """
+
+        names = [account['name'] for account in self.entity.accounts.read()]
+        self.assertEqual(len(names), 11)
+
+        self.server.paths = []
+        parallel_names = [account['name'] for account in self.entity.accounts.parallel_read(partitions=3)]
+
+        self.assertEqual(sorted(parallel_names), sorted(names))
+
+        # Test to ensure the range of the key is read first, then the pages of 3 partitions
+        self.assertEqual(sum('$top=1' in path for path in self.server.paths), 2)
+        self.assertIn('/accounts?$filter=' + quote('(createdon lt 2020-03-22T08:00:00Z or createdon eq null)'),
+                      self.server.paths)
+
+
+    def test_parallel_read_ordered(self):
+        """Test an ordered datetime partitioned read.
+
+        Should result in the records with a null key first, then the
+        others in ascending key order.
+        """
+
+        accounts = list(self.entity.accounts.parallel_read(partitions=3, ordered=True))
+
+        self.assertEqual([account['name'] for account in accounts],
+                         ['Account-A', 'Account-B'] + [f'Account-{index}' for index in range(1, 10)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+"""
+D365FW.TestPartition
+~~~~~~~~~~~~~~~~~~~~
+"""
+
+import unittest
+import uuid
+from datetime import datetime, timezone
+
+from D365FW.Partition import guid_bounds, datetime_bounds, partition_filters
+
+
+def _sql_order(guid):
+    """The SQL Server `uniqueidentifier` sort key of a GUID."""
+
+    b = uuid.UUID(guid).bytes
+    return b[10:16] + b[8:10] + b[6:8] + b[4:6] + b[0:4]
+
+
+class TestPartition(unittest.TestCase):
+    """Test the Partition module."""
+
+    def test_guid_bounds(self):
+        """Test the GUID partition bounds.
+
+        Split the GUID range in 4. Should result in 3 ascending bounds
+        in the SQL Server order, on the first byte of the last group.
+        """
+
+        bounds = guid_bounds(4)
+
+        self.assertEqual(bounds[0], '00000000-0000-0000-0000-400000000000')
+        self.assertEqual(len(bounds), 3)
+        self.assertEqual(sorted(bounds, key=_sql_order), bounds)
+
+
+    def test_datetime_bounds(self):
+        """Test the datetime partition bounds.
+
+        Split 4 days in 4, then 2 seconds in 8. Should result in a bound
+        per day, then no duplicate bound.
+        """
+
+        start = datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+        self.assertEqual(datetime_bounds(start, datetime(2020, 1, 5, tzinfo=timezone.utc), 4),
+                         ['2020-01-02T00:00:00Z', '2020-01-03T00:00:00Z', '2020-01-04T00:00:00Z'])
+        self.assertEqual(datetime_bounds(start, datetime(2020, 1, 1, 0, 0, 2, tzinfo=timezone.utc), 8),
+                         ['2020-01-01T00:00:00Z', '2020-01-01T00:00:01Z'])
+
+
+    def test_partition_filters(self):
+        """Test the partition filters.
+
+        Create the filters for 2 bounds. Should result in 3 disjoint
+        filters, open at both ends, the first one with the null key.
+        """
+
+        self.assertEqual(partition_filters('createdon', ['a', 'b']),
+                         ['(createdon lt a or createdon eq null)', 'createdon ge a and createdon lt b',
+                          'createdon ge b'])
+        self.assertEqual(partition_filters('createdon', []), [''])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+"""
+D365FW.TestProfiler
+~~~~~~~~~~~~~~~~~~~
+"""
+
+import json
+import os
+import tempfile
+import time
+import unittest
+
+from D365FW.Entity import Entity
+from D365FW.Profiler import Profiler, ProfilingAdapter
+from D365FW.Test.StubServer import StubServerMixin
+from D365FW.Transport import Transport
+
+
+def read_accounts(request):
+    """Two pages of Account."""
+
+    page = {'value': [{'name': 'Account-1'}, {'name': 'Account-2'}]}
+    if 'page=' not in request.path:
+        page['@odata.nextLink'] = f'{request.server.url}/accounts?page=2'
+
+    return 200, page
+
+
+class TestProfiler(StubServerMixin, unittest.TestCase):
+    """Test the Profiler module."""
+
+    routes = {
+        ('GET', '/accounts'): read_accounts
+    }
+
+    def test_span(self):
+        """Test the nested spans of an operation.
+
+        Should result in the `self_ms` of the operation without the time
+        of its nested spans, reported as the `assemble` phase.
+        """
+
+        profiler = Profiler()
+
+        with profiler.span('read', 'operation'):
+            with profiler.span('request', 'request'):
+                time.sleep(0.05)
+
+        request, operation = profiler.events
+
+        self.assertEqual((request['name'], request['ph']), ('request', 'X'))
+        self.assertGreaterEqual(request['dur'], 50000)
+        self.assertLess(operation['args']['self_ms'], 50)
+
+        summary = profiler.summary()
+        self.assertEqual(summary['request']['count'], 1)
+        self.assertEqual(summary['assemble']['max_ms'], operation['args']['self_ms'])
+
+
+    def test_max_events(self):
+        """Test the spans past `max_events`.
+
+        Should result in the spans dropped and counted.
+        """
+
+        profiler = Profiler(max_events=2)
+
+        for _ in range(3):
+            with profiler.span('send'):
+                pass
+
+        self.assertEqual(len(profiler.events), 2)
+        self.assertEqual(profiler.dropped, 1)
+
+        profiler.clear()
+        self.assertEqual((profiler.events, profiler.dropped), ([], 0))
+
+
+    def test_read(self):
+        """Test read through a profiled transport.
+
+        Should result in the phases of each request, the JSON decoding
+        and the read operation saved in the Chrome trace event format.
+        """
+
+        profiler = Profiler()
+        transport = Transport(profiler=profiler)
+        entity = Entity('token', 'stub', root_url=self.server.url, transport=transport)
+
+        self.assertIsInstance(transport.session.get_adapter(self.server.url), ProfilingAdapter)
+        self.assertEqual(len(entity.accounts.read()), 4)
+
+        names = [event['name'] for event in profiler.events]
+
+        # Test to ensure the connection is opened once and reused
+        self.assertEqual(names.count('tcp_connect'), 1)
+        for name in ('connection_acquire', 'send', 'ttfb', 'body', 'json_decode', 'request'):
+            self.assertEqual(names.count(name), 2)
+        self.assertEqual(names[-1], 'read')
+        self.assertEqual(profiler.events[-1]['args']['entity_set'], 'accounts')
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'trace.json')
+            profiler.save(path)
+
+            with open(path) as f:
+                trace = json.load(f)
+
+        self.assertEqual(len(trace['traceEvents']), len(names))
+        self.assertEqual(trace['displayTimeUnit'], 'ms')
+
+
+    def test_disabled(self):
+        """Test read through a transport without profiler.
+
+        Should result in the default adapter and no JSON codec wrapper.
+        """
+
+        entity = Entity('token', 'stub', root_url=self.server.url, transport=Transport())
+
+        self.assertNotIsInstance(entity.transport.session.get_adapter(self.server.url), ProfilingAdapter)
+        self.assertNotIn('Profiled', type(entity.codec).__name__)
+        self.assertEqual(len(entity.accounts.read()), 4)
@@ -0,0 +1,73 @@
+"""
+D365FW.TestQuery
+~~~~~~~~~~~~~~~~
+"""
+
+import unittest
+
+from urllib.parse import quote
+
+from D365FW.Query import Query, format_literal, page_fetch_xml, parse_paging_cookie
+
+
+class TestQuery(unittest.TestCase):
+    """Test the Query module."""
+
+    def test_query_encoding(self):
+        """Test the encoding of the query options.
+
+        Compile a filter with reserved characters. Should result in the
+        characters percent encoded.
+        """
+
+        query = Query(select=['name', 'accountnumber'], filter="name eq 'A&B #1'", top=5)
+
+        self.assertEqual(query.bind(),
+                         "$select=name,accountnumber&$filter=name%20eq%20'A%26B%20%231'&$top=5")
+
+
+    def test_query_parameters(self):
+        """Test the parameter slots.
+
+        Bind a string with a quote to a slot. Should result in a quoted
+        literal with the quote doubled, or ValueError when missing.
+        """
+
+        query = Query(filter='name eq {name}')
+
+        self.assertEqual(query.parameters, {'name'})
+        self.assertEqual(query.url('accounts', name="O'Brien"), "accounts?$filter=name%20eq%20'O''Brien'")
+        self.assertRaises(ValueError, query.bind)
+
+
+    def test_format_literal(self):
+        """Test the OData literals."""
+
+        self.assertEqual(format_literal(None), 'null')
+        self.assertEqual(format_literal(True), 'true')
+        self.assertEqual(format_literal(10), '10')
+        self.assertEqual(format_literal('a'), "'a'")
+
+
+
+    def test_fetch_xml_paging(self):
+        """Test the FetchXML paging.
+
+        Parse a paging cookie annotation and set it on a FetchXML.
+        Should result in the next page with the decoded paging cookie.
+        """
+
+        paging_cookie = '<cookie page="1"><accountid last="{1}" /></cookie>'
+        annotation = f'<cookie pagenumber="2" pagingcookie="{quote(quote(paging_cookie))}" istracking="False" />'
+
+        page_number, cookie = parse_paging_cookie(annotation)
+        fetch_xml = page_fetch_xml('<fetch><entity name="account" /></fetch>', page_number, cookie, 500)
+
+        self.assertEqual((page_number, cookie), (2, paging_cookie))
+        self.assertIn('page="2"', fetch_xml)
+        self.assertIn('count="500"', fetch_xml)
+        self.assertIn('paging-cookie="&lt;cookie page=&quot;1&quot;&gt;', fetch_xml)
+
+
+if __name__ == '__main__':
+    unittest.main()
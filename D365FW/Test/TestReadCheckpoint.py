@@ -0,0 +1,144 @@
+"""
+D365FW.TestReadCheckpoint
+~~~~~~~~~~~~~~~~~~~~~~~~~
+"""
+
+import re
+import unittest
+from urllib.parse import unquote
+
+from D365FW.Checkpoint import MemoryCheckpointStore
+from D365FW.Entity import Entity
+from D365FW.Pager import IncompleteReadError
+from D365FW.Test.StubServer import StubServerMixin
+
+
+def read_accounts(request):
+    """Three pages of Account, by `@odata.nextLink` or FetchXML page
+    number, the third one failing while `server.fail` is set."""
+
+    fetch_xml = 'fetchXml=' in request.path
+    if fetch_xml:
+        page_number = int(re.search(r'page="(\d+)"', unquote(request.path)).group(1))
+    else:
+        page_number = int(request.path.split('page=')[1]) if 'page=' in request.path else 1
+    if page_number == 3 and request.server.fail:
+        return 400, None
+
+    page = {'value': [{'name': f'Account-{page_number}-{index}'} for index in range(2)]}
+    if page_number < 3 and fetch_xml:
+        page['@Microsoft.Dynamics.CRM.morerecords'] = True
+    elif page_number < 3:
+        page['@odata.nextLink'] = f'{request.server.url}/accounts?page={page_number + 1}'
+
+    return 200, page
+
+
+class TestReadCheckpoint(StubServerMixin, unittest.TestCase):
+    """Test the incomplete and checkpointed reads against a local stub
+    server."""
+
+    routes = {
+        ('GET', '/accounts'): read_accounts
+    }
+
+    def setUp(self):
+        """Create an Entity of the stub server."""
+
+        self.server.fail = True
+        self.server.paths = []
+        self.entity = Entity('token', 'stub', root_url=self.server.url)
+
+
+    def test_read_incomplete(self):
+        """Test read with the third page failing.
+
+        Should result in None instead of the records of the first two
+        pages, and the stream raising IncompleteReadError.
+        """
+
+        self.assertIsNone(self.entity.accounts.read())
+
+        with self.assertRaises(IncompleteReadError) as context:
+            list(self.entity.accounts.iter_read())
+
+        # Test to ensure the error tells where the read stopped
+        self.assertEqual(context.exception.count, 4)
+        self.assertEqual(context.exception.url, f'{self.server.url}/accounts?page=3')
+
+
+    def test_stream_incomplete(self):
+        """Test the streams of a query, FetchXML and partitioned read
+        with the third page failing.
+
+        Should result in each stream raising IncompleteReadError after
+        the records of the first two pages, and None for the columns.
+        """
+
+        accounts = self.entity.accounts
+        streams = {
+            'query': lambda: accounts.query(stream=True, select='name'),
+            'iter_fetch': lambda: accounts.iter_fetch('<fetch><entity name="account" /></fetch>'),
+            'parallel_read': lambda: accounts.parallel_read(partitions=2, key='accountid', prefetch=1)
+        }
+
+        for name, stream in streams.items():
+            with self.subTest(name):
+                names = []
+                with self.assertRaises(IncompleteReadError):
+                    for account in stream():
+                        names.append(account['name'])
+                self.assertGreaterEqual(len(names), 4)
+
+        self.assertIsNone(accounts.query(select='name', as_columns='array'))
+
+
+    def test_iter_read_resume(self):
+        """Test resuming a stream from its checkpoint.
+
+        Fail the third page, then read again. Should result in the
+        second read starting from the third page and the checkpoint
+        deleted once done.
+        """
+
+        store = MemoryCheckpointStore()
+        names = []
+
+        with self.assertRaises(IncompleteReadError):
+            for account in self.entity.accounts.iter_read(store=store, key='accounts'):
+                names.append(account['name'])
+
+        self.assertEqual(store.get('accounts')['count'], 4)
+
+        self.server.fail = False
+        self.server.paths = []
+        names.extend(account['name'] for account in self.entity.accounts.iter_read(store=store, key='accounts'))
+
+        self.assertEqual(self.server.paths, ['/accounts?page=3'])
+        self.assertEqual(len(set(names)), 6)
+        self.assertIsNone(store.get('accounts'))
+
+
+    def test_read_store(self):
+        """Test read with a checkpoint store, with and without stream.
+
+        Should result in a ValueError without stream and no request
+        sent, and the checkpointed stream with it.
+        """
+
+        store = MemoryCheckpointStore()
+
+        with self.assertRaises(ValueError):
+            self.entity.accounts.read(store=store, key='accounts')
+
+        self.assertEqual(self.server.paths, [])
+
+        self.server.fail = False
+        names = [account['name'] for account in self.entity.accounts.read(stream=True, store=store, key='accounts')]
+
+        self.assertEqual(len(names), 6)
+        self.assertIsNone(store.get('accounts'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+"""
+D365FW.TestRecordCache
+~~~~~~~~~~~~~~~~~~~~~~
+"""
+
+import unittest
+
+from D365FW.Cache import RecordCache
+from D365FW.Entity import Entity
+from D365FW.Test.StubServer import StubServerMixin
+
+
+def read_account(request):
+    """The Account of the current version, 304 Not Modified for its
+    etag, 404 Not Found once deleted."""
+
+    server = request.server
+    server.conditions.append(request.headers.get('If-None-Match'))
+
+    if server.version is None:
+        return 404, None
+
+    etag = f'W/"{server.version}"'
+    if request.headers.get('If-None-Match') == etag:
+        return 304, None
+
+    return 200, {'@odata.etag': etag, 'accountid': 'a1', 'name': f'Account-{server.version}'}
+
+
+def update_account(request):
+    """Update the Account to a new version."""
+
+    request.server.version += 1
+    return 204, None
+
+
+def delete_account(request):
+    """Delete the Account."""
+
+    request.server.version = None
+    return 204, None
+
+
+class TestRecordCache(StubServerMixin, unittest.TestCase):
+    """Test the record cache of the single record reads against a local
+    stub server."""
+
+    routes = {
+        ('GET', '/accounts(a1)'): read_account,
+        ('PATCH', '/accounts(a1)'): update_account,
+        ('DELETE', '/accounts(a1)'): delete_account
+    }
+
+    def setUp(self):
+        """Reset the Account of the stub server."""
+
+        self.server.version = 1
+        self.server.conditions = []
+
+
+    def test_revalidate(self):
+        """Test reading a record twice, revalidated on every read.
+
+        Should result in the second read sent with `If-None-Match` and
+        the cached record returned for the 304 Not Modified.
+        """
+
+        entity = Entity('token', 'stub', root_url=self.server.url, record_cache=RecordCache(ttl=0))
+
+        self.assertEqual(entity.accounts.read('a1')[0]['name'], 'Account-1')
+        self.assertEqual(entity.accounts.read('a1')[0]['name'], 'Account-1')
+
+        self.assertEqual(self.server.conditions, [None, 'W/"1"'])
+
+
+    def test_invalidate(self):
+        """Test reading a fresh cached record after an update and after
+        a delete.
+
+        Should result in the second read served from the cache, and the
+        reads after the update and the delete sent without
+        `If-None-Match`.
+        """
+
+        entity = Entity('token', 'stub', root_url=self.server.url, record_cache=True)
+
+        entity.accounts.read('a1')
+        entity.accounts.read('a1')
+        self.assertEqual(self.server.conditions, [None])
+
+        entity.accounts.update('a1', {'name': 'Account-2'})
+        self.assertEqual(entity.accounts.read('a1')[0]['name'], 'Account-2')
+
+        entity.accounts.delete('a1')
+        self.assertIsNone(entity.accounts.read('a1'))
+
+        self.assertEqual(self.server.conditions, [None, None, None])
+
+
+if __name__ == '__main__':
+    unittest.main()
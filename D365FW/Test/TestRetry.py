@@ -0,0 +1,174 @@
+"""
+D365FW.TestRetry
+~~~~~~~~~~~~~~~~
+"""
+
+import time
+import unittest
+
+from requests import Response
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectionError
+
+from D365FW.Retry import RetryPolicy
+from D365FW.Transport import Transport
+
+
+class StubAdapter(HTTPAdapter):
+    """Adapter answering every request with a status code and header,
+    or raising a ConnectionError when the status code is None."""
+
+    def __init__(self, status_code, headers=None):
+        super().__init__()
+
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.requests = []
+
+    def send(self, request, **kwargs):
+        self.requests.append(request.method)
+
+        if self.status_code is None:
+            raise ConnectionError('Connection refused')
+
+        r = Response()
+        r.status_code = self.status_code
+        r.headers.update(self.headers)
+        r.request = request
+        r._content = b''
+        return r
+
+
+class TestRetry(unittest.TestCase):
+    """Test the Retry module and the retries of the Transport."""
+
+    def create_transport(self, status_code, **kwargs):
+        """Create a Transport of a StubAdapter, without throttle."""
+
+        retry = RetryPolicy(**dict({'max_attempts': 3, 'backoff': 0.001}, **kwargs))
+        transport = Transport(throttle=False, retry=retry)
+        adapter = StubAdapter(status_code)
+        transport.session.mount('http://stub/', adapter)
+
+        return transport, adapter
+
+
+    def test_backoff(self):
+        """Test the backoff of each attempt.
+
+        Should result in the backoff doubled per attempt up to the
+        maximum, and a full jitter backoff between 0 and it.
+        """
+
+        retry = RetryPolicy(backoff=0.5, max_backoff=3, jitter=False)
+        self.assertEqual([retry.get_backoff(attempt) for attempt in range(1, 6)], [0.5, 1, 2, 3, 3])
+
+        retry = RetryPolicy(backoff=0.5, max_backoff=3)
+        backoffs = [retry.get_backoff(3) for _ in range(200)]
+        self.assertTrue(all(0 <= backoff <= 2 for backoff in backoffs))
+        self.assertGreater(len(set(backoffs)), 1)
+
+
+    def test_next_backoff(self):
+        """Test the backoff before the next attempt of a call.
+
+        Should result in None past the maximum attempts, or when the
+        backoff ends past the deadline.
+        """
+
+        retry = RetryPolicy(max_attempts=3, backoff=1, jitter=False)
+
+        self.assertEqual(retry.next_backoff(2), 2)
+        self.assertIsNone(retry.next_backoff(3))
+        self.assertIsNone(retry.next_backoff(2, deadline=time.monotonic() + 1))
+
+
+    def test_is_idempotent(self):
+        """Test the requests safe to send again.
+
+        Should result in GET, PUT and DELETE, PATCH with `If-Match`, and
+        the caller decision first.
+        """
+
+        self.assertTrue(RetryPolicy.is_idempotent('GET'))
+        self.assertTrue(RetryPolicy.is_idempotent('delete'))
+        self.assertFalse(RetryPolicy.is_idempotent('POST'))
+        self.assertFalse(RetryPolicy.is_idempotent('PATCH', {'Content-Type': 'application/json'}))
+        self.assertTrue(RetryPolicy.is_idempotent('PATCH', {'If-Match': '*'}))
+        self.assertTrue(RetryPolicy.is_idempotent('POST', idempotent=True))
+        self.assertFalse(RetryPolicy.is_idempotent('GET', idempotent=False))
+
+
+    def test_retry_status(self):
+        """Test requests failing with 503 Service Unavailable.
+
+        Should result in the idempotent requests sent up to the maximum
+        attempts, and a POST or unconditional PATCH sent once.
+        """
+
+        transport, adapter = self.create_transport(503)
+
+        self.assertEqual(transport.get('http://stub/accounts').status_code, 503)
+        transport.post('http://stub/accounts', data='{}')
+        transport.patch('http://stub/accounts(1)', data='{}', headers={'If-Match': '*'})
+        transport.patch('http://stub/accounts(1)', data='{}')
+        transport.post('http://stub/accounts', data='{}', idempotent=True)
+
+        self.assertEqual(adapter.requests, ['GET'] * 3 + ['POST'] + ['PATCH'] * 3 + ['PATCH'] + ['POST'] * 3)
+
+
+    def test_throttle_status(self):
+        """Test requests throttled with 503 Service Unavailable and a
+        `Retry-After`, without retry.
+
+        Should result in the GET sent up to the maximum throttle retries,
+        and the 503 of a POST returned without sending it again.
+        """
+
+        transport = Transport(throttle={'max_retries': 2}, retry=False)
+        adapter = StubAdapter(503, {'Retry-After': '0'})
+        transport.session.mount('http://stub/', adapter)
+
+        self.assertEqual(transport.get('http://stub/accounts').status_code, 503)
+        self.assertEqual(transport.post('http://stub/accounts', data='{}').status_code, 503)
+        transport.post('http://stub/accounts', data='{}', idempotent=True)
+
+        self.assertEqual(adapter.requests, ['GET'] * 3 + ['POST'] + ['POST'] * 3)
+
+        # A 429 was never processed, any request is sent again
+        adapter.status_code = 429
+        adapter.requests = []
+        transport.post('http://stub/accounts', data='{}')
+
+        self.assertEqual(adapter.requests, ['POST'] * 3)
+
+
+    def test_retry_connection_error(self):
+        """Test a GET failing with a connection error.
+
+        Should result in the GET sent up to the maximum attempts, then
+        the ConnectionError raised.
+        """
+
+        transport, adapter = self.create_transport(None)
+
+        with self.assertRaises(ConnectionError):
+            transport.get('http://stub/accounts')
+
+        self.assertEqual(len(adapter.requests), 3)
+
+
+    def test_deadline(self):
+        """Test a GET failing with 503 within a deadline.
+
+        Should result in the attempts stopped before the deadline of the
+        call, well before the maximum attempts.
+        """
+
+        transport, adapter = self.create_transport(503, max_attempts=100, backoff=0.05, jitter=False, deadline=0.3)
+
+        start = time.monotonic()
+        transport.get('http://stub/accounts')
+
+        self.assertLess(time.monotonic() - start, 0.3)
+        self.assertLess(len(adapter.requests), 10)
@@ -0,0 +1,138 @@
+"""
+D365FW.TestThrottle
+~~~~~~~~~~~~~~~~~~~
+"""
+
+import time
+import unittest
+from email.utils import formatdate
+
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ChunkedEncodingError
+from requests.structures import CaseInsensitiveDict
+
+from D365FW.Throttle import Throttle, BURST_REMAINING_HEADER, TIME_REMAINING_HEADER
+from D365FW.Transport import Transport
+
+
+class StubResponse(object):
+    """Response with a status code and header."""
+
+    def __init__(self, status_code=200, headers=None):
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers or {})
+
+
+class FailingAdapter(HTTPAdapter):
+    """Adapter failing every request with a ChunkedEncodingError."""
+
+    def send(self, request, **kwargs):
+        raise ChunkedEncodingError('Connection broken')
+
+
+class TestThrottle(unittest.TestCase):
+    """Test the Throttle module."""
+
+    def test_increase(self):
+        """Test the successful responses of a window of requests.
+
+        Should result in the concurrency grown by `increase` per window,
+        up to the maximum.
+        """
+
+        throttle = Throttle(max_concurrency=4, initial_concurrency=2)
+
+        for _ in range(2):
+            throttle.acquire()
+            throttle.release(StubResponse(200))
+
+        self.assertAlmostEqual(throttle.limit, 2 + 0.5 + 1 / 2.5)
+
+        for _ in range(100):
+            throttle.acquire()
+            throttle.release(StubResponse(200))
+
+        self.assertEqual(throttle.limit, 4)
+        self.assertEqual(throttle.in_flight, 0)
+
+
+    def test_decrease(self):
+        """Test a burst of throttled (429) responses.
+
+        Should result in the concurrency halved once for the burst, and
+        the requests paused for the `Retry-After`.
+        """
+
+        throttle = Throttle(max_concurrency=16)
+
+        for _ in range(3):
+            throttle.acquire()
+            throttle.release(StubResponse(429, {'Retry-After': '0.2'}))
+
+        self.assertEqual(throttle.limit, 8)
+        self.assertGreater(throttle.try_acquire(), 0)
+
+        # Test to ensure the next request waits for the Retry-After
+        self.assertGreaterEqual(throttle.acquire(), 0.15)
+
+
+    def test_retry_after(self):
+        """Test the `Retry-After` formats.
+
+        Should result in the seconds of a delay or HTTP date, 1 second
+        when missing or invalid, at most `max_retry_after`.
+        """
+
+        throttle = Throttle(max_retry_after=60)
+
+        self.assertEqual(throttle.retry_after(StubResponse(429, {'Retry-After': '5'})), 5)
+        self.assertAlmostEqual(throttle.retry_after(
+            StubResponse(429, {'Retry-After': formatdate(time.time() + 30, usegmt=True)})), 30, delta=2)
+        self.assertEqual(throttle.retry_after(StubResponse(429, {'Retry-After': 'soon'})), 1)
+        self.assertEqual(throttle.retry_after(StubResponse(429)), 1)
+        self.assertEqual(throttle.retry_after(StubResponse(429, {'Retry-After': '3600'})), 60)
+
+        self.assertTrue(Throttle.is_throttled(StubResponse(503, {'Retry-After': '1'})))
+        self.assertFalse(Throttle.is_throttled(StubResponse(503)))
+
+
+    def test_rate_limit_headers(self):
+        """Test the `x-ms-ratelimit-*` headers of successful responses.
+
+        Should result in the concurrency shrunk when fewer requests are
+        left than in flight, and held when the limits run low.
+        """
+
+        throttle = Throttle(max_concurrency=52, initial_concurrency=10)
+
+        # Fewer requests left in the burst than in flight
+        for _ in range(5):
+            throttle.acquire()
+        throttle.release(StubResponse(200, {BURST_REMAINING_HEADER: '2'}))
+        self.assertEqual(throttle.limit, 5)
+
+        # Low burst and execution time remaining
+        throttle.release(StubResponse(200, {BURST_REMAINING_HEADER: '20'}))
+        throttle.release(StubResponse(200, {TIME_REMAINING_HEADER: '5'}))
+        self.assertEqual(throttle.limit, 5)
+
+        throttle.release(StubResponse(200, {BURST_REMAINING_HEADER: '1000', TIME_REMAINING_HEADER: '600'}))
+        self.assertGreater(throttle.limit, 5)
+        self.assertEqual(throttle.in_flight, 1)
+
+
+    def test_release_on_error(self):
+        """Test requests failing with an error other than a connection
+        error or timeout.
+
+        Should result in the error raised and no request slot kept.
+        """
+
+        transport = Transport()
+        transport.session.mount('http://stub/', FailingAdapter())
+
+        for _ in range(3):
+            with self.assertRaises(ChunkedEncodingError):
+                transport.get('http://stub/accounts')
+
+        self.assertEqual(transport.get_throttle('http://stub/accounts').in_flight, 0)
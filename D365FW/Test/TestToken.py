@@ -0,0 +1,181 @@
+"""
+D365FW.TestToken
+~~~~~~~~~~~~~~~~
+"""
+
+import threading
+import time
+import unittest
+
+from requests import Response
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectionError
+
+from D365FW.Access import Access, LoginError
+from D365FW.D365FW import D365FW
+from D365FW.Entity import Entity
+from D365FW.Token import Token
+from D365FW.Transport import Transport
+
+
+class StubAccess(Access):
+    """Access requesting its tokens from a list of results instead of
+    the token endpoint, an exception in the list is raised."""
+
+    def __init__(self, results, delay=0.0, **kwargs):
+        super().__init__('stub', 'client', 'secret', 'tenant', **kwargs)
+
+        self.results = list(results)
+        self.delay = delay
+        self.requests = 0
+
+    def request_token(self):
+        self.requests += 1
+        time.sleep(self.delay)
+
+        result = self.results.pop(0) if len(self.results) > 1 else self.results[0]
+        if isinstance(result, Exception):
+            raise result
+
+        return result
+
+
+class UnauthorizedAdapter(HTTPAdapter):
+    """Adapter answering every request with 401 Unauthorized."""
+
+    def send(self, request, **kwargs):
+        r = Response()
+        r.status_code = 401
+        r.request = request
+        r._content = b'{}'
+        return r
+
+
+class ClosingTransport(Transport):
+    """Transport recording whether it was closed."""
+
+    closed = False
+
+    def close(self):
+        self.closed = True
+        super().close()
+
+
+class TestToken(unittest.TestCase):
+    """Test the Token and the refresh of the Access module."""
+
+    def test_expiry(self):
+        """Test the expiry of a token from the token endpoint response.
+
+        Should result in the `expires_in` counted from the request time,
+        and the token expired within the margin.
+        """
+
+        token = Token.from_response({'access_token': 'token', 'expires_in': '600'}, time.time() - 300)
+
+        self.assertAlmostEqual(token.expires_in, 300, delta=1)
+        self.assertFalse(token.is_expired())
+        self.assertTrue(token.is_expired(margin=400))
+
+
+    def test_single_flight(self):
+        """Test get_token from many threads without a token.
+
+        Should result in a single token request, its token shared by all
+        the threads.
+        """
+
+        access = StubAccess([Token('token', time.time() + 3600)], delay=0.2, auto_refresh=False)
+        barrier = threading.Barrier(8)
+        tokens = []
+
+        def get_token():
+            barrier.wait()
+            tokens.append(access.get_token())
+
+        threads = [threading.Thread(target=get_token) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(access.requests, 1)
+        self.assertEqual(tokens, ['token'] * 8)
+
+
+    def test_refresh_within_margin(self):
+        """Test get_token with a token within the refresh margin and no
+        background refresh.
+
+        Should result in the token refreshed before it is returned.
+        """
+
+        access = StubAccess([Token('new', time.time() + 3600)], auto_refresh=False, refresh_margin=300)
+        access.token = Token('old', time.time() + 60)
+
+        self.assertEqual(access.get_token(), 'new')
+        self.assertEqual(access.requests, 1)
+
+
+    def test_background_refresh_error(self):
+        """Test a background refresh raising a ConnectionError.
+
+        Should result in the error logged and the refresh scheduled again
+        after a backoff, the schedule back to the expiry once it works.
+        """
+
+        access = StubAccess([ConnectionError('down'), Token('new', time.time() + 3600)], refresh_margin=300)
+        access.token = Token('old', time.time() + 200)
+
+        try:
+            with self.assertLogs('D365FW.Access', 'WARNING'):
+                access._background_refresh()
+
+            # Test to ensure the old token is kept and the retry is scheduled
+            self.assertEqual(access.token.access_token, 'old')
+            self.assertEqual(access._refresh_timer.interval, 2)
+
+            access._background_refresh()
+
+            self.assertEqual(access.token.access_token, 'new')
+            self.assertEqual(access._refresh_failures, 0)
+            self.assertGreater(access._refresh_timer.interval, 3000)
+        finally:
+            access.close()
+
+
+    def test_close(self):
+        """Test an Entity of an Access with a background refresh used as
+        a context manager.
+
+        Should result in the refresh timer cancelled and the transport
+        closed on exit.
+        """
+
+        transport = ClosingTransport()
+        access = StubAccess([Token('token', time.time() + 3600)], transport=transport)
+
+        with Entity(access, 'stub', transport=transport) as entity:
+            self.assertEqual(entity.get_access_token(), 'token')
+            self.assertTrue(access._refresh_timer.is_alive())
+            timer = access._refresh_timer
+
+        timer.join(1)
+
+        self.assertFalse(timer.is_alive())
+        self.assertIsNone(access._refresh_timer)
+        self.assertTrue(transport.closed)
+
+
+    def test_login_failure(self):
+        """Test a D365FW with a failed login.
+
+        Should result in a LoginError instead of a client sending the
+        requests without an access token.
+        """
+
+        transport = Transport(throttle=False, retry=False)
+        transport.session.mount('https://login.microsoftonline.com/', UnauthorizedAdapter())
+
+        with self.assertRaises(LoginError):
+            D365FW('stub', 'client', 'secret', 'tenant', transport=transport)
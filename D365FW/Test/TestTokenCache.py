@@ -0,0 +1,105 @@
+"""
+D365FW.TestTokenCache
+~~~~~~~~~~~~~~~~~~~~~
+"""
+
+import os
+import stat
+import tempfile
+import threading
+import time
+import unittest
+
+from D365FW.Test.TestToken import StubAccess
+from D365FW.Token import Token
+from D365FW.TokenCache import FileTokenCache
+
+
+class TestTokenCache(unittest.TestCase):
+    """Test the TokenCache module."""
+
+    def setUp(self):
+        """Create a token cache in a temporary directory."""
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'cache', 'token_cache.json')
+        self.cache = FileTokenCache(self.path)
+        self.key = FileTokenCache.key('tenant', 'client', 'https://stub.api.crm.dynamics.com/')
+
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+
+        self.directory.cleanup()
+
+
+    def test_get_set(self):
+        """Test set and get of a token.
+
+        Should result in the same token read back from a file only the
+        owner can read.
+        """
+
+        self.assertIsNone(self.cache.get(self.key))
+
+        self.cache.set(self.key, Token('token', time.time() + 3600))
+        token = self.cache.get(self.key)
+
+        self.assertEqual(token.access_token, 'token')
+        if os.name == 'posix':
+            self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0o600)
+
+
+    def test_expiry(self):
+        """Test an expired token in the cache.
+
+        Should result in get returning None and the expired token
+        dropped from the file on the next write.
+        """
+
+        self.cache.set(self.key, Token('expired', time.time() - 1))
+        self.assertIsNone(self.cache.get(self.key))
+
+        self.cache.set('other', Token('token', time.time() + 3600))
+        self.assertNotIn(self.key, self.cache._load())
+
+
+    def test_lock(self):
+        """Test the cache lock held by another thread.
+
+        Should result in the lock waiting until it is released.
+        """
+
+        acquired = threading.Event()
+
+        def lock():
+            with self.cache.lock():
+                acquired.set()
+
+        with self.cache.lock():
+            thread = threading.Thread(target=lock)
+            thread.start()
+            self.assertFalse(acquired.wait(0.2))
+
+        thread.join()
+        self.assertTrue(acquired.is_set())
+
+
+    def test_shared_refresh(self):
+        """Test the refresh of many Access instances sharing the cache.
+
+        Should result in a single token request, the token reused by the
+        other instances from the cache.
+        """
+
+        accesses = [StubAccess([Token('token', time.time() + 3600)], delay=0.1, auto_refresh=False,
+                               token_cache=FileTokenCache(self.path)) for _ in range(4)]
+
+        threads = [threading.Thread(target=access.get_token) for access in accesses]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sum(access.requests for access in accesses), 1)
+        self.assertEqual([access.token.access_token for access in accesses], ['token'] * 4)
@@ -0,0 +1,137 @@
+"""
+D365FW.TestTransport
+~~~~~~~~~~~~~~~~~~~~
+"""
+
+import unittest
+
+from requests import Response
+from requests.adapters import HTTPAdapter
+
+from D365FW.Test.StubServer import StubServerMixin
+from D365FW.Transport import Transport
+
+
+def read_accounts(request):
+    """An empty page of Account, recording the client port and the
+    `Connection` header of the request."""
+
+    request.server.ports.append(request.client_address[1])
+    request.server.connections.append(request.headers.get('Connection'))
+
+    return 200, {'value': []}
+
+
+class TimeoutAdapter(HTTPAdapter):
+    """Adapter answering every request with 200 OK, recording its
+    timeout."""
+
+    def __init__(self):
+        super().__init__()
+
+        self.timeouts = []
+
+    def send(self, request, **kwargs):
+        self.timeouts.append(kwargs.get('timeout'))
+
+        r = Response()
+        r.status_code = 200
+        r.request = request
+        r._content = b''
+        return r
+
+
+class TestTransport(StubServerMixin, unittest.TestCase):
+    """Test the Transport module against a local stub server."""
+
+    routes = {
+        ('GET', '/accounts'): read_accounts
+    }
+
+    def setUp(self):
+        """Reset the requests of the stub server."""
+
+        self.server.ports = []
+        self.server.connections = []
+
+
+    def test_connection_pool(self):
+        """Test three requests to the same host.
+
+        Should result in all the requests sent on a single pooled
+        connection.
+        """
+
+        with Transport() as transport:
+            for _ in range(3):
+                self.assertEqual(transport.get(f'{self.server.url}/accounts').status_code, 200)
+
+            adapter = transport.session.get_adapter(self.server.url)
+            self.assertEqual(len(adapter.poolmanager.pools), 1)
+
+        self.assertEqual(len(set(self.server.ports)), 1)
+        self.assertEqual(self.server.connections, ['keep-alive'] * 3)
+
+
+    def test_no_keep_alive(self):
+        """Test three requests without keep-alive.
+
+        Should result in each request sent with `Connection: close` on
+        a new connection.
+        """
+
+        with Transport(keep_alive=False) as transport:
+            for _ in range(3):
+                transport.get(f'{self.server.url}/accounts')
+
+        self.assertEqual(self.server.connections, ['close'] * 3)
+        self.assertEqual(len(set(self.server.ports)), 3)
+
+
+    def test_hosts(self):
+        """Test the adapter settings of a host.
+
+        Should result in the host adapter used for the URL of the host,
+        and the default adapter for any other host.
+        """
+
+        hosts = {f'{self.server.url}/': {'pool_maxsize': 2, 'pool_block': True}}
+
+        with Transport(pool_maxsize=8, hosts=hosts) as transport:
+            adapter = transport.session.get_adapter(f'{self.server.url}/accounts')
+            default_adapter = transport.session.get_adapter('http://other/accounts')
+
+            self.assertEqual((adapter._pool_maxsize, adapter._pool_block), (2, True))
+            self.assertEqual((default_adapter._pool_maxsize, default_adapter._pool_block), (8, False))
+
+            self.assertEqual(transport.get(f'{self.server.url}/accounts').status_code, 200)
+            self.assertEqual(len(adapter.poolmanager.pools), 1)
+            self.assertEqual(len(default_adapter.poolmanager.pools), 0)
+
+
+    def test_default_timeout(self):
+        """Test the default timeout of the requests.
+
+        Should result in the transport timeout for a request without
+        one, and the timeout of a request used as is.
+        """
+
+        transport = Transport(timeout=5, throttle=False, retry=False)
+        adapter = TimeoutAdapter()
+        transport.session.mount('http://stub/', adapter)
+
+        transport.get('http://stub/accounts')
+        transport.get('http://stub/accounts', timeout=1)
+        transport.get('http://stub/accounts', timeout=None)
+
+        self.assertEqual(adapter.timeouts, [5, 1, None])
+
+        transport = Transport(throttle=False, retry=False)
+        transport.session.mount('http://stub/', adapter)
+        transport.get('http://stub/accounts')
+
+        self.assertIsNone(adapter.timeouts[-1])
+
+
+if __name__ == '__main__':
+    unittest.main()
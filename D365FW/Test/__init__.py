@@ -5,6 +5,33 @@ Test
 
 import unittest
 from D365FW.Test.TestAccess import TestAccess
+from D365FW.Test.TestAsyncEntity import TestAsyncEntity
+from D365FW.Test.TestBatch import TestBatch
+from D365FW.Test.TestBulk import TestBulk
+from D365FW.Test.TestCache import TestCache
+from D365FW.Test.TestChange import TestChange
+from D365FW.Test.TestCheckpoint import TestCheckpoint
+from D365FW.Test.TestCodec import TestCodec
+from D365FW.Test.TestColumn import TestColumn
+from D365FW.Test.TestEntitySet import TestEntitySet
+from D365FW.Test.TestExecutor import TestExecutor
+from D365FW.Test.TestExport import TestExport
+from D365FW.Test.TestFetch import TestFetch
+from D365FW.Test.TestImport import TestImport
+from D365FW.Test.TestMetadata import TestMetadata
+from D365FW.Test.TestMetrics import TestMetrics
+from D365FW.Test.TestPager import TestPager
+from D365FW.Test.TestParallelRead import TestParallelRead
+from D365FW.Test.TestPartition import TestPartition
+from D365FW.Test.TestProfiler import TestProfiler
+from D365FW.Test.TestQuery import TestQuery
+from D365FW.Test.TestReadCheckpoint import TestReadCheckpoint
+from D365FW.Test.TestRecordCache import TestRecordCache
+from D365FW.Test.TestRetry import TestRetry
+from D365FW.Test.TestThrottle import TestThrottle
+from D365FW.Test.TestToken import TestToken
+from D365FW.Test.TestTokenCache import TestTokenCache
+from D365FW.Test.TestTransport import TestTransport
 
 def load_tests(loader, tests, pattern):
     """
@@ -25,6 +52,33 @@ def load_tests(loader, tests, pattern):
     # Define the test classes
     test_classes = (
         TestAccess,
+        TestAsyncEntity,
+        TestBatch,
+        TestBulk,
+        TestCache,
+        TestChange,
+        TestCheckpoint,
+        TestCodec,
+        TestColumn,
+        TestEntitySet,
+        TestExecutor,
+        TestExport,
+        TestFetch,
+        TestImport,
+        TestMetadata,
+        TestMetrics,
+        TestPager,
+        TestParallelRead,
+        TestPartition,
+        TestProfiler,
+        TestQuery,
+        TestReadCheckpoint,
+        TestRecordCache,
+        TestRetry,
+        TestThrottle,
+        TestToken,
+        TestTokenCache,
+        TestTransport,
     )
 
     # Create the Unit Test Suite
@@ -0,0 +1,232 @@
+"""
+D365FW.Throttle
+~~~~~~~~~~~~~~~
+"""
+
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+# The service protection limit headers
+BURST_REMAINING_HEADER = 'x-ms-ratelimit-burst-remaining-xrm-requests'
+TIME_REMAINING_HEADER = 'x-ms-ratelimit-time-remaining-xrm-requests'
+
+class Throttle(object):
+    """Throttle.
+
+    Adaptive concurrency controller for the requests to a host. The
+    number of concurrent requests grows additively while the service
+    keeps up and shrinks multiplicatively (AIMD) when it throttles
+    (429 Too Many Requests) or the `x-ms-ratelimit-*` headers run low,
+    and no request is sent until the `Retry-After` has passed.
+
+    .. _Service Protection API Limits:
+    https://learn.microsoft.com/en-us/power-apps/developer/data-platform/api-limits
+    """
+
+    def __init__(self, max_concurrency=52, min_concurrency=1, initial_concurrency=None,
+                 increase=1.0, decrease=0.5, max_retries=5, max_retry_after=300,
+                 burst_threshold=50, time_threshold=10):
+        """Constructor.
+
+        Args:
+            max_concurrency (int): The maximum number of concurrent
+                requests, the service allows 52 per user.
+            min_concurrency (int): The minimum number of concurrent
+                requests.
+            initial_concurrency (int): The initial number of concurrent
+                requests, default to the maximum.
+            increase (float): The concurrency added per window of
+                successful requests.
+            decrease (float): The factor the concurrency is multiplied
+                with when throttled.
+            max_retries (int): The maximum number of times a throttled
+                request is sent again.
+            max_retry_after (float): The maximum number of seconds to
+                wait for a single `Retry-After`.
+            burst_threshold (int): The number of remaining requests of
+                the burst below which the concurrency stops growing.
+            time_threshold (float): The number of remaining seconds of
+                execution time below which the concurrency stops growing.
+        """
+
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.limit = float(initial_concurrency or max_concurrency)
+        self.increase = increase
+        self.decrease = decrease
+        self.max_retries = max_retries
+        self.max_retry_after = max_retry_after
+        self.burst_threshold = burst_threshold
+        self.time_threshold = time_threshold
+
+        # Concurrency state
+        self.in_flight = 0
+        self.resume_at = 0.0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+
+    @staticmethod
+    def is_throttled(response):
+        """Check if the response is a throttle response.
+
+        Args:
+            response (requests.Response): The response.
+
+        Returns:
+            True for 429 Too Many Requests, or 503 Service Unavailable
+            with a `Retry-After`.
+        """
+
+        return response.status_code == 429 or (response.status_code == 503 and 'Retry-After' in response.headers)
+
+
+    def retry_after(self, response):
+        """Parse the `Retry-After` of the response.
+
+        Args:
+            response (requests.Response): The response.
+
+        Returns:
+            A float for the number of seconds to wait.
+        """
+
+        value = response.headers.get('Retry-After')
+
+        if value is None:
+            seconds = 1.0
+        else:
+            try:
+                # Delay in seconds
+                seconds = float(value)
+            except ValueError:
+                # HTTP date
+                try:
+                    seconds = parsedate_to_datetime(value).timestamp() - time.time()
+                except (TypeError, ValueError):
+                    seconds = 1.0
+
+        return min(max(seconds, 0.0), self.max_retry_after)
+
+
+    def acquire(self):
+        """Acquire a request slot.
+
+        Wait until the `Retry-After` has passed and fewer than the
+        current limit of requests are in flight.
+
+        Returns:
+            A float for the number of seconds waited.
+        """
+
+        start = time.monotonic()
+
+        with self._condition:
+            while True:
+                delay = self._try_acquire()
+                if delay is None:
+                    return time.monotonic() - start
+
+                # Wait for the Retry-After, or for a released slot
+                self._condition.wait(delay or None)
+
+
+    def try_acquire(self):
+        """Acquire a request slot without waiting, e.g. from an event
+        loop polling for it.
+
+        Returns:
+            None if the slot is acquired, otherwise a float for the
+            number of seconds left of the `Retry-After`, 0 when waiting
+            for a free slot.
+        """
+
+        with self._condition:
+            return self._try_acquire()
+
+
+    def _try_acquire(self):
+        """Acquire a request slot, call while holding the lock."""
+
+        now = time.monotonic()
+
+        # Wait for the Retry-After
+        if now < self.resume_at:
+            return self.resume_at - now
+
+        # Wait for a free slot
+        if self.in_flight < max(int(self.limit), self.min_concurrency):
+            self.in_flight += 1
+            return None
+
+        return 0.0
+
+
+    def release(self, response=None):
+        """Release a request slot and adapt the concurrency.
+
+        Args:
+            response (requests.Response): The response of the request,
+                or None if it failed without one.
+        """
+
+        with self._condition:
+            self.in_flight -= 1
+
+            if response is not None:
+                self._adapt(response)
+
+            self._condition.notify_all()
+
+
+    def _adapt(self, response):
+        """Adapt the concurrency to the response, call while holding the lock."""
+
+        now = time.monotonic()
+
+        if self.is_throttled(response):
+            # Pause all requests for the Retry-After
+            self.resume_at = max(self.resume_at, now + self.retry_after(response))
+            self._shrink(now)
+            return
+
+        # Check the remaining service protection limits
+        burst_remaining = _header_float(response.headers, BURST_REMAINING_HEADER)
+        time_remaining = _header_float(response.headers, TIME_REMAINING_HEADER)
+
+        if burst_remaining is not None and burst_remaining < self.in_flight:
+            # About to be throttled
+            self._shrink(now)
+        elif ((burst_remaining is not None and burst_remaining < self.burst_threshold) or
+              (time_remaining is not None and time_remaining < self.time_threshold)):
+            # Hold the concurrency
+            pass
+        elif response.status_code < 500:
+            # Grow by `increase` per window of `limit` requests
+            self.limit = min(self.max_concurrency, self.limit + self.increase / self.limit)
+
+
+    def _shrink(self, now):
+        """Shrink the concurrency, at most once per second so a burst of
+        throttle responses counts once."""
+
+        if now - self._last_decrease < 1.0:
+            return
+
+        self._last_decrease = now
+        self.limit = max(self.min_concurrency, self.limit * self.decrease)
+
+
+def _header_float(headers, key):
+    """Parse a numeric header, None if missing or invalid."""
+
+    value = headers.get(key)
+
+    if value is None:
+        return None
+
+    try:
+        return float(value)
+    except ValueError:
+        return None
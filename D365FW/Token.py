@@ -0,0 +1,74 @@
+"""
+D365FW.Token
+~~~~~~~~~~~~
+"""
+
+import time
+
+class Token(object):
+    """Token.
+
+    Microsoft Dynamics 365 access (bearer) token with its expiry time.
+    """
+
+    def __init__(self, access_token, expires_on, token_type='Bearer'):
+        """Constructor.
+
+        Args:
+            access_token (str): The Microsoft Dynamics 365 access token.
+            expires_on (float): The time (seconds since the epoch) the
+                access token expires.
+            token_type (str): The type of the access token.
+        """
+
+        self.access_token = access_token
+        self.expires_on = float(expires_on)
+        self.token_type = token_type
+
+
+    @classmethod
+    def from_response(cls, response, requested_on=None):
+        """Create Token From Response.
+
+        Args:
+            response (dict): The parsed token endpoint response.
+            requested_on (float): The time (seconds since the epoch) the
+                token was requested, the `expires_in` is counted from
+                here. Default to now.
+
+        Returns:
+            A Token instance.
+        """
+
+        # Count the expiry from the time of the request to stay on the safe side
+        requested_on = time.time() if requested_on is None else requested_on
+        expires_on = requested_on + float(response.get('expires_in', 3599))
+
+        return cls(access_token=response['access_token'],
+                   expires_on=expires_on,
+                   token_type=response.get('token_type', 'Bearer'))
+
+
+    @property
+    def expires_in(self):
+        """The number of seconds before the access token expires."""
+
+        return self.expires_on - time.time()
+
+
+    def is_expired(self, margin=0):
+        """Check Expiry.
+
+        Args:
+            margin (float): The number of seconds before the actual
+                expiry the token is already considered expired.
+
+        Returns:
+            True if the token is (about to be) expired, False otherwise.
+        """
+
+        return self.expires_in <= margin
+
+
+    def __str__(self):
+        return self.access_token
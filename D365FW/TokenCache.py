@@ -0,0 +1,119 @@
+"""
+D365FW.TokenCache
+~~~~~~~~~~~~~~~~~
+"""
+
+import hashlib
+import json
+import os
+
+from D365FW.Constant import TOKEN_CACHE_FILE
+from D365FW.Storage import file_lock, atomic_write
+from D365FW.Token import Token
+
+class FileTokenCache(object):
+    """File Token Cache.
+
+    On disk access token store shared by all the Access instances (and
+    processes) on a machine. The tokens are keyed by tenant, client and
+    resource, and every read and write is protected by a file lock.
+    """
+
+    def __init__(self, path=None):
+        """Constructor.
+
+        Args:
+            path (str): The path of the cache file, default to
+                `~/.d365fw/token_cache.json`.
+        """
+
+        self.path = path or os.path.join(os.path.expanduser('~'), TOKEN_CACHE_FILE)
+        self.lock_path = f'{self.path}.lock'
+
+        # Create the cache directory
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+
+
+    @staticmethod
+    def key(tenant_id, client_id, resource):
+        """Create Cache Key.
+
+        Args:
+            tenant_id (str): The Directory (tenant) ID of the application.
+            client_id (str): The Application (client) ID of the application.
+            resource (str): The resource the token is issued for.
+
+        Returns:
+            A string for the cache key.
+        """
+
+        return hashlib.sha256(f'{tenant_id}|{client_id}|{resource}'.lower().encode('utf-8')).hexdigest()
+
+
+    def lock(self):
+        """Hold the exclusive cache file lock.
+
+        Other processes (and threads) wait in `lock` until it is
+        released, so only one of them requests a new token.
+        """
+
+        return file_lock(self.lock_path)
+
+
+    def _load(self):
+        """Load all the cache entries, call while holding the lock."""
+
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+
+    def _save(self, entries):
+        """Save all the cache entries atomically, call while holding the lock."""
+
+        # Drop the expired tokens
+        entries = {key: entry for key, entry in entries.items()
+                   if not Token(**entry).is_expired()}
+
+        # Write to a temporary file and replace the cache file
+        with atomic_write(self.path, permission=0o600) as f:
+            json.dump(entries, f)
+
+
+    def get(self, key):
+        """Get Token.
+
+        Args:
+            key (str): The cache key.
+
+        Returns:
+            The cached Token if it is not expired, None otherwise.
+        """
+
+        entry = self._load().get(key)
+
+        if entry is None:
+            return None
+
+        token = Token(**entry)
+        return None if token.is_expired() else token
+
+
+    def set(self, key, token):
+        """Set Token.
+
+        Args:
+            key (str): The cache key.
+            token (Token): The token to cache.
+        """
+
+        entries = self._load()
+        entries[key] = {
+            'access_token': token.access_token,
+            'expires_on': token.expires_on,
+            'token_type': token.token_type
+        }
+        self._save(entries)
@@ -0,0 +1,448 @@
+"""
+D365FW.Transport
+~~~~~~~~~~~~~~~~
+"""
+
+import logging
+import threading
+import time
+from urllib.parse import urlsplit
+
+from requests import Session
+from requests.adapters import HTTPAdapter, DEFAULT_POOLSIZE, DEFAULT_POOLBLOCK
+from requests.exceptions import ConnectionError, Timeout
+
+from D365FW.Metrics import RequestEvent, describe_request
+from D365FW.Profiler import ProfilingAdapter, _span
+from D365FW.Retry import RetryPolicy
+from D365FW.Throttle import Throttle
+
+logger = logging.getLogger(__name__)
+
+class Transport(object):
+    """Transport.
+
+    Pooled, keep-alive HTTP (Hypertext Transfer Protocol) transport
+    built on a `requests.Session`. A single instance is meant to be
+    shared by the Access and Entity objects so the TCP and TLS
+    connections to the environment are reused between calls.
+    """
+
+    def __init__(self, pool_connections=DEFAULT_POOLSIZE, pool_maxsize=DEFAULT_POOLSIZE,
+                 pool_block=DEFAULT_POOLBLOCK, keep_alive=True, timeout=None, hosts=None,
+                 throttle=True, retry=True, hooks=None, profiler=None):
+        """Constructor.
+
+        Args:
+            pool_connections (int): The number of connection pools (one
+                per host) to cache.
+            pool_maxsize (int): The maximum number of connections to
+                keep in each pool.
+            pool_block (bool): Determine whether or not to block when
+                a pool has no free connection instead of opening an
+                extra one.
+            keep_alive (bool): Determine whether or not to keep the
+                connections open between requests.
+            timeout (float): The default timeout in seconds for each
+                request, or None to wait forever.
+            hosts (dict): The per host adapter settings, mapping a URL
+                prefix (e.g. `https://org.api.crm.dynamics.com/`) to
+                the keyword arguments for the `mount` method.
+            throttle (bool | dict): Determine whether or not to adapt
+                the concurrency of each host to the service protection
+                limits and send the throttled (429) requests again
+                after the `Retry-After`, or the keyword arguments for
+                the Throttle of each host.
+            retry (bool | RetryPolicy): Determine whether or not to send
+                the requests failing with a transient error again with
+                the default RetryPolicy, or the RetryPolicy to use.
+            hooks (list): The callables called with a RequestEvent after
+                each request (e.g. a `Metrics`), see `add_hook`.
+            profiler (Profiler): The Profiler recording the latency
+                phases of each request, None to not profile.
+        """
+
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.keep_alive = keep_alive
+        self.timeout = timeout
+
+        # Throttle setting, one Throttle is shared by all requests to a host
+        self.throttle = {} if throttle is True else (throttle or None)
+        self._throttles = {}
+        self._throttle_lock = threading.Lock()
+
+        # Retry policy
+        self.retry = RetryPolicy() if retry is True else (retry or None)
+
+        # Instrumentation hooks
+        self.hooks = list(hooks or [])
+
+        # Latency profiler, set before mounting its adapters
+        self.profiler = profiler
+
+        # Create the session
+        self.session = Session()
+
+        # Ask the server to close the connection after each request
+        if not keep_alive:
+            self.session.headers['Connection'] = 'close'
+
+        # Mount the default adapter for all hosts
+        self.mount('https://')
+        self.mount('http://')
+
+        # Mount the per host adapter
+        for prefix, setting in (hosts or {}).items():
+            self.mount(prefix, **setting)
+
+
+    def mount(self, prefix, pool_connections=None, pool_maxsize=None, pool_block=None, max_retries=0):
+        """Mount Adapter.
+
+        Register a connection pool adapter for all URL (Uniform
+        Resource Locator) starting with the prefix. The longest
+        matching prefix is used for each request.
+
+        Args:
+            prefix (str): The URL prefix the adapter apply to.
+            pool_connections (int): The number of connection pools to
+                cache, default to the transport setting.
+            pool_maxsize (int): The maximum number of connections to
+                keep in each pool, default to the transport setting.
+            pool_block (bool): Determine whether or not to block when
+                a pool has no free connection, default to the transport
+                setting.
+            max_retries (int): The number of connection retries for
+                the adapter.
+
+        Returns:
+            The mounted HTTPAdapter instance, a ProfilingAdapter when
+            profiling.
+        """
+
+        # Create the adapter
+        adapter_class = ProfilingAdapter if self.profiler is not None else HTTPAdapter
+        adapter = adapter_class(
+            pool_connections=self.pool_connections if pool_connections is None else pool_connections,
+            pool_maxsize=self.pool_maxsize if pool_maxsize is None else pool_maxsize,
+            pool_block=self.pool_block if pool_block is None else pool_block,
+            max_retries=max_retries
+        )
+
+        # Mount the adapter to the session
+        self.session.mount(prefix, adapter)
+
+        return adapter
+
+
+    def get_throttle(self, url):
+        """Get Throttle.
+
+        Args:
+            url (str): The request URL (Uniform Resource Locator).
+
+        Returns:
+            The Throttle shared by all requests to the host of the URL,
+            or None if throttling is disabled.
+        """
+
+        if self.throttle is None:
+            return None
+
+        host = urlsplit(url).netloc
+
+        with self._throttle_lock:
+            throttle = self._throttles.get(host)
+            if throttle is None:
+                throttle = self._throttles[host] = Throttle(**self.throttle)
+
+        return throttle
+
+
+    def add_hook(self, hook):
+        """Add Hook.
+
+        Args:
+            hook (callable): Called with a RequestEvent (operation, entity
+                set, status, latency, bytes, retries and throttle waits)
+                after each request, on the thread that sent it. An error
+                raised by the hook is logged and ignored.
+        """
+
+        self.hooks.append(hook)
+
+
+    def remove_hook(self, hook):
+        """Remove Hook.
+
+        Args:
+            hook (callable): The hook added with `add_hook`.
+        """
+
+        self.hooks.remove(hook)
+
+
+    def request(self, method, url, idempotent=None, operation=None, **kwargs):
+        """Send Request.
+
+        When throttling is enabled, the request waits for a slot of the
+        host concurrency and a throttled request is sent again after the
+        `Retry-After`: any request for 429, only an idempotent one for
+        503. When retry is enabled, an idempotent request failing with a
+        transient error is sent again with backoff until the deadline of
+        the call. Each hook is called with
+        the RequestEvent of the call once it is done. When profiling,
+        the phases of the call are recorded by the Profiler.
+
+        Args:
+            method (str): The HTTP method (e.g. `GET`, `POST`).
+            url (str): The request URL (Uniform Resource Locator).
+            idempotent (bool): Determine whether or not the request is
+                safe to send again, None to decide from the method and
+                header (see `RetryPolicy.is_idempotent`).
+            operation (str): The operation reported to the hooks,
+                default to the one of the method and URL (see
+                `describe_request`).
+            kwargs (dict): The keyword arguments for `Session.request`.
+
+        Returns:
+            A `requests.Response` for the request.
+        """
+
+        stats = {'attempts': 0, 'throttle_retries': 0, 'throttle_wait': 0.0}
+
+        # Record the phases of the call
+        if self.profiler is not None:
+            with self.profiler.activate(), self.profiler.span('request', 'request', method=method, url=url):
+                return self._send(method, url, idempotent, operation, stats, kwargs)
+
+        return self._send(method, url, idempotent, operation, stats, kwargs)
+
+
+    def _send(self, method, url, idempotent, operation, stats, kwargs):
+        """Send the request and call the hooks, see `request`."""
+
+        # Send the request without instrumentation
+        if not self.hooks:
+            return self._request(method, url, idempotent, stats, **kwargs)
+
+        start = time.perf_counter()
+        r = None
+        error = None
+
+        try:
+            r = self._request(method, url, idempotent, stats, **kwargs)
+            return r
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            latency = time.perf_counter() - start
+
+            # The size of the bodies
+            if r is not None:
+                request_bytes = _body_size(r.request.body)
+                if kwargs.get('stream'):
+                    response_bytes = int(r.headers.get('Content-Length') or 0)
+                else:
+                    response_bytes = len(r.content)
+            else:
+                request_bytes = _body_size(kwargs.get('data'))
+                response_bytes = 0
+
+            self.report(method, url, operation, None if r is None else r.status_code, error, latency, stats,
+                        request_bytes, response_bytes)
+
+
+    def report(self, method, url, operation, status_code, error, latency, stats, request_bytes=0,
+               response_bytes=0):
+        """Call the hooks with the RequestEvent of a request.
+
+        Args:
+            method (str): The HTTP method.
+            url (str): The request URL.
+            operation (str): The operation, None to describe it from the
+                method and URL.
+            status_code (int): The status code of the last response, or
+                None if the request failed without one.
+            error (Exception): The error raised by the request.
+            latency (float): The number of seconds of the call.
+            stats (dict): The number of `attempts` and `throttle_retries`
+                and the `throttle_wait` seconds of the call.
+            request_bytes (int): The size of the request body.
+            response_bytes (int): The size of the response body.
+        """
+
+        described_operation, entity_set = describe_request(method, url)
+
+        event = RequestEvent(operation or described_operation, entity_set, method, url,
+                             status_code=status_code,
+                             latency=latency,
+                             request_bytes=request_bytes,
+                             response_bytes=response_bytes,
+                             retries=max(stats['attempts'] - 1, 0),
+                             throttle_retries=stats['throttle_retries'],
+                             throttle_wait=stats['throttle_wait'],
+                             error=error)
+
+        for hook in list(self.hooks):
+            # An error of a hook must not replace the response or error of the request
+            try:
+                hook(event)
+            except Exception:
+                logger.warning('The request hook %r failed.', hook, exc_info=True)
+
+
+    def _request(self, method, url, idempotent, stats, **kwargs):
+        """Send the request with the throttle and retry, see `request`.
+
+        Args:
+            stats (dict): The number of `attempts` and `throttle_retries`
+                and the `throttle_wait` seconds, updated in place.
+        """
+
+        # Use the default timeout
+        kwargs.setdefault('timeout', self.timeout)
+        timeout = kwargs['timeout']
+
+        throttle = self.get_throttle(url)
+        retry = self.retry
+
+        # A request rejected by the throttle (429) was never processed, a
+        # 503 may have been, only send it again when it is idempotent
+        safe = RetryPolicy.is_idempotent(method, kwargs.get('headers'), idempotent)
+        if not safe:
+            retry = None
+
+        # Send the request for a response
+        if throttle is None and retry is None:
+            stats['attempts'] = 1
+            return self.session.request(method=method, url=url, **kwargs)
+
+        # The deadline of the call
+        if retry is not None and retry.deadline is not None:
+            deadline = time.monotonic() + retry.deadline
+        else:
+            deadline = None
+
+        attempts = 0
+        throttle_retries = 0
+
+        while True:
+            if throttle is not None:
+                with _span('throttle_wait'):
+                    stats['throttle_wait'] += throttle.acquire()
+
+            attempts += 1
+            stats['attempts'] = attempts
+
+            # Do not wait for the response past the deadline of the call
+            if deadline is not None and not isinstance(timeout, tuple):
+                remaining = max(deadline - time.monotonic(), 0.001)
+                kwargs['timeout'] = remaining if timeout is None else min(timeout, remaining)
+
+            try:
+                r = self.session.request(method=method, url=url, **kwargs)
+            except (ConnectionError, Timeout):
+                if throttle is not None:
+                    throttle.release()
+                # Send again after the backoff
+                if not self._backoff(retry, attempts, deadline):
+                    raise
+                continue
+            except BaseException:
+                # Never keep the slot of a failed request (e.g. ChunkedEncodingError)
+                if throttle is not None:
+                    throttle.release()
+                raise
+
+            if throttle is not None:
+                throttle.release(r)
+
+                if throttle.is_throttled(r):
+                    # Send the throttled request again after the Retry-After
+                    if (r.status_code == 429 or safe) and throttle_retries < throttle.max_retries and \
+                            (deadline is None or throttle.resume_at < deadline):
+                        throttle_retries += 1
+                        stats['throttle_retries'] = throttle_retries
+                        attempts -= 1
+                        r.close()
+                        continue
+                    return r
+
+            # Send the failed request again after the backoff
+            if retry is not None and r.status_code in retry.statuses:
+                if self._backoff(retry, attempts, deadline):
+                    r.close()
+                    continue
+
+            return r
+
+
+    @staticmethod
+    def _backoff(retry, attempts, deadline):
+        """Wait for the backoff before the next attempt.
+
+        Returns:
+            True if there is an attempt left within the deadline, False
+            otherwise (without waiting).
+        """
+
+        backoff = retry.next_backoff(attempts, deadline) if retry is not None else None
+        if backoff is None:
+            return False
+
+        time.sleep(backoff)
+
+        return True
+
+
+    def get(self, url, **kwargs):
+        """Send GET Request."""
+
+        return self.request('GET', url, **kwargs)
+
+
+    def post(self, url, **kwargs):
+        """Send POST Request."""
+
+        return self.request('POST', url, **kwargs)
+
+
+    def patch(self, url, **kwargs):
+        """Send PATCH Request."""
+
+        return self.request('PATCH', url, **kwargs)
+
+
+    def delete(self, url, **kwargs):
+        """Send DELETE Request."""
+
+        return self.request('DELETE', url, **kwargs)
+
+
+    def close(self):
+        """Close all the pooled connections."""
+
+        self.session.close()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def _body_size(body):
+    """Get the size of a request body, 0 for a streamed body."""
+
+    if isinstance(body, str):
+        return len(body.encode('utf-8'))
+    if isinstance(body, (bytes, bytearray)):
+        return len(body)
+
+    return 0
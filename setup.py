@@ -14,6 +14,12 @@ setup(
     install_requires = [
         'requests',
     ],
+    extras_require = {
+        'async': ['aiohttp'],
+        'fast': ['orjson'],
+        'columns': ['numpy'],
+        'parquet': ['pyarrow'],
+    },
 
     # Metadata
     author = 'Yan Kuang',